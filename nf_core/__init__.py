@@ -4,6 +4,10 @@
 Shouldn't do much, as everything is under subcommands.
 """
 
-import pkg_resources
-
-__version__ = pkg_resources.get_distribution("nf_core").version
+try:
+    import importlib.metadata as _metadata
+    __version__ = _metadata.version("nf_core")
+except ImportError:
+    # Python < 3.8 - pkg_resources is much slower to import
+    import pkg_resources
+    __version__ = pkg_resources.get_distribution("nf_core").version
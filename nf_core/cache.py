@@ -0,0 +1,315 @@
+#!/usr/bin/env python
+"""Persistent on-disk cache shared by nf-core tools commands.
+
+A single SQLite database holds all cached entries, split up into namespaces
+(eg. ``wf_config`` for resolved workflow configs). Entries are evicted least
+recently used first once the cache grows beyond a maximum size, and entries
+that have not been used for a while are pruned once a day. Hit / miss counts are kept
+for each namespace and can be inspected with ``nf-core cache info``.
+"""
+
+from __future__ import print_function
+
+import glob
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import tabulate
+
+# Default limits for the cache
+MAX_SIZE = 256 * 1024 * 1024
+MAX_AGE = 90 * 24 * 60 * 60
+PRUNE_INTERVAL = 24 * 60 * 60
+
+_cache = None
+
+
+def get_cache():
+    """Returns the shared :class:`CacheStore` for this process, in ``~/.nfcore/cache.sqlite``."""
+    global _cache
+    if _cache is None:
+        _cache = CacheStore(os.path.join(os.getenv("HOME"), '.nfcore', 'cache.sqlite'))
+    return _cache
+
+
+class CacheStore(object):
+    """SQLite key-value store with LRU eviction and hit / miss statistics.
+
+    Values can be anything that can be serialised to JSON.
+    Connections are opened per thread and per process, so a single
+    object can be shared between threads and across ``fork()``.
+
+    Args:
+        path (str): Path to the SQLite database file.
+        max_size (int): Evict least recently used entries beyond this many bytes. Default: 256 MB.
+        max_age (int): Prune entries not used for this many seconds. Default: 90 days.
+    """
+
+    def __init__(self, path, max_size=MAX_SIZE, max_age=MAX_AGE):
+        self.path = path
+        self.max_size = max_size
+        self.max_age = max_age
+        self._local = threading.local()
+        self._prune_checked_pid = None
+
+    def _connect(self):
+        """Returns an open connection for the current thread, creating the database if needed."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        if not os.path.isdir(os.path.dirname(self.path)):
+            os.makedirs(os.path.dirname(self.path))
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        # Make INSERT OR REPLACE fire the delete trigger for the entry it replaces
+        conn.execute('PRAGMA recursive_triggers=ON')
+        with conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                '  namespace TEXT NOT NULL,'
+                '  key TEXT NOT NULL,'
+                '  value TEXT NOT NULL,'
+                '  size INTEGER NOT NULL,'
+                '  created REAL NOT NULL,'
+                '  last_access REAL NOT NULL,'
+                '  PRIMARY KEY (namespace, key)'
+                ')'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS stats ('
+                '  namespace TEXT PRIMARY KEY,'
+                '  hits INTEGER NOT NULL DEFAULT 0,'
+                '  misses INTEGER NOT NULL DEFAULT 0'
+                ')'
+            )
+            # Keep a running total of entry sizes, so that writes don't need to scan the whole table
+            conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value REAL NOT NULL)')
+            conn.execute(
+                'CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN'
+                "  UPDATE meta SET value = value + NEW.size WHERE key = 'total_size';"
+                ' END'
+            )
+            conn.execute(
+                'CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN'
+                "  UPDATE meta SET value = value - OLD.size WHERE key = 'total_size';"
+                ' END'
+            )
+            conn.execute(
+                'CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size ON entries BEGIN'
+                "  UPDATE meta SET value = value + NEW.size - OLD.size WHERE key = 'total_size';"
+                ' END'
+            )
+            # The triggers exist before we count, so no writes can be missed
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'total_size'").fetchone() is None:
+                conn.execute(
+                    "INSERT OR IGNORE INTO meta (key, value) SELECT 'total_size', COALESCE(SUM(size), 0) FROM entries"
+                )
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('last_pruned', ?)", (time.time(),))
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _prune_if_due(self):
+        """Prunes stale entries if it hasn't been done for a day. Checked once per process."""
+        if self._prune_checked_pid == os.getpid():
+            return
+        self._prune_checked_pid = os.getpid()
+        row = self._connect().execute("SELECT value FROM meta WHERE key = 'last_pruned'").fetchone()
+        if time.time() - row[0] > PRUNE_INTERVAL:
+            self.prune()
+
+    def get(self, namespace, key):
+        """Fetches a single value from the cache.
+
+        Returns:
+            The cached value, or None if not found.
+        """
+        return self.get_many(namespace, [key]).get(key)
+
+    def get_many(self, namespace, keys):
+        """Fetches several values from a namespace in one transaction.
+
+        Returns:
+            dict: Cached values for the keys that were found.
+        """
+        keys = list(keys)
+        found = {}
+        if len(keys) == 0:
+            return found
+        self._prune_if_due()
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            for key in keys:
+                row = conn.execute(
+                    'SELECT value FROM entries WHERE namespace = ? AND key = ?', (namespace, key)
+                ).fetchone()
+                if row is not None:
+                    found[key] = json.loads(row[0])
+            if len(found) > 0:
+                conn.executemany(
+                    'UPDATE entries SET last_access = ? WHERE namespace = ? AND key = ?',
+                    [(now, namespace, key) for key in found]
+                )
+            conn.execute('INSERT OR IGNORE INTO stats (namespace) VALUES (?)', (namespace,))
+            conn.execute(
+                'UPDATE stats SET hits = hits + ?, misses = misses + ? WHERE namespace = ?',
+                (len(found), len(keys) - len(found), namespace)
+            )
+        return found
+
+    def set(self, namespace, key, value):
+        """Saves a single value to the cache."""
+        self.set_many(namespace, {key: value})
+
+    def set_many(self, namespace, values):
+        """Saves several values to a namespace in one transaction.
+
+        Evicts old entries afterwards if the cache has grown too big.
+        """
+        if len(values) == 0:
+            return
+        self._prune_if_due()
+        conn = self._connect()
+        now = time.time()
+        rows = []
+        for key, value in values.items():
+            value_json = json.dumps(value)
+            rows.append((namespace, key, value_json, len(value_json) + len(key), now, now))
+        with conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO entries (namespace, key, value, size, created, last_access) VALUES (?, ?, ?, ?, ?, ?)',
+                rows
+            )
+        if self.total_size() > self.max_size:
+            self.prune()
+
+    def delete(self, namespace, key):
+        """Removes a single entry from the cache."""
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM entries WHERE namespace = ? AND key = ?', (namespace, key))
+
+    def keys(self, namespace):
+        """Returns all keys in a namespace, without counting as a lookup."""
+        return [row[0] for row in self._connect().execute('SELECT key FROM entries WHERE namespace = ?', (namespace,))]
+
+    def total_size(self):
+        """Returns the total size of all cached entries, in bytes."""
+        row = self._connect().execute("SELECT value FROM meta WHERE key = 'total_size'").fetchone()
+        return int(row[0])
+
+    def prune(self, max_size=None, max_age=None):
+        """Removes stale entries, then least recently used entries until under the size limit.
+
+        Args:
+            max_size (int): Size limit in bytes. Default: :attr:`self.max_size`.
+            max_age (int): Remove entries not used for this many seconds. Default: :attr:`self.max_age`.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        max_size = self.max_size if max_size is None else max_size
+        max_age = self.max_age if max_age is None else max_age
+        conn = self._connect()
+        removed = 0
+        with conn:
+            cursor = conn.execute('DELETE FROM entries WHERE last_access < ?', (time.time() - max_age,))
+            removed += cursor.rowcount
+            total_size = conn.execute("SELECT value FROM meta WHERE key = 'total_size'").fetchone()[0]
+            if total_size > max_size:
+                # Walk entries from least to most recently used, until we've freed enough space
+                to_free = total_size - max_size
+                doomed = []
+                for namespace, key, size in conn.execute('SELECT namespace, key, size FROM entries ORDER BY last_access'):
+                    if to_free <= 0:
+                        break
+                    doomed.append((namespace, key))
+                    to_free -= size
+                conn.executemany('DELETE FROM entries WHERE namespace = ? AND key = ?', doomed)
+                removed += len(doomed)
+            conn.execute("UPDATE meta SET value = ? WHERE key = 'last_pruned'", (time.time(),))
+        logging.debug("Pruned {} entries from cache: {}".format(removed, self.path))
+        return removed
+
+    def clear(self, namespace=None):
+        """Removes all entries and statistics, optionally only for one namespace.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        conn = self._connect()
+        with conn:
+            if namespace is None:
+                removed = conn.execute('DELETE FROM entries').rowcount
+                conn.execute('DELETE FROM stats')
+            else:
+                removed = conn.execute('DELETE FROM entries WHERE namespace = ?', (namespace,)).rowcount
+                conn.execute('DELETE FROM stats WHERE namespace = ?', (namespace,))
+        if namespace is None:
+            conn.execute('VACUUM')
+        return removed
+
+    def stats(self):
+        """Returns entry counts, sizes and hit / miss counts for each namespace.
+
+        Returns:
+            dict: ``{namespace: {'entries', 'size', 'hits', 'misses', 'last_access'}}``
+        """
+        conn = self._connect()
+        stats = {}
+        for namespace, entries, size, last_access in conn.execute(
+            'SELECT namespace, COUNT(*), SUM(size), MAX(last_access) FROM entries GROUP BY namespace'
+        ):
+            stats[namespace] = {'entries': entries, 'size': size, 'hits': 0, 'misses': 0, 'last_access': last_access}
+        for namespace, hits, misses in conn.execute('SELECT namespace, hits, misses FROM stats'):
+            stats.setdefault(namespace, {'entries': 0, 'size': 0, 'hits': 0, 'misses': 0, 'last_access': None})
+            stats[namespace]['hits'] = hits
+            stats[namespace]['misses'] = misses
+        return stats
+
+
+def remove_legacy_caches():
+    """Deletes the one-file-per-entry caches written by older versions of nf-core/tools.
+
+    Returns:
+        int: Number of files removed.
+    """
+    legacy_dir = os.path.join(os.getenv("HOME"), '.nextflow', 'nf-core')
+    legacy_files = glob.glob(os.path.join(legacy_dir, 'wf-config-cache-*.json'))
+    legacy_files.extend(glob.glob(os.path.join(legacy_dir, 'wf-config-file-hashes.json')))
+    for fn in legacy_files:
+        os.remove(fn)
+    return len(legacy_files)
+
+
+def print_cache_info(cache=None):
+    """Prints a summary table of the cache contents and hit rates."""
+    cache = cache or get_cache()
+    stats = cache.stats()
+    rows = []
+    for namespace in sorted(stats):
+        s = stats[namespace]
+        lookups = s['hits'] + s['misses']
+        rows.append([
+            namespace,
+            s['entries'],
+            '{:.1f} KB'.format((s['size'] or 0) / 1024.0),
+            s['hits'],
+            s['misses'],
+            '{:.0f}%'.format(100.0 * s['hits'] / lookups) if lookups > 0 else '-',
+            time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(s['last_access'])) if s['last_access'] else '-'
+        ])
+    logging.info("Cache file: {}\n  Total size: {:.1f} KB (limit {:.0f} MB)".format(
+        cache.path, cache.total_size() / 1024.0, cache.max_size / 1024.0 / 1024.0)
+    )
+    print("", file=sys.stderr)
+    print(tabulate.tabulate(rows, headers=['Namespace', 'Entries', 'Size', 'Hits', 'Misses', 'Hit rate', 'Last used']))
+    print("", file=sys.stderr)
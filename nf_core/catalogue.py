@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+"""Local catalogue of the nf-core pipelines listed on https://nf-co.re
+
+The pipelines in ``https://nf-co.re/pipelines.json`` are saved to a SQLite
+database, with release dates already parsed and indexes on the pipeline name,
+topics, star count and release commit hashes. The catalogue is refreshed with
+a conditional request (``If-None-Match``) at most once an hour, so that most
+commands can query it without waiting for the network. If nf-co.re can't be
+reached, the last snapshot is used.
+"""
+
+import calendar
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+
+CATALOGUE_URL = 'https://nf-co.re/pipelines.json'
+
+# Check for changes to the catalogue at most this often, in seconds
+REFRESH_INTERVAL = 60 * 60
+
+_catalogue = None
+
+
+def get_catalogue():
+    """Returns the shared :class:`RemoteCatalogue` for this process, in ``~/.nfcore/pipelines.sqlite``."""
+    global _catalogue
+    if _catalogue is None:
+        _catalogue = RemoteCatalogue(os.path.join(os.getenv("HOME"), '.nfcore', 'pipelines.sqlite'))
+    return _catalogue
+
+
+def parse_timestamp(published_at):
+    """Converts a GitHub date string such as ``2020-06-02T14:21:05Z`` to a UTC epoch timestamp."""
+    return calendar.timegm(time.strptime(published_at, "%Y-%m-%dT%H:%M:%SZ"))
+
+
+class RemoteCatalogue(object):
+    """SQLite snapshot of the nf-core pipelines catalogue.
+
+    Connections are opened per thread and per process, as in :class:`nf_core.cache.CacheStore`.
+
+    Args:
+        path (str): Path to the SQLite database file.
+        url (str): URL of the pipelines JSON. Default: ``https://nf-co.re/pipelines.json``
+    """
+
+    def __init__(self, path, url=CATALOGUE_URL):
+        self.path = path
+        self.url = url
+        self._local = threading.local()
+
+    def _connect(self):
+        """Returns an open connection for the current thread, creating the database if needed."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        if not os.path.isdir(os.path.dirname(self.path)):
+            os.makedirs(os.path.dirname(self.path))
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        with conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS pipelines ('
+                '  name TEXT PRIMARY KEY,'
+                '  full_name TEXT NOT NULL,'
+                '  stargazers_count INTEGER,'
+                '  data TEXT NOT NULL'
+                ')'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS pipelines_full_name ON pipelines (full_name)')
+            conn.execute('CREATE INDEX IF NOT EXISTS pipelines_stars ON pipelines (stargazers_count)')
+            conn.execute('CREATE TABLE IF NOT EXISTS topics (topic TEXT NOT NULL, name TEXT NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS topics_topic ON topics (topic)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS releases ('
+                '  name TEXT NOT NULL,'
+                '  tag_name TEXT NOT NULL,'
+                '  tag_sha TEXT,'
+                '  published_at_timestamp INTEGER NOT NULL'
+                ')'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS releases_name ON releases (name)')
+            conn.execute('CREATE INDEX IF NOT EXISTS releases_tag_sha ON releases (tag_sha)')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def get_meta(self, key):
+        """Returns a value from the ``meta`` table, or None."""
+        row = self._connect().execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def _set_meta(self, conn, values):
+        conn.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', list(values.items()))
+
+    def has_snapshot(self):
+        """Returns True if the catalogue has been downloaded at least once."""
+        return self.get_meta('updated') is not None
+
+    def refresh(self, max_age=REFRESH_INTERVAL):
+        """Fetches the catalogue from nf-co.re if it may have changed.
+
+        Nothing is fetched if the catalogue was checked less than ``max_age`` seconds
+        ago. Otherwise the request is sent with the ``ETag`` of the last snapshot,
+        so that nf-co.re only sends the catalogue again if it has changed.
+
+        Args:
+            max_age (int): Seconds since the last check before checking again. 0 always checks.
+
+        Returns:
+            bool: True if the catalogue can be used, False if it has never been
+            downloaded and nf-co.re could not be reached.
+        """
+        checked = self.get_meta('checked')
+        if self.has_snapshot() and checked is not None and time.time() - float(checked) < max_age:
+            logging.debug("Using pipeline catalogue checked {:.0f} seconds ago".format(time.time() - float(checked)))
+            return True
+
+        # Skip the requests cache, the catalogue is our cache
+        headers = {'Cache-Control': 'no-store'}
+        if self.has_snapshot():
+            etag = self.get_meta('etag')
+            if etag:
+                headers['If-None-Match'] = etag
+            last_modified = self.get_meta('last_modified')
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        logging.debug("Fetching list of nf-core workflows")
+        try:
+            response = requests.get(self.url, headers=headers, timeout=10)
+            if response.status_code == 304:
+                logging.debug("Pipeline catalogue is up to date")
+                with self._connect() as conn:
+                    self._set_meta(conn, {'checked': str(time.time())})
+                return True
+            if response.status_code != 200:
+                raise IOError("Got status code {} from {}".format(response.status_code, self.url))
+            self.update(
+                response.json()['remote_workflows'],
+                etag=response.headers.get('ETag'),
+                last_modified=response.headers.get('Last-Modified')
+            )
+            return True
+        except (IOError, ValueError, KeyError, requests.exceptions.RequestException) as e:
+            if self.has_snapshot():
+                updated = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(float(self.get_meta('updated'))))
+                logging.warning("Could not fetch list of nf-core pipelines, using copy from {}\n  {}".format(updated, e))
+                return True
+            logging.warning("Could not fetch list of nf-core pipelines: {}".format(e))
+            return False
+
+    def update(self, remote_workflows, etag=None, last_modified=None):
+        """Replaces the catalogue with a new list of pipelines.
+
+        Args:
+            remote_workflows (list): Pipelines, as in the ``remote_workflows`` key of ``pipelines.json``
+            etag (str): ETag header of the response, sent with the next request
+            last_modified (str): Last-Modified header of the response, sent with the next request
+        """
+        pipelines = []
+        topics = []
+        releases = []
+        for wf in remote_workflows:
+            wf = dict(wf)
+            wf['releases'] = [dict(r) for r in wf.get('releases', [])]
+            for release in wf['releases']:
+                if release.get('published_at') is not None:
+                    release['published_at_timestamp'] = parse_timestamp(release['published_at'])
+                    releases.append((wf['name'], release.get('tag_name'), release.get('tag_sha'), release['published_at_timestamp']))
+            for topic in wf.get('topics') or []:
+                topics.append((topic.lower(), wf['name']))
+            pipelines.append((wf['name'], wf.get('full_name'), wf.get('stargazers_count'), json.dumps(wf)))
+        now = str(time.time())
+        with self._connect() as conn:
+            conn.execute('DELETE FROM pipelines')
+            conn.execute('DELETE FROM topics')
+            conn.execute('DELETE FROM releases')
+            conn.executemany('INSERT INTO pipelines (name, full_name, stargazers_count, data) VALUES (?, ?, ?, ?)', pipelines)
+            conn.executemany('INSERT INTO topics (topic, name) VALUES (?, ?)', topics)
+            conn.executemany('INSERT INTO releases (name, tag_name, tag_sha, published_at_timestamp) VALUES (?, ?, ?, ?)', releases)
+            self._set_meta(conn, {'etag': etag, 'last_modified': last_modified, 'updated': now, 'checked': now})
+        logging.debug("Saved {} pipelines to catalogue: {}".format(len(pipelines), self.path))
+
+    def get_workflows(self, topic=None, sort_by='name'):
+        """Returns pipelines from the catalogue.
+
+        Args:
+            topic (str): Only return pipelines with this topic (case insensitive).
+            sort_by (str): ``name`` or ``stars`` (most stars first).
+
+        Returns:
+            list: Pipeline dicts, as in ``pipelines.json``, with ``published_at_timestamp``
+            added to each release.
+        """
+        order = 'p.stargazers_count DESC, p.name' if sort_by == 'stars' else 'p.name'
+        if topic is None:
+            rows = self._connect().execute('SELECT p.data FROM pipelines p ORDER BY {}'.format(order))
+        else:
+            rows = self._connect().execute(
+                'SELECT p.data FROM pipelines p JOIN topics t ON t.name = p.name WHERE t.topic = ? ORDER BY {}'.format(order),
+                (topic.lower(),)
+            )
+        return [json.loads(row[0]) for row in rows]
+
+    def get_workflow(self, name):
+        """Returns a single pipeline by name (``rnaseq``) or full name (``nf-core/rnaseq``), or None."""
+        row = self._connect().execute(
+            'SELECT data FROM pipelines WHERE name = ? OR full_name = ?', (name, name)
+        ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def find_release(self, tag_sha):
+        """Finds the pipeline release made from a commit.
+
+        Returns:
+            tuple: ``(pipeline name, tag name)``, or None if no release was made from this commit.
+        """
+        row = self._connect().execute(
+            'SELECT name, tag_name FROM releases WHERE tag_sha = ? ORDER BY published_at_timestamp DESC', (tag_sha,)
+        ).fetchone()
+        return None if row is None else tuple(row)
@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+"""Long-lived local worker for resolving Nextflow workflow configs.
+
+Every call to ``nextflow config`` pays for a JVM start. When the
+``NFCORE_CONFIG_DAEMON`` environment variable is set, :func:`nf_core.utils.fetch_wf_config`
+asks this worker for the config instead. The worker is started on first use,
+listens on a local unix socket and is shared between calls and between
+separate ``nf-core`` command-line invocations.
+
+Resolved configs are kept in memory, keyed on the workflow path and the
+size / modification time of its config files, so repeated requests for
+unchanged pipelines are answered without calling Nextflow at all.
+Concurrent requests for the same pipeline share a single ``nextflow config`` call.
+
+If the worker cannot be reached, :func:`fetch_wf_config` returns ``None``
+and the caller falls back to running ``nextflow config`` itself.
+"""
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+
+import nf_core.utils
+
+# Shut the worker down after this many seconds without a request
+IDLE_TIMEOUT = 1800
+# How long a client waits for a freshly started worker to come up
+STARTUP_TIMEOUT = 10
+
+
+def get_socket_path():
+    """Returns the path of the unix socket used to talk to the worker."""
+    return os.path.join(os.getenv("HOME"), '.nfcore', 'config_daemon.sock')
+
+
+def fetch_wf_config(wf_path, socket_path=None, start=True):
+    """Asks the config worker for the flat config of a workflow.
+
+    Starts the worker if it is not already running.
+
+    Args:
+        wf_path (str): Nextflow workflow file system path.
+        socket_path (str): Path to the worker socket. Default: :func:`get_socket_path`.
+        start (bool): Start a new worker if none is listening. Default: True.
+
+    Returns:
+        dict: Workflow configuration settings, or ``None`` if the worker is unavailable.
+
+    Raises:
+        AssertionError, if the worker could not resolve the config with Nextflow.
+    """
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+    if socket_path is None:
+        socket_path = get_socket_path()
+
+    request = json.dumps({
+        'wf_path': os.path.abspath(wf_path),
+        'nxf_env': {k: v for k, v in os.environ.items() if k.startswith('NXF_')}
+    }).encode('utf-8') + b'\n'
+    response = _send_request(socket_path, request)
+    if response is None and start:
+        if not start_daemon(socket_path):
+            return None
+        response = _send_request(socket_path, request)
+    if response is None:
+        return None
+
+    if 'error' in response:
+        raise AssertionError(response['error'])
+    logging.debug("Got config from config worker: {}".format(socket_path))
+    return response.get('config')
+
+
+def _send_request(socket_path, request):
+    """Sends one request to the worker and returns the decoded reply, or ``None``."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+            sock.sendall(request)
+            with sock.makefile('rb') as fh:
+                reply = fh.readline()
+        return json.loads(reply.decode('utf-8'))
+    except (OSError, ValueError) as e:
+        logging.debug("Could not talk to config worker at {}: {}".format(socket_path, e))
+        return None
+
+
+def start_daemon(socket_path=None):
+    """Launches a detached worker process and waits for it to accept connections.
+
+    Returns:
+        bool: True if the worker is up and listening.
+    """
+    if socket_path is None:
+        socket_path = get_socket_path()
+    socket_dir = os.path.dirname(socket_path)
+    if not os.path.isdir(socket_dir):
+        os.makedirs(socket_dir)
+
+    logging.debug("Starting config worker: {}".format(socket_path))
+    with open(os.devnull, 'w') as devnull:
+        subprocess.Popen(
+            [sys.executable, '-m', 'nf_core.config_daemon', socket_path],
+            stdin=devnull, stdout=devnull, stderr=devnull,
+            start_new_session=True
+        )
+
+    timeout = time.time() + STARTUP_TIMEOUT
+    while time.time() < timeout:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(socket_path)
+            return True
+        except OSError:
+            time.sleep(0.05)
+    logging.debug("Config worker did not start within {} seconds".format(STARTUP_TIMEOUT))
+    return False
+
+
+def config_fingerprint(wf_path, nxf_env=None):
+    """Cheap fingerprint of the files that make up a workflow config.
+
+    Uses the size and modification time of every file from
+    :func:`nf_core.utils.get_wf_config_files`, plus the client's ``NXF_*`` environment.
+    """
+    fingerprint = []
+    for fn in nf_core.utils.get_wf_config_files(wf_path):
+        try:
+            st = os.stat(fn)
+            fingerprint.append([fn, st.st_size, st.st_mtime_ns])
+        except OSError:
+            pass
+    fingerprint.append(sorted((nxf_env or {}).items()))
+    return json.dumps(fingerprint)
+
+
+class ConfigDaemonHandler(socketserver.StreamRequestHandler):
+    """Handles a single JSON-lines request for a workflow config."""
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline().decode('utf-8'))
+            response = {'config': self.server.resolve(request['wf_path'], request.get('nxf_env', {}))}
+        except AssertionError as e:
+            response = {'error': str(e)}
+        except (ValueError, KeyError, TypeError) as e:
+            response = {'error': "Bad request to config worker: {}".format(e)}
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+
+class ConfigDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server holding resolved workflow configs in memory.
+
+    Args:
+        socket_path (str): Path of the unix socket to listen on.
+        idle_timeout (int): Seconds without a request before shutting down.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path, idle_timeout=IDLE_TIMEOUT):
+        self.socket_path = socket_path
+        self.idle_timeout = idle_timeout
+        self.last_request = time.time()
+        self.configs = {}
+        self.locks = {}
+        self.locks_lock = threading.Lock()
+        # Clear out a stale socket left behind by a previous worker
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        socketserver.UnixStreamServer.__init__(self, socket_path, ConfigDaemonHandler)
+
+    def resolve(self, wf_path, nxf_env=None):
+        """Returns the flat config for a workflow, calling Nextflow only if needed.
+
+        Nextflow is run with the ``NXF_*`` environment variables of the client.
+        """
+        self.last_request = time.time()
+        with self.locks_lock:
+            lock = self.locks.setdefault(wf_path, threading.Lock())
+        # Hold a per-workflow lock so that simultaneous requests share one Nextflow call
+        with lock:
+            fingerprint = config_fingerprint(wf_path, nxf_env)
+            cached = self.configs.get(wf_path)
+            if cached is not None and cached[0] == fingerprint:
+                return cached[1]
+            env = {k: v for k, v in os.environ.items() if not k.startswith('NXF_')}
+            env.update(nxf_env or {})
+            config = nf_core.utils.fetch_wf_config_nextflow(wf_path, env=env)
+            self.configs[wf_path] = (fingerprint, config)
+            return config
+
+    def service_actions(self):
+        """Called by ``serve_forever()`` between requests - stop when idle for too long."""
+        if time.time() - self.last_request > self.idle_timeout:
+            threading.Thread(target=self.shutdown).start()
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+
+def run_daemon(socket_path=None, idle_timeout=IDLE_TIMEOUT):
+    """Runs the config worker in the foreground until it has been idle for ``idle_timeout`` seconds.
+
+    A lock on ``<socket_path>.lock`` is held while the worker runs, so that only
+    one worker replaces a stale socket when several clients start one at once.
+    """
+    import fcntl
+
+    if socket_path is None:
+        socket_path = get_socket_path()
+    socket_dir = os.path.dirname(socket_path)
+    if not os.path.isdir(socket_dir):
+        os.makedirs(socket_dir)
+    with open('{}.lock'.format(socket_path), 'w') as lock_fh:
+        # Another worker may have beaten us to it
+        try:
+            fcntl.flock(lock_fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            logging.debug("Config worker already running: {}".format(socket_path))
+            return
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(socket_path)
+            logging.debug("Config worker already running: {}".format(socket_path))
+            return
+        except OSError:
+            pass
+        server = ConfigDaemon(socket_path, idle_timeout)
+        try:
+            server.serve_forever(poll_interval=1)
+        finally:
+            server.server_close()
+
+
+if __name__ == '__main__':
+    run_daemon(*sys.argv[1:2])
@@ -0,0 +1,927 @@
+#!/usr/bin/env python
+"""Pure-Python evaluation of Nextflow config files.
+
+Produces the same flat ``key = value`` dictionary as ``nextflow config -flat``
+for the subset of the Groovy config syntax used by nf-core pipelines,
+without needing to start a JVM:
+
+* Assignments, dotted names and nested scopes (``params { ... }``)
+* ``includeConfig`` (local files only)
+* ``profiles { ... }`` - only the selected profiles are applied
+* Process selectors (``withName:``, ``withLabel:`` and the old ``$name`` syntax)
+* ``try`` / ``catch``, ``if`` / ``else`` and ``def`` function definitions
+* Strings with ``${...}`` interpolation, numbers, booleans, lists, maps,
+  memory units (``2.GB``), durations (``4.h``) and closures (kept as source text)
+
+Anything outside of this subset raises :class:`ConfigParseError`, so that the
+caller can fall back to running Nextflow. Set ``NFCORE_CONFIG_PARSER=python``
+to use this parser in :func:`nf_core.utils.fetch_wf_config`, or
+``NFCORE_CONFIG_PARSER=verify`` to run both and log any differences.
+"""
+
+import copy
+import logging
+import os
+import re
+
+
+class ConfigParseError(Exception):
+    """Exception raised when a config file uses syntax that we can't evaluate
+    """
+    pass
+
+
+class ConfigIncludeError(ConfigParseError):
+    """Exception raised when an included config file can't be read.
+
+    Nextflow fails at runtime for these too, so a ``try`` block can catch them.
+    """
+    pass
+
+
+def fetch_wf_config(wf_path, profiles=None):
+    """Evaluates the ``nextflow.config`` of a workflow.
+
+    Args:
+        wf_path (str): Nextflow workflow file system path.
+        profiles (list): Config profiles to apply. Default: ``standard``, like Nextflow.
+
+    Returns:
+        dict: Flat workflow configuration settings, formatted like ``nextflow config -flat``.
+
+    Raises:
+        ConfigParseError, if the config could not be evaluated.
+    """
+    evaluator = ConfigEvaluator(wf_path, profiles)
+    evaluator.include_file(os.path.join(evaluator.wf_path, 'nextflow.config'))
+    return flatten_config(evaluator.config)
+
+
+def compare_wf_config(python_config, nextflow_config):
+    """Compares the output of this parser with that from ``nextflow config -flat``.
+
+    Args:
+        python_config (dict): Flat config from :func:`fetch_wf_config`.
+        nextflow_config (dict): Flat config from :func:`nf_core.utils.fetch_wf_config_nextflow`.
+
+    Returns:
+        dict: Differing keys, mapped to ``(python value, nextflow value)``.
+        Missing values are ``None``.
+    """
+    differences = {}
+    for k in set(python_config) | set(nextflow_config):
+        if python_config.get(k) != nextflow_config.get(k):
+            differences[k] = (python_config.get(k), nextflow_config.get(k))
+    return differences
+
+
+#
+# Value types
+#
+class ConfigScope(dict):
+    """A nested config scope such as ``params`` or ``process``.
+
+    Unlike a map literal, scopes are flattened into dotted keys.
+    """
+    pass
+
+
+class Closure(object):
+    """A Groovy closure, which is never evaluated - we only keep its source."""
+
+    def __init__(self, source):
+        self.source = source
+
+    def __str__(self):
+        return '{ ' + self.source + ' }' if self.source else '{}'
+
+
+class MemoryUnit(object):
+    """A Nextflow memory amount such as ``7.GB``."""
+    UNITS = ['B', 'KB', 'MB', 'GB', 'TB', 'PB', 'EB', 'ZB']
+
+    def __init__(self, value, unit):
+        self.bytes = int(value * 1024 ** self.UNITS.index(unit.upper()))
+
+    def __str__(self):
+        idx = 0
+        value = float(self.bytes)
+        while value >= 1024 and idx < len(self.UNITS) - 1:
+            value /= 1024
+            idx += 1
+        return '{} {}'.format(_format_decimal(value), self.UNITS[idx])
+
+
+class Duration(object):
+    """A Nextflow duration such as ``4.h``."""
+    UNITS = {
+        'ms': 1, 'milli': 1, 'millis': 1,
+        's': 1000, 'sec': 1000, 'second': 1000, 'seconds': 1000,
+        'm': 60000, 'min': 60000, 'minute': 60000, 'minutes': 60000,
+        'h': 3600000, 'hour': 3600000, 'hours': 3600000,
+        'd': 86400000, 'day': 86400000, 'days': 86400000
+    }
+
+    def __init__(self, value, unit):
+        self.millis = int(value * self.UNITS[unit])
+
+    def __str__(self):
+        if self.millis < 1000:
+            return '{}ms'.format(self.millis)
+        parts = []
+        remainder = self.millis // 1000
+        for suffix, secs in [('d', 86400), ('h', 3600), ('m', 60), ('s', 1)]:
+            if remainder >= secs:
+                parts.append('{}{}'.format(remainder // secs, suffix))
+                remainder = remainder % secs
+        return ' '.join(parts)
+
+
+def _format_decimal(value):
+    """Format a number like Java's ``DecimalFormat('0.#')``."""
+    value = round(value, 1)
+    if value == int(value):
+        return str(int(value))
+    return str(value)
+
+
+def to_groovy_string(value):
+    """Converts a value to a string, like Groovy ``toString()`` / GString interpolation."""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if value is None:
+        return 'null'
+    if isinstance(value, list):
+        return '[' + ', '.join(to_groovy_string(v) for v in value) + ']'
+    if isinstance(value, dict):
+        if len(value) == 0:
+            return '[:]'
+        return '[' + ', '.join('{}:{}'.format(k, to_groovy_string(v)) for k, v in value.items()) + ']'
+    return str(value)
+
+
+def render_value(value):
+    """Renders a value in the format used by ``nextflow config -flat``."""
+    if isinstance(value, str):
+        return "'" + value.replace('\\', '\\\\').replace("'", "\\'") + "'"
+    if isinstance(value, (MemoryUnit, Duration)):
+        return "'" + str(value) + "'"
+    if isinstance(value, list):
+        return '[' + ', '.join(render_value(v) for v in value) + ']'
+    if isinstance(value, dict) and not isinstance(value, ConfigScope):
+        if len(value) == 0:
+            return '[:]'
+        return '[' + ', '.join('{}:{}'.format(k, render_value(v)) for k, v in value.items()) + ']'
+    return to_groovy_string(value)
+
+
+def flatten_config(scope, prefix=''):
+    """Flattens nested config scopes into a dict of ``dotted.key: rendered value``."""
+    flat = {}
+    for k, v in scope.items():
+        key = '{}{}'.format(prefix, k)
+        if isinstance(v, ConfigScope):
+            flat.update(flatten_config(v, key + '.'))
+        else:
+            flat[key] = render_value(v)
+    return flat
+
+
+#
+# Tokeniser
+#
+TOKEN_RE = re.compile(r'''
+    (?P<nl>\n)
+  | (?P<ws>[ \t\r\f]+|\\\n)
+  | (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<tstring>\'\'\'.*?\'\'\'|""".*?""")
+  | (?P<string>'(?:\\.|[^'\\\n])*'|"(?:\\.|[^"\\])*")
+  | (?P<number>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+  | (?P<ident>[A-Za-z_$][\w$]*)
+  | (?P<op>\?:|\?\.|==|!=|<=|>=|&&|\|\||[=<>!+\-*/%?:,.()\[\]{};])
+''', re.VERBOSE | re.DOTALL)
+
+
+class Token(object):
+    def __init__(self, kind, value, start, end):
+        self.kind = kind
+        self.value = value
+        self.start = start
+        self.end = end
+
+    def __repr__(self):
+        return 'Token({}, {!r})'.format(self.kind, self.value)
+
+
+def tokenise(source):
+    """Splits config source text into a list of :class:`Token` objects."""
+    tokens = []
+    pos = 0
+    if source.startswith('#!'):
+        pos = source.find('\n') if '\n' in source else len(source)
+    while pos < len(source):
+        m = TOKEN_RE.match(source, pos)
+        if not m:
+            raise ConfigParseError("Unexpected character {!r} at position {}".format(source[pos], pos))
+        kind = m.lastgroup
+        if kind == 'tstring':
+            tokens.append(Token('string', m.group(kind), m.start(), m.end()))
+        elif kind not in ['ws', 'comment']:
+            tokens.append(Token(kind, m.group(kind), m.start(), m.end()))
+        pos = m.end()
+    tokens.append(Token('eof', None, len(source), len(source)))
+    return tokens
+
+
+STRING_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', '\\': '\\', "'": "'", '"': '"', '$': '$'}
+
+
+def _unescape(text):
+    return re.sub(r'\\(.)', lambda m: STRING_ESCAPES.get(m.group(1), '\\' + m.group(1)), text, flags=re.DOTALL)
+
+
+#
+# Parser and evaluator
+#
+class ConfigEvaluator(object):
+    """Evaluates Nextflow config statements into nested :class:`ConfigScope` objects.
+
+    Args:
+        wf_path (str): Workflow directory, used for ``baseDir`` / ``projectDir``.
+        profiles (list): Config profiles to apply.
+    """
+
+    def __init__(self, wf_path, profiles=None):
+        self.wf_path = os.path.abspath(wf_path)
+        self.profiles = profiles if profiles is not None else ['standard']
+        self.config = ConfigScope()
+        self.variables = {}
+        self.builtins = {
+            'baseDir': self.wf_path,
+            'projectDir': self.wf_path,
+            'launchDir': os.getcwd(),
+        }
+        self.included_files = []
+        # Files currently being evaluated, to catch include cycles
+        self.include_stack = []
+        # Parser state for the file being evaluated
+        self.source = ''
+        self.tokens = []
+        self.pos = 0
+        self.file_dir = self.wf_path
+
+    #
+    # File handling
+    #
+    def include_file(self, path, prefix=None):
+        """Evaluates a config file, with statements relative to scope ``prefix``."""
+        if re.match(r'^\w+://', path):
+            raise ConfigIncludeError("Cannot include remote config file: {}".format(path))
+        if not os.path.isabs(path):
+            path = os.path.join(self.file_dir, path)
+        try:
+            with open(path, 'r') as fh:
+                source = fh.read()
+        except IOError as e:
+            raise ConfigIncludeError("Could not read config file {}: {}".format(path, e))
+        real_path = os.path.realpath(path)
+        if real_path in self.include_stack:
+            raise ConfigIncludeError("Config file includes itself: {}".format(' -> '.join(self.include_stack + [real_path])))
+        self.included_files.append(path)
+
+        saved_state = (self.source, self.tokens, self.pos, self.file_dir)
+        self.source = source
+        self.tokens = tokenise(source)
+        self.pos = 0
+        self.file_dir = os.path.dirname(path)
+        self.include_stack.append(real_path)
+        try:
+            self.parse_statements(prefix or [], top_level=True)
+        except ConfigParseError as e:
+            raise type(e)("{}: {}".format(path, e))
+        except (ValueError, TypeError, RecursionError) as e:
+            # Errors from evaluating values (eg. 'abc'.toInteger()) - let Nextflow deal with these
+            raise ConfigParseError("{}: Could not evaluate config: {}".format(path, e))
+        finally:
+            self.include_stack.pop()
+            self.source, self.tokens, self.pos, self.file_dir = saved_state
+
+    #
+    # Token helpers
+    #
+    def peek(self, offset=0):
+        return self.tokens[min(self.pos + offset, len(self.tokens) - 1)]
+
+    def next(self):
+        tok = self.tokens[self.pos]
+        if tok.kind != 'eof':
+            self.pos += 1
+        return tok
+
+    def accept(self, value):
+        if self.peek().kind in ['op', 'ident'] and self.peek().value == value:
+            return self.next()
+        return None
+
+    def expect(self, value):
+        tok = self.next()
+        if tok.value != value or tok.kind not in ['op', 'ident']:
+            raise ConfigParseError("Expected '{}' but found '{}' at position {}".format(value, tok.value, tok.start))
+        return tok
+
+    def skip_newlines(self):
+        while self.peek().kind == 'nl' or (self.peek().kind == 'op' and self.peek().value == ';'):
+            self.next()
+
+    def skip_balanced(self, open_char, close_char):
+        """Skips from an opening bracket to its matching closing bracket, returning the inner source."""
+        start = self.expect(open_char)
+        depth = 1
+        while depth > 0:
+            tok = self.next()
+            if tok.kind == 'eof':
+                raise ConfigParseError("Unbalanced '{}' at position {}".format(open_char, start.start))
+            if tok.kind == 'op' and tok.value == open_char:
+                depth += 1
+            elif tok.kind == 'op' and tok.value == close_char:
+                depth -= 1
+        return self.source[start.end:tok.start]
+
+    #
+    # Statements
+    #
+    def parse_statements(self, prefix, top_level=False):
+        """Parses statements until the end of a block (or file, if ``top_level``)."""
+        while True:
+            self.skip_newlines()
+            tok = self.peek()
+            if tok.kind == 'eof':
+                if not top_level:
+                    raise ConfigParseError("Unexpected end of file")
+                return
+            if tok.kind == 'op' and tok.value == '}':
+                if top_level:
+                    raise ConfigParseError("Unexpected '}}' at position {}".format(tok.start))
+                return
+            self.parse_statement(prefix)
+
+    def parse_block(self, prefix):
+        self.expect('{')
+        self.parse_statements(prefix)
+        self.expect('}')
+
+    def parse_statement(self, prefix):
+        tok = self.peek()
+
+        if tok.kind == 'ident' and tok.value == 'includeConfig':
+            self.next()
+            path = to_groovy_string(self.parse_expression(prefix))
+            self.include_file(path, prefix)
+            return
+
+        if tok.kind == 'ident' and tok.value == 'try':
+            self.parse_try(prefix)
+            return
+
+        if tok.kind == 'ident' and tok.value == 'if':
+            self.parse_if(prefix)
+            return
+
+        if tok.kind == 'ident' and tok.value == 'def':
+            self.parse_def(prefix)
+            return
+
+        if tok.kind == 'ident' and tok.value == 'profiles' and self.peek(1).value == '{' and len(prefix) == 0:
+            self.next()
+            self.parse_profiles()
+            return
+
+        # Scope / process selector name, or dotted assignment target
+        name = self.parse_name()
+        if self.accept('='):
+            value = self.parse_expression(prefix)
+            self.set_value(prefix + name, value)
+        elif self.peek().kind == 'op' and self.peek().value == '{':
+            scope = self.get_scope(prefix + name)
+            if scope is None:
+                raise ConfigParseError("Cannot open scope '{}': already set to a value".format('.'.join(prefix + name)))
+            self.parse_block(prefix + name)
+        else:
+            raise ConfigParseError("Unsupported statement '{}' at position {}".format('.'.join(name), tok.start))
+
+    def parse_name(self):
+        """Parses a dotted name, selector (``withName:foo``) or quoted scope name into a list of keys."""
+        tok = self.next()
+        if tok.kind == 'string':
+            name = [to_groovy_string(self.evaluate_string(tok.value, []))]
+        elif tok.kind == 'ident':
+            name = [tok.value]
+        else:
+            raise ConfigParseError("Unexpected '{}' at position {}".format(tok.value, tok.start))
+
+        # Process selectors - withName:foo / withLabel:'bar'
+        if name[0] in ['withName', 'withLabel'] and self.accept(':'):
+            target = self.next()
+            if target.kind == 'string':
+                target_name = to_groovy_string(self.evaluate_string(target.value, []))
+            elif target.kind == 'ident':
+                target_name = target.value
+            else:
+                raise ConfigParseError("Unexpected process selector at position {}".format(target.start))
+            return ['{}:{}'.format(name[0], target_name)]
+
+        while self.accept('.'):
+            part = self.next()
+            if part.kind == 'ident':
+                name.append(part.value)
+            elif part.kind == 'string':
+                name.append(to_groovy_string(self.evaluate_string(part.value, [])))
+            else:
+                raise ConfigParseError("Unexpected '{}' at position {}".format(part.value, part.start))
+        return name
+
+    def parse_profiles(self):
+        self.expect('{')
+        while True:
+            self.skip_newlines()
+            if self.accept('}'):
+                return
+            profile_tok = self.next()
+            if profile_tok.kind == 'string':
+                profile = to_groovy_string(self.evaluate_string(profile_tok.value, []))
+            elif profile_tok.kind == 'ident':
+                profile = profile_tok.value
+            else:
+                raise ConfigParseError("Unexpected '{}' in profiles at position {}".format(profile_tok.value, profile_tok.start))
+            if profile in self.profiles:
+                self.parse_block([])
+            else:
+                self.skip_balanced('{', '}')
+
+    def parse_try(self, prefix):
+        self.expect('try')
+        saved_pos = self.pos
+        saved_state = (copy.deepcopy(self.config), copy.deepcopy(self.variables))
+        try:
+            self.parse_block(prefix)
+        except ConfigIncludeError as e:
+            # Only failed includes are caught - syntax we can't evaluate must go to Nextflow
+            logging.debug("Ignoring failed 'try' block in config: {}".format(e))
+            # Undo any assignments made before the failure and skip the rest of the try block
+            self.config, self.variables = saved_state
+            self.pos = saved_pos
+            self.skip_balanced('{', '}')
+        self.skip_newlines()
+        # Catch blocks usually just print a warning - we don't evaluate them
+        while self.accept('catch'):
+            self.skip_balanced('(', ')')
+            self.skip_balanced('{', '}')
+            self.skip_newlines()
+        if self.accept('finally'):
+            self.parse_block(prefix)
+
+    def parse_if(self, prefix):
+        self.expect('if')
+        self.expect('(')
+        condition = self.parse_expression(prefix, multiline=True)
+        self.expect(')')
+        self.skip_newlines()
+        self.parse_branch(prefix, self.is_truthy(condition))
+        # Look for an else, which may be on the next line
+        saved_pos = self.pos
+        self.skip_newlines()
+        if self.accept('else'):
+            self.skip_newlines()
+            if self.peek().value == 'if':
+                if self.is_truthy(condition):
+                    # Skip the whole else-if chain
+                    self.skip_if_chain()
+                else:
+                    self.parse_if(prefix)
+            else:
+                self.parse_branch(prefix, not self.is_truthy(condition))
+        else:
+            self.pos = saved_pos
+
+    def skip_if_chain(self):
+        self.expect('if')
+        self.skip_balanced('(', ')')
+        self.skip_newlines()
+        self.skip_balanced('{', '}')
+        saved_pos = self.pos
+        self.skip_newlines()
+        if self.accept('else'):
+            self.skip_newlines()
+            if self.peek().value == 'if':
+                self.skip_if_chain()
+            else:
+                self.skip_balanced('{', '}')
+        else:
+            self.pos = saved_pos
+
+    def parse_branch(self, prefix, run):
+        if self.peek().value != '{':
+            raise ConfigParseError("Only braced if / else blocks are supported (position {})".format(self.peek().start))
+        if run:
+            self.parse_block(prefix)
+        else:
+            self.skip_balanced('{', '}')
+
+    def parse_def(self, prefix):
+        self.expect('def')
+        name = self.next()
+        if name.kind != 'ident':
+            raise ConfigParseError("Unexpected '{}' after def at position {}".format(name.value, name.start))
+        # Function definition - not needed for the flat config
+        if self.peek().value == '(':
+            self.skip_balanced('(', ')')
+            self.skip_newlines()
+            self.skip_balanced('{', '}')
+        # Local variable
+        elif self.accept('='):
+            self.variables[name.value] = self.parse_expression(prefix)
+        else:
+            self.variables[name.value] = None
+
+    #
+    # Config storage
+    #
+    def get_scope(self, keys, create=True):
+        scope = self.config
+        for k in keys:
+            if k not in scope:
+                if not create:
+                    return None
+                scope[k] = ConfigScope()
+            scope = scope[k]
+            if not isinstance(scope, ConfigScope):
+                return None
+        return scope
+
+    def set_value(self, keys, value):
+        scope = self.get_scope(keys[:-1])
+        if scope is None:
+            raise ConfigParseError("Cannot set '{}': parent is already set to a value".format('.'.join(keys)))
+        scope[keys[-1]] = value
+
+    def lookup_name(self, name, prefix):
+        """Resolves a bare name: local variables, then enclosing scopes, then builtins."""
+        if name in self.variables:
+            return self.variables[name]
+        for i in range(len(prefix), -1, -1):
+            scope = self.get_scope(prefix[:i], create=False)
+            if scope is not None and name in scope:
+                return scope[name]
+        if name in self.builtins:
+            return self.builtins[name]
+        if name in ['params', 'env', 'process']:
+            return ConfigScope()
+        raise ConfigParseError("Unknown variable '{}'".format(name))
+
+    #
+    # Expressions
+    #
+    def parse_expression(self, prefix, multiline=False):
+        return self.parse_ternary(prefix, multiline)
+
+    def skip_nl_if(self, multiline):
+        if multiline:
+            while self.peek().kind == 'nl':
+                self.next()
+
+    def parse_ternary(self, prefix, multiline):
+        value = self.parse_binary(prefix, multiline, 0)
+        self.skip_nl_if(multiline)
+        if self.accept('?:'):
+            self.skip_newlines()
+            alternative = self.parse_ternary(prefix, multiline)
+            return value if self.is_truthy(value) else alternative
+        if self.accept('?'):
+            self.skip_newlines()
+            if_true = self.parse_ternary(prefix, multiline)
+            self.skip_newlines()
+            self.expect(':')
+            self.skip_newlines()
+            if_false = self.parse_ternary(prefix, multiline)
+            return if_true if self.is_truthy(value) else if_false
+        return value
+
+    BINARY_LEVELS = [
+        ['||'],
+        ['&&'],
+        ['==', '!=', '<', '>', '<=', '>='],
+        ['+', '-'],
+        ['*', '/', '%'],
+    ]
+
+    def parse_binary(self, prefix, multiline, level):
+        if level == len(self.BINARY_LEVELS):
+            return self.parse_unary(prefix, multiline)
+        left = self.parse_binary(prefix, multiline, level + 1)
+        while True:
+            self.skip_nl_if(multiline)
+            tok = self.peek()
+            if tok.kind != 'op' or tok.value not in self.BINARY_LEVELS[level]:
+                return left
+            self.next()
+            self.skip_newlines()
+            # Short-circuit boolean operators
+            if tok.value == '||' and self.is_truthy(left):
+                self.parse_binary(prefix, multiline, level + 1)
+                left = True
+                continue
+            if tok.value == '&&' and not self.is_truthy(left):
+                self.parse_binary(prefix, multiline, level + 1)
+                left = False
+                continue
+            right = self.parse_binary(prefix, multiline, level + 1)
+            left = self.binary_op(tok.value, left, right)
+
+    def binary_op(self, op, left, right):
+        if op == '||':
+            return self.is_truthy(right)
+        if op == '&&':
+            return self.is_truthy(right)
+        if op == '==':
+            return left == right
+        if op == '!=':
+            return left != right
+        try:
+            if op == '+' and (isinstance(left, str) or isinstance(right, str)):
+                return to_groovy_string(left) + to_groovy_string(right)
+            if op == '+' and isinstance(left, list):
+                return left + (right if isinstance(right, list) else [right])
+            if isinstance(left, bool) or isinstance(right, bool) or not isinstance(left, (int, float)) or not isinstance(right, (int, float)):
+                raise TypeError
+            if op == '+':
+                return left + right
+            if op == '-':
+                return left - right
+            if op == '*':
+                return left * right
+            if op == '/':
+                # Groovy divides integers as BigDecimal, which we only reproduce when there's no remainder
+                if isinstance(left, int) and isinstance(right, int):
+                    if left % right != 0:
+                        raise TypeError
+                    return left // right
+                return left / right
+            if op == '%':
+                return left % right
+            if op == '<':
+                return left < right
+            if op == '>':
+                return left > right
+            if op == '<=':
+                return left <= right
+            if op == '>=':
+                return left >= right
+        except (TypeError, ZeroDivisionError):
+            pass
+        raise ConfigParseError("Unsupported operation: {} {} {}".format(type(left).__name__, op, type(right).__name__))
+
+    def parse_unary(self, prefix, multiline):
+        if self.accept('!'):
+            return not self.is_truthy(self.parse_unary(prefix, multiline))
+        if self.accept('-'):
+            value = self.parse_unary(prefix, multiline)
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ConfigParseError("Cannot negate {}".format(type(value).__name__))
+            return -value
+        return self.parse_postfix(prefix, multiline)
+
+    def parse_postfix(self, prefix, multiline):
+        value = self.parse_primary(prefix)
+        while True:
+            if self.accept('.') or self.accept('?.'):
+                name = self.next()
+                if name.kind == 'string':
+                    attr = to_groovy_string(self.evaluate_string(name.value, prefix))
+                elif name.kind == 'ident':
+                    attr = name.value
+                else:
+                    raise ConfigParseError("Unexpected '{}' at position {}".format(name.value, name.start))
+                if self.peek().kind == 'op' and self.peek().value == '(' and self.peek().start == name.end:
+                    args = self.parse_arguments(prefix)
+                    value = self.call_method(value, attr, args)
+                else:
+                    value = self.get_attribute(value, attr)
+            elif self.peek().kind == 'op' and self.peek().value == '[':
+                self.next()
+                index = self.parse_expression(prefix, multiline=True)
+                self.expect(']')
+                try:
+                    value = value[index]
+                except (KeyError, IndexError, TypeError):
+                    value = None
+            elif self.peek().kind == 'ident' and self.peek().value == 'as':
+                self.next()
+                value = self.cast(value, self.next().value)
+            else:
+                return value
+
+    def parse_arguments(self, prefix):
+        self.expect('(')
+        args = []
+        self.skip_newlines()
+        while not self.accept(')'):
+            args.append(self.parse_expression(prefix, multiline=True))
+            self.skip_newlines()
+            if not self.accept(','):
+                self.skip_newlines()
+                self.expect(')')
+                break
+            self.skip_newlines()
+        return args
+
+    def parse_primary(self, prefix):
+        tok = self.peek()
+        if tok.kind == 'string':
+            self.next()
+            return self.evaluate_string(tok.value, prefix)
+        if tok.kind == 'number':
+            self.next()
+            if re.match(r'^\d+$', tok.value):
+                return int(tok.value)
+            return float(tok.value)
+        if tok.kind == 'op' and tok.value == '(':
+            self.next()
+            self.skip_newlines()
+            value = self.parse_expression(prefix, multiline=True)
+            self.skip_newlines()
+            self.expect(')')
+            return value
+        if tok.kind == 'op' and tok.value == '[':
+            return self.parse_list_or_map(prefix)
+        if tok.kind == 'op' and tok.value == '{':
+            return Closure(self.skip_balanced('{', '}').strip())
+        if tok.kind == 'ident':
+            self.next()
+            if tok.value == 'true':
+                return True
+            if tok.value == 'false':
+                return False
+            if tok.value == 'null':
+                return None
+            if tok.value == 'System':
+                return _System
+            return self.lookup_name(tok.value, prefix)
+        raise ConfigParseError("Unexpected '{}' at position {}".format(tok.value, tok.start))
+
+    def parse_list_or_map(self, prefix):
+        self.expect('[')
+        self.skip_newlines()
+        if self.accept(':'):
+            self.skip_newlines()
+            self.expect(']')
+            return {}
+        items = []
+        mapping = None
+        while not self.accept(']'):
+            # Map keys can be bare words
+            if self.peek().kind in ['ident', 'string'] and self.peek(1).value == ':':
+                key_tok = self.next()
+                key = key_tok.value if key_tok.kind == 'ident' else to_groovy_string(self.evaluate_string(key_tok.value, prefix))
+                self.expect(':')
+                self.skip_newlines()
+                if mapping is None:
+                    mapping = {}
+                mapping[key] = self.parse_expression(prefix, multiline=True)
+            else:
+                items.append(self.parse_expression(prefix, multiline=True))
+            self.skip_newlines()
+            if not self.accept(','):
+                self.skip_newlines()
+                self.expect(']')
+                break
+            self.skip_newlines()
+        if mapping is not None:
+            if items:
+                raise ConfigParseError("Mixed list / map literal")
+            return mapping
+        return items
+
+    def evaluate_string(self, raw, prefix):
+        """Evaluates a string literal token, including GString interpolation."""
+        if raw.startswith("'''"):
+            return _unescape(raw[3:-3])
+        if raw.startswith("'"):
+            return _unescape(raw[1:-1])
+        if raw.startswith('"""'):
+            body = raw[3:-3]
+        else:
+            body = raw[1:-1]
+
+        result = []
+        pos = 0
+        while pos < len(body):
+            char = body[pos]
+            if char == '\\' and pos + 1 < len(body):
+                result.append(STRING_ESCAPES.get(body[pos + 1], '\\' + body[pos + 1]))
+                pos += 2
+            elif char == '$' and body[pos + 1:pos + 2] == '{':
+                end = self._find_interpolation_end(body, pos + 2)
+                result.append(to_groovy_string(self.evaluate_snippet(body[pos + 2:end], prefix)))
+                pos = end + 1
+            elif char == '$':
+                m = re.match(r'[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*', body[pos + 1:])
+                if not m:
+                    result.append(char)
+                    pos += 1
+                    continue
+                result.append(to_groovy_string(self.evaluate_snippet(m.group(0), prefix)))
+                pos += 1 + len(m.group(0))
+            else:
+                result.append(char)
+                pos += 1
+        return ''.join(result)
+
+    def _find_interpolation_end(self, body, start):
+        depth = 1
+        pos = start
+        while pos < len(body):
+            if body[pos] == '{':
+                depth += 1
+            elif body[pos] == '}':
+                depth -= 1
+                if depth == 0:
+                    return pos
+            pos += 1
+        raise ConfigParseError("Unterminated string interpolation: {}".format(body))
+
+    def evaluate_snippet(self, source, prefix):
+        """Evaluates an expression from inside a GString."""
+        saved_state = (self.source, self.tokens, self.pos)
+        self.source = source
+        self.tokens = tokenise(source)
+        self.pos = 0
+        try:
+            value = self.parse_expression(prefix, multiline=True)
+            if self.peek().kind != 'eof':
+                raise ConfigParseError("Could not evaluate '{}'".format(source))
+            return value
+        finally:
+            self.source, self.tokens, self.pos = saved_state
+
+    def get_attribute(self, value, attr):
+        if isinstance(value, bool):
+            raise ConfigParseError("Cannot get '{}' of a boolean".format(attr))
+        if isinstance(value, (int, float)):
+            if attr.upper() in MemoryUnit.UNITS:
+                return MemoryUnit(value, attr)
+            if attr in Duration.UNITS:
+                return Duration(value, attr)
+            raise ConfigParseError("Unknown number unit '{}'".format(attr))
+        if isinstance(value, dict):
+            if attr in value:
+                return value[attr]
+            # Like Groovy ConfigObject, missing keys give an empty object
+            return ConfigScope() if isinstance(value, ConfigScope) else None
+        if value is _System and attr == 'env':
+            return dict(os.environ)
+        raise ConfigParseError("Cannot get '{}' of {}".format(attr, type(value).__name__))
+
+    def call_method(self, value, method, args):
+        if value is _System:
+            if method == 'getenv':
+                return os.environ.get(args[0]) if args else dict(os.environ)
+            raise ConfigParseError("Unsupported method System.{}()".format(method))
+        if isinstance(value, str):
+            string_methods = {
+                'toString': lambda: value,
+                'trim': lambda: value.strip(),
+                'toLowerCase': lambda: value.lower(),
+                'toUpperCase': lambda: value.upper(),
+                'toInteger': lambda: int(value),
+                'isEmpty': lambda: len(value) == 0,
+            }
+            if method in string_methods and len(args) == 0:
+                return string_methods[method]()
+        if method == 'toString' and len(args) == 0:
+            return to_groovy_string(value)
+        raise ConfigParseError("Unsupported method call: {}()".format(method))
+
+    def cast(self, value, type_name):
+        try:
+            if type_name in ['int', 'Integer', 'long', 'Long']:
+                return int(value)
+            if type_name in ['String']:
+                return to_groovy_string(value)
+            if type_name in ['boolean', 'Boolean']:
+                return self.is_truthy(value)
+        except ValueError:
+            pass
+        raise ConfigParseError("Unsupported cast of {} as {}".format(type(value).__name__, type_name))
+
+    def is_truthy(self, value):
+        """Groovy truth."""
+        if isinstance(value, (MemoryUnit, Duration, Closure)):
+            return True
+        return bool(value)
+
+
+class _SystemClass(object):
+    """Stand-in for the Java ``System`` class."""
+    pass
+
+_System = _SystemClass()
@@ -3,21 +3,535 @@
 
 from __future__ import print_function
 
+import click
+import concurrent.futures
 import errno
 from io import BytesIO
 import logging
 import hashlib
 import os
+import re
 import requests
 import shutil
 import subprocess
 import sys
 import tarfile
-from zipfile import ZipFile
+import tempfile
+import threading
+import time
+from zipfile import ZipFile, ZipInfo
 
+import nf_core.cache
 import nf_core.list
 import nf_core.utils
 
+# Size of the blocks that downloads are written to disk in
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# Seconds to wait before the first retry of a failed singularity pull, doubled each time
+PULL_RETRY_DELAY = 5
+# Default size limit for the shared singularity image cache
+IMAGE_CACHE_MAX_SIZE = 100 * 1024 * 1024 * 1024
+# Multi-threaded compression tools to use for tar archives, if installed
+TAR_COMPRESSORS = {
+    'gz': [['pigz', '-c']],
+    'bz2': [['pbzip2', '-c'], ['lbzip2', '-c']],
+    'zst': [['zstd', '-T0', '-q', '-c']]
+}
+# Checksums saved for every downloaded file, and the buffer size used to calculate them
+HASH_ALGORITHMS = ('md5', 'sha256')
+HASH_BUFFER_SIZE = 8 * 1024 * 1024
+# File name of the checksum manifest for each algorithm, compatible with `md5sum -c` / `sha256sum -c`
+CHECKSUM_MANIFEST = 'checksums.{}'
+# Commands to extract each type of archive
+EXTRACT_COMMANDS = {
+    'tar.gz': 'tar -xzf',
+    'tar.bz2': 'tar -xjf',
+    'tar.zst': 'tar --zstd -xf',
+    'zip': 'unzip'
+}
+
+
+def download_file(url, out_fn, show_progress=True, headers=None):
+    """Streams a file from a URL to disk, without holding it in memory.
+
+    Data is written to ``<out_fn>.part`` as it arrives, and moved to
+    ``out_fn`` once complete. If a partial download from an earlier run is
+    found, it is resumed with a HTTP ``Range`` request, as long as the
+    server confirms (with ``If-Range``) that the file has not changed since.
+
+    Args:
+        url (str): URL to download.
+        out_fn (str): Path to save the file to.
+        show_progress (bool): Show a progress bar if the size of the file is known. Default: True.
+        headers (dict): Extra request headers, eg. for a conditional request.
+
+    Returns:
+        dict: Response headers, or None if the server replied that the file was not modified.
+
+    Raises:
+        IOError, if the file could not be downloaded.
+    """
+    part_fn = '{}.part'.format(out_fn)
+    etag_fn = '{}.etag'.format(part_fn)
+    request_headers = dict(headers or {})
+    # Don't let requests_cache hold a copy of the whole file
+    request_headers['Cache-Control'] = 'no-store'
+
+    # Resume where a previous download left off
+    offset = 0
+    if os.path.isfile(part_fn) and os.path.isfile(etag_fn):
+        offset = os.path.getsize(part_fn)
+        with open(etag_fn, 'r') as fh:
+            request_headers['If-Range'] = fh.read().strip()
+        request_headers['Range'] = 'bytes={}-'.format(offset)
+        logging.debug("Resuming download of {} from {} bytes".format(url, offset))
+
+    try:
+        response = requests.get(url, headers=request_headers, stream=True, timeout=30)
+    except requests.exceptions.RequestException as e:
+        raise IOError("Could not download {}: {}".format(url, e))
+    with response:
+        if response.status_code == 416:
+            # The partial file is no use - start again
+            logging.debug("Could not resume download of {}".format(url))
+            os.remove(part_fn)
+            os.remove(etag_fn)
+            return download_file(url, out_fn, show_progress, headers)
+        if response.status_code == 304:
+            return None
+        if response.status_code not in [200, 206]:
+            raise IOError("Could not download {} (HTML {} Error)".format(url, response.status_code))
+
+        # Server sends the whole file if it can't resume or the file has changed
+        if response.status_code == 200:
+            offset = 0
+            if response.headers.get('ETag'):
+                with open(etag_fn, 'w') as fh:
+                    fh.write(response.headers['ETag'])
+            elif os.path.isfile(etag_fn):
+                os.remove(etag_fn)
+
+        total_size = None
+        if response.headers.get('Content-Length') and not response.headers.get('Content-Encoding'):
+            total_size = offset + int(response.headers['Content-Length'])
+
+        with open(part_fn, 'ab' if offset > 0 else 'wb') as fh:
+            chunks = response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE)
+            if show_progress and total_size is not None:
+                label = 'Downloading {}'.format(os.path.basename(out_fn))
+                with click.progressbar(length=total_size, label=label, file=sys.stderr) as bar:
+                    bar.update(offset)
+                    for chunk in chunks:
+                        fh.write(chunk)
+                        bar.update(len(chunk))
+            else:
+                for chunk in chunks:
+                    fh.write(chunk)
+
+    if total_size is not None and os.path.getsize(part_fn) != total_size:
+        raise IOError("Download of {} is incomplete: got {} of {} bytes".format(url, os.path.getsize(part_fn), total_size))
+    os.rename(part_fn, out_fn)
+    if os.path.isfile(etag_fn):
+        os.remove(etag_fn)
+    return response.headers
+
+
+def fetch_cached_file(url, cache_fn, immutable=False):
+    """Downloads a file to a local cache, only fetching it again if it has changed.
+
+    The ``ETag`` and ``Last-Modified`` headers of the response are stored in the
+    ``downloads`` namespace of the shared cache, and sent back with the next
+    request for the same URL so that the server can reply that nothing changed.
+    If the server can't be reached, the cached copy is used.
+
+    The cache directory can be shared by several downloads at once, so each
+    one writes to its own temporary file, which is then moved into place.
+
+    Args:
+        url (str): URL to download.
+        cache_fn (str): Path to keep the file at.
+        immutable (bool): The file at this URL never changes, so use any cached copy without checking.
+
+    Returns:
+        str: ``cache_fn``
+
+    Raises:
+        IOError, if the file could not be downloaded and there is no cached copy.
+    """
+    cache = nf_core.cache.get_cache()
+    validators = cache.get('downloads', url) if os.path.isfile(cache_fn) else None
+    if validators is not None and immutable:
+        logging.debug("Using cached download: {}".format(cache_fn))
+        return cache_fn
+
+    headers = {}
+    if validators is not None:
+        if validators.get('ETag'):
+            headers['If-None-Match'] = validators['ETag']
+        if validators.get('Last-Modified'):
+            headers['If-Modified-Since'] = validators['Last-Modified']
+    if not os.path.isdir(os.path.dirname(cache_fn)):
+        os.makedirs(os.path.dirname(cache_fn))
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(cache_fn), prefix='{}.'.format(os.path.basename(cache_fn)), suffix='.tmp', delete=False) as fh:
+        tmp_fn = fh.name
+    try:
+        response_headers = download_file(url, tmp_fn, headers=headers)
+        if response_headers is not None:
+            os.replace(tmp_fn, cache_fn)
+    except IOError as e:
+        if validators is None:
+            raise e
+        logging.warning("{}\nUsing cached copy from a previous download: {}".format(e, cache_fn))
+        return cache_fn
+    finally:
+        for fn in [tmp_fn, '{}.part'.format(tmp_fn), '{}.part.etag'.format(tmp_fn)]:
+            if os.path.isfile(fn):
+                os.remove(fn)
+
+    if response_headers is None:
+        logging.debug("Cached download is up to date: {}".format(cache_fn))
+    else:
+        cache.set('downloads', url, {k: response_headers.get(k) for k in ['ETag', 'Last-Modified']})
+    return cache_fn
+
+
+class HashingFile(object):
+    """Wraps a file object, calculating checksums of all data read from or written to it.
+
+    Args:
+        fh (file): File object to wrap.
+        algorithms (tuple): Names of :mod:`hashlib` algorithms to use. Default: md5 and sha256.
+    """
+    def __init__(self, fh, algorithms=HASH_ALGORITHMS):
+        self.fh = fh
+        self.hashes = {algorithm: hashlib.new(algorithm) for algorithm in algorithms}
+
+    def read(self, size=-1):
+        data = self.fh.read(size)
+        for h in self.hashes.values():
+            h.update(data)
+        return data
+
+    def write(self, data):
+        for h in self.hashes.values():
+            h.update(data)
+        return self.fh.write(data)
+
+    def flush(self):
+        self.fh.flush()
+
+    def hexdigests(self):
+        """Returns the checksums of all data so far, as a dict of hex digests per algorithm."""
+        return {algorithm: h.hexdigest() for algorithm, h in self.hashes.items()}
+
+
+def file_checksums(fname, algorithms=HASH_ALGORITHMS):
+    """Calculates checksums for a file, reading it only once.
+
+    Args:
+        fname (str): Path to a local file.
+        algorithms (tuple): Names of :mod:`hashlib` algorithms to use. Default: md5 and sha256.
+
+    Returns:
+        dict: Hex digest for each algorithm
+    """
+    hashes = [hashlib.new(algorithm) for algorithm in algorithms]
+    buf = bytearray(HASH_BUFFER_SIZE)
+    view = memoryview(buf)
+    with open(fname, 'rb', buffering=0) as fh:
+        for size in iter(lambda: fh.readinto(buf), 0):
+            for h in hashes:
+                h.update(view[:size])
+    return {algorithm: h.hexdigest() for algorithm, h in zip(algorithms, hashes)}
+
+
+def get_checksums(paths, max_workers=None):
+    """Calculates checksums for many files at once, with :func:`file_checksums`.
+
+    Returns:
+        dict: Checksums for each path
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or min(8, os.cpu_count() or 1)) as executor:
+        return dict(zip(paths, executor.map(file_checksums, paths)))
+
+
+def get_checksum_manifests(checksums):
+    """Makes the contents of a checksum manifest for each algorithm.
+
+    Args:
+        checksums (dict): Checksums for each relative path, from :func:`file_checksums`.
+
+    Returns:
+        dict: Manifest contents in bytes, for each manifest file name
+    """
+    manifests = {}
+    for algorithm in HASH_ALGORITHMS:
+        lines = ['{}  {}\n'.format(checksums[path][algorithm], path) for path in sorted(checksums)]
+        manifests[CHECKSUM_MANIFEST.format(algorithm)] = ''.join(lines).encode('utf-8')
+    return manifests
+
+
+def read_checksum_manifest(content):
+    """Parses a checksum manifest, as written by :func:`get_checksum_manifests` or ``sha256sum``.
+
+    Returns:
+        dict: Checksum for each relative path
+    """
+    checksums = {}
+    for l in content.decode('utf-8').splitlines():
+        if l.strip() == '':
+            continue
+        checksum, path = l.split(None, 1)
+        checksums[path.lstrip('*')] = checksum
+    return checksums
+
+
+def verify_download(path):
+    """Checks a download against its checksum manifest.
+
+    Args:
+        path (str): A download directory or archive made by :class:`DownloadWorkflow`.
+
+    Returns:
+        bool: True if every file matches its checksum
+    """
+    manifest_fn = CHECKSUM_MANIFEST.format('sha256')
+    checksums = {}
+    manifest = None
+
+    # Downloaded directory
+    if os.path.isdir(path):
+        try:
+            with open(os.path.join(path, manifest_fn), 'rb') as fh:
+                manifest = read_checksum_manifest(fh.read())
+        except IOError:
+            manifest = None
+        else:
+            paths = [os.path.join(path, rel_path) for rel_path in manifest if os.path.isfile(os.path.join(path, rel_path))]
+            for fn, fn_checksums in get_checksums(paths).items():
+                checksums[os.path.relpath(fn, path)] = fn_checksums['sha256']
+
+    # Archive
+    else:
+        archive_checksum_fn = '{}.sha256'.format(path)
+        if os.path.isfile(archive_checksum_fn):
+            with open(archive_checksum_fn, 'rb') as fh:
+                expected = list(read_checksum_manifest(fh.read()).values())[0]
+            if file_checksums(path, ['sha256'])['sha256'] != expected:
+                logging.error("Checksum does not match for archive: {}".format(path))
+                return False
+            logging.info("Checksum matches for archive: {}".format(path))
+        for member_path, fh in iter_archive_files(path):
+            rel_path = member_path.split('/', 1)[-1]
+            if rel_path == manifest_fn:
+                manifest = read_checksum_manifest(fh.read())
+            else:
+                hashing_fh = HashingFile(fh, ['sha256'])
+                for chunk in iter(lambda: hashing_fh.read(HASH_BUFFER_SIZE), b''):
+                    pass
+                checksums[rel_path] = hashing_fh.hexdigests()['sha256']
+
+    if manifest is None:
+        logging.error("Could not find checksum manifest '{}' in: {}".format(manifest_fn, path))
+        return False
+
+    failed = False
+    for rel_path in sorted(manifest):
+        if rel_path not in checksums:
+            logging.error("File is missing: {}".format(rel_path))
+            failed = True
+        elif checksums[rel_path] != manifest[rel_path]:
+            logging.error("Checksum does not match: {}".format(rel_path))
+            failed = True
+    for rel_path in sorted(set(checksums) - set(manifest)):
+        if rel_path not in [CHECKSUM_MANIFEST.format(algorithm) for algorithm in HASH_ALGORITHMS]:
+            logging.warning("File is not in checksum manifest: {}".format(rel_path))
+    if not failed:
+        logging.info("Checksums match for all {} files in: {}".format(len(manifest), path))
+    return not failed
+
+
+def iter_archive_files(path):
+    """Reads through the files in a download archive, without extracting it.
+
+    Yields:
+        tuple: (path in archive, file object) for each file
+    """
+    if path.endswith('.zip'):
+        with ZipFile(path) as zip_fh:
+            for zinfo in zip_fh.infolist():
+                if not zinfo.is_dir():
+                    with zip_fh.open(zinfo) as fh:
+                        yield zinfo.filename, fh
+        return
+
+    proc = None
+    if path.endswith('.zst'):
+        # There's no zstd support in the Python standard library
+        proc = subprocess.Popen(['zstd', '-dc', path], stdout=subprocess.PIPE)
+        tar = tarfile.open(fileobj=proc.stdout, mode='r|')
+    else:
+        tar = tarfile.open(path, mode='r|*')
+    with tar:
+        for member in tar:
+            if member.isreg():
+                yield member.name, tar.extractfile(member)
+    if proc is not None:
+        proc.stdout.close()
+        proc.wait()
+
+
+def get_tar_compressor(ctype):
+    """Finds a multi-threaded compression tool for tar archives.
+
+    Args:
+        ctype (str): Compression type: `gz`, `bz2` or `zst`.
+
+    Returns:
+        list: Command to compress stdin to stdout, or None if no tool is installed.
+    """
+    for command in TAR_COMPRESSORS.get(ctype, []):
+        if shutil.which(command[0]) is not None:
+            return command
+    return None
+
+
+def link_or_copy(src, dest):
+    """Hard-links a file, or copies it if it is on a different file system.
+
+    Replaces ``dest`` if it already exists.
+    """
+    if os.path.lexists(dest):
+        os.remove(dest)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
+class SingularityImageCache(object):
+    """Shared cache of singularity images, reused between downloads.
+
+    Images are kept in ``cache_dir``, by default ``$NXF_SINGULARITY_CACHEDIR``
+    so that they can also be used by Nextflow.
+    They are named the same way as Nextflow names them.
+
+    Images are content-addressed: the sha256 of each image added to the cache
+    is recorded, and an image identical to one already cached (eg. the same
+    image under a new tag) is stored as a hard link to the existing file.
+    Once the cache is bigger than ``max_size``, the least recently used
+    images are removed. Only images added by nf-core/tools are ever removed.
+
+    The index of images added by nf-core/tools is kept in ``index_dir``,
+    in a file named after the cache directory, so that nothing but images
+    is written to a directory that Nextflow also uses.
+
+    Args:
+        cache_dir (str): Directory to keep images in. Default: ``$NXF_SINGULARITY_CACHEDIR``.
+        max_size (int): Size limit for the cache, in bytes. Default: 100 GB.
+        index_dir (str): Directory to keep the index in. Default: ``~/.nfcore/singularity-image-index``.
+
+    Raises:
+        AssertionError, if no cache directory is given and ``$NXF_SINGULARITY_CACHEDIR`` is not set.
+    """
+    def __init__(self, cache_dir=None, max_size=IMAGE_CACHE_MAX_SIZE, index_dir=None):
+        if cache_dir is None:
+            cache_dir = os.environ.get('NXF_SINGULARITY_CACHEDIR')
+        assert cache_dir, "No singularity image cache directory given and $NXF_SINGULARITY_CACHEDIR is not set"
+        if index_dir is None:
+            index_dir = os.path.join(os.getenv("HOME"), '.nfcore', 'singularity-image-index')
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        # Index of images added by us: file name -> sha256, and sha256 -> file name
+        index_name = hashlib.sha256(os.path.realpath(self.cache_dir).encode('utf-8')).hexdigest()[:16]
+        self.index = nf_core.cache.CacheStore(os.path.join(index_dir, '{}.sqlite'.format(index_name)), max_age=float('inf'))
+        self._lock = threading.Lock()
+
+    def get_path(self, container):
+        """Returns the path of the cached image for a container, named as Nextflow does."""
+        name = container.replace('docker://', '')
+        return os.path.join(self.cache_dir, '{}.img'.format(name.replace('/', '-').replace(':', '-')))
+
+    def fetch(self, container, out_path):
+        """Links or copies the cached image for a container to ``out_path``.
+
+        Returns:
+            bool: True if the image was found in the cache.
+        """
+        cache_path = self.get_path(container)
+        if not os.path.isfile(cache_path):
+            return False
+        link_or_copy(cache_path, out_path)
+        # Mark as recently used
+        os.utime(cache_path)
+        logging.debug("Using cached singularity image: {}".format(cache_path))
+        return True
+
+    def add(self, container, image_path):
+        """Moves a newly pulled image into the cache.
+
+        Call :meth:`evict` afterwards to keep the cache within its size limit.
+
+        Args:
+            container (str): Container name the image was pulled from.
+            image_path (str): Path to the image. Should be in :attr:`self.cache_dir`
+                              so that it can be moved into place without copying.
+        """
+        cache_path = self.get_path(container)
+        image_hash = nf_core.utils.get_file_hashes([image_path])[image_path]
+        with self._lock:
+            existing = self.index.get('sha256', image_hash)
+            if existing is not None and os.path.isfile(os.path.join(self.cache_dir, existing)):
+                # Already have this image under another name - share a single copy
+                logging.debug("Singularity image {} is identical to {}".format(container, existing))
+                os.remove(image_path)
+                if os.path.basename(cache_path) != existing:
+                    link_or_copy(os.path.join(self.cache_dir, existing), cache_path)
+            else:
+                os.rename(image_path, cache_path)
+                self.index.set('sha256', image_hash, os.path.basename(cache_path))
+            self.index.set('images', os.path.basename(cache_path), image_hash)
+
+    def evict(self):
+        """Removes least recently used images added by us until the cache is under :attr:`self.max_size`.
+
+        Returns:
+            int: Number of images removed.
+        """
+        with self._lock:
+            images = []
+            for name in self.index.keys('images'):
+                try:
+                    st = os.stat(os.path.join(self.cache_dir, name))
+                except OSError:
+                    # Removed by someone else
+                    self.index.delete('images', name)
+                    continue
+                images.append((st.st_mtime, name, st.st_ino, st.st_size))
+
+            # Hard-linked copies only take up space once
+            inode_sizes = {}
+            inode_counts = {}
+            for _, _, inode, size in images:
+                inode_sizes[inode] = size
+                inode_counts[inode] = inode_counts.get(inode, 0) + 1
+            total_size = sum(inode_sizes.values())
+
+            removed = 0
+            for _, name, inode, size in sorted(images):
+                if total_size <= self.max_size:
+                    break
+                logging.debug("Removing singularity image from cache: {}".format(name))
+                os.remove(os.path.join(self.cache_dir, name))
+                self.index.delete('images', name)
+                inode_counts[inode] -= 1
+                if inode_counts[inode] == 0:
+                    total_size -= size
+                removed += 1
+        return removed
+
 
 class DownloadWorkflow(object):
     """Downloads a nf-core workflow from GitHub to the local file system.
@@ -29,12 +543,32 @@ class DownloadWorkflow(object):
         release (str): The workflow release version to download, like `1.0`. Defaults to None.
         singularity (bool): Flag, if the Singularity container should be downloaded as well. Defaults to False.
         outdir (str): Path to the local download directory. Defaults to None.
+        compress_type (str): Type of archive to create: `tar.gz`, `tar.bz2`, `zip` or `none`. Defaults to `tar.gz`.
+        parallel_downloads (int): Number of singularity images to pull at once. Defaults to 4.
+        configs_revision (str): Branch, tag or commit of nf-core/configs to download. Defaults to `master`.
+        singularity_cache (bool): Keep pulled images in a shared image cache, if there is a cache directory. Defaults to True.
+        singularity_cache_dir (str): Directory for the shared image cache. Defaults to `$NXF_SINGULARITY_CACHEDIR`.
+            The cache isn't used if neither is set.
+        singularity_cache_size (int): Size limit for the shared image cache, in bytes. Defaults to 100 GB.
     """
-    def __init__(self, pipeline, release=None, singularity=False, outdir=None, compress_type='tar.gz'):
+    def __init__(self, pipeline, release=None, singularity=False, outdir=None, compress_type='tar.gz', parallel_downloads=4, configs_revision='master',
+                 singularity_cache=True, singularity_cache_dir=None, singularity_cache_size=IMAGE_CACHE_MAX_SIZE):
         self.pipeline = pipeline
         self.release = release
         self.singularity = singularity
         self.outdir = outdir
+        self.parallel_downloads = parallel_downloads
+        self.configs_revision = configs_revision
+        self.singularity_cache = singularity_cache
+        self.singularity_cache_dir = singularity_cache_dir
+        self.singularity_cache_size = singularity_cache_size
+        # Set when several pipelines share one copy of nf-core/configs
+        self.configs_dir = None
+        self.show_progress = True
+        self.pull_retries = 3
+        self.image_cache = None
+        # Cached images to add straight to the archive: (cache path, path in outdir)
+        self.archive_images = []
         self.output_filename = None
         self.compress_type = compress_type
         if self.compress_type == 'none':
@@ -71,9 +605,15 @@ class DownloadWorkflow(object):
             logging.error("Output file '{}' already exists".format(self.output_filename))
             sys.exit(1)
 
+        # There's no zstd support in the Python standard library
+        if self.compress_type == 'tar.zst' and get_tar_compressor('zst') is None:
+            logging.error("Compression type 'tar.zst' needs the 'zstd' command to be installed")
+            sys.exit(1)
+
         logging.info(
             "Saving {}".format(self.pipeline) +
             "\n Pipeline release: {}".format(self.release) +
+            "\n nf-core/configs revision: {}".format(self.configs_revision) +
             "\n Pull singularity containers: {}".format('Yes' if self.singularity else 'No') +
             "\n {}".format(output_logmsg)
         )
@@ -95,21 +635,42 @@ class DownloadWorkflow(object):
                 logging.info("No container names found in workflow")
             else:
                 os.mkdir(os.path.join(self.outdir, 'singularity-images'))
+                self.image_cache = self.get_image_cache()
                 logging.info("Downloading {} singularity container{}".format(len(self.containers), 's' if len(self.containers) > 1 else ''))
-                for container in self.containers:
-                    try:
-                        # Download from Docker Hub in all cases
-                        self.pull_singularity_image(container)
-                    except RuntimeWarning as r:
-                        # Raise exception if this is not possible
-                        logging.error("Not able to pull image. Service might be down or internet connection is dead.")
-                        raise r
+                try:
+                    # Download from Docker Hub in all cases
+                    self.pull_singularity_images()
+                except RuntimeWarning as r:
+                    # Raise exception if this is not possible
+                    logging.error("Not able to pull image. Service might be down or internet connection is dead.")
+                    raise r
 
         # Compress into an archive
         if self.compress_type is not None:
             logging.info("Compressing download..")
             self.compress_download()
+        else:
+            self.write_checksum_manifest()
+
+        # Only clean up the image cache once all images are in the download
+        if self.image_cache is not None:
+            self.image_cache.evict()
+
 
+    def get_image_cache(self):
+        """Sets up the shared singularity image cache, if it should be used.
+
+        Returns:
+            SingularityImageCache: The image cache, or None if it is turned off or there is no cache directory.
+        """
+        if not self.singularity_cache:
+            return None
+        cache_dir = self.singularity_cache_dir or os.environ.get('NXF_SINGULARITY_CACHEDIR')
+        if not cache_dir:
+            logging.debug("Not using a singularity image cache - $NXF_SINGULARITY_CACHEDIR is not set")
+            return None
+        logging.info("Using singularity image cache: {}".format(cache_dir))
+        return SingularityImageCache(cache_dir, self.singularity_cache_size)
 
     def fetch_workflow_details(self, wfs):
         """Fetches details of a nf-core workflow to download.
@@ -120,7 +681,9 @@ class DownloadWorkflow(object):
         Raises:
             LockupError, if the pipeline can not be found.
         """
-        wfs.get_remote_workflows()
+        # Workflows may already have been fetched for another download
+        if len(wfs.remote_workflows) == 0:
+            wfs.get_remote_workflows()
 
         # Get workflow download details
         for wf in wfs.remote_workflows:
@@ -131,10 +694,9 @@ class DownloadWorkflow(object):
 
                 # Find latest release hash
                 if self.release is None and len(wf.releases) > 0:
-                    # Sort list of releases so that most recent is first
-                    wf.releases = sorted(wf.releases, key=lambda k: k.get('published_at_timestamp', 0), reverse=True)
-                    self.release = wf.releases[0]['tag_name']
-                    self.wf_sha = wf.releases[0]['tag_sha']
+                    # Releases are sorted oldest first
+                    self.release = wf.releases[-1]['tag_name']
+                    self.wf_sha = wf.releases[-1]['tag_sha']
                     logging.debug("No release specified. Using latest release: {}".format(self.release))
                 # Find specified release hash
                 elif self.release is not None:
@@ -189,10 +751,8 @@ class DownloadWorkflow(object):
         """
         logging.debug("Downloading {}".format(self.wf_download_url))
 
-        # Download GitHub zip file into memory and extract
-        url = requests.get(self.wf_download_url)
-        zipfile = ZipFile(BytesIO(url.content))
-        zipfile.extractall(self.outdir)
+        # Download GitHub zip file to disk and extract
+        self.download_and_extract_zip(self.wf_download_url)
 
         # Rename the internal directory name to be more friendly
         gh_name = '{}-{}'.format(self.wf_name, self.wf_sha).split('/')[-1]
@@ -205,17 +765,26 @@ class DownloadWorkflow(object):
 
     def download_configs(self):
         """Downloads the centralised config profiles from nf-core/configs to :attr:`self.outdir`.
+
+        Uses :attr:`self.configs_revision` of nf-core/configs. The zip file is kept
+        in ``~/.nfcore/configs`` and only downloaded again if it has changed.
         """
-        configs_zip_url = "https://github.com/nf-core/configs/archive/master.zip"
-        configs_local_dir = "configs-master"
+        configs_zip_url = "https://github.com/nf-core/configs/archive/{}.zip".format(self.configs_revision)
         logging.debug("Downloading {}".format(configs_zip_url))
 
-        # Download GitHub zip file into memory and extract
-        url = requests.get(configs_zip_url)
-        zipfile = ZipFile(BytesIO(url.content))
-        zipfile.extractall(self.outdir)
+        # Download GitHub zip file to the cache, unless we already have the latest copy
+        configs_zip_fn = os.path.join(
+            os.getenv("HOME"), '.nfcore', 'configs',
+            'configs-{}.zip'.format(re.sub(r'[^\w.\-]', '-', self.configs_revision))
+        )
+        # Commit hashes always point to the same files
+        immutable = re.match(r'^[0-9a-f]{40}$', self.configs_revision) is not None
+        fetch_cached_file(configs_zip_url, configs_zip_fn, immutable)
 
-        # Rename the internal directory name to be more friendly
+        # Extract, renaming the internal directory name to be more friendly
+        with ZipFile(configs_zip_fn) as zipfile:
+            configs_local_dir = zipfile.namelist()[0].split('/')[0]
+            zipfile.extractall(self.outdir)
         os.rename(os.path.join(self.outdir, configs_local_dir), os.path.join(self.outdir, 'configs'))
 
         # Make downloaded files executable
@@ -223,12 +792,32 @@ class DownloadWorkflow(object):
             for fname in filelist:
                 os.chmod(os.path.join(dirpath, fname), 0o775)
 
+    def download_and_extract_zip(self, url):
+        """Downloads a zip file and extracts it into :attr:`self.outdir`.
+
+        The zip file is saved next to :attr:`self.outdir`, so that an interrupted
+        download can be resumed by running the same command again. It is deleted
+        once extracted.
+
+        Args:
+            url (str): URL of the zip file.
+        """
+        zip_fn = os.path.join(
+            os.path.dirname(os.path.abspath(self.outdir)),
+            '.nf-core-download-{}.zip'.format(hashlib.sha1(url.encode('utf-8')).hexdigest()[:12])
+        )
+        download_file(url, zip_fn, self.show_progress)
+        with ZipFile(zip_fn) as zipfile:
+            zipfile.extractall(self.outdir)
+        os.remove(zip_fn)
+
     def wf_use_local_configs(self):
         """Edit the downloaded nextflow.config file to use the local config files
         """
         nfconfig_fn = os.path.join(self.outdir, 'workflow', 'nextflow.config')
         find_str = 'https://raw.githubusercontent.com/nf-core/configs/${params.custom_config_version}'
-        repl_str = '../configs/'
+        configs_dir = self.configs_dir or os.path.join(self.outdir, 'configs')
+        repl_str = '{}/'.format(os.path.relpath(configs_dir, os.path.join(self.outdir, 'workflow')))
         logging.debug("Editing params.custom_config_base in {}".format(nfconfig_fn))
 
         # Load the nextflow.config file into memory
@@ -252,7 +841,65 @@ class DownloadWorkflow(object):
         # Find any config variables that look like a container
         for k,v in self.config.items():
             if k.startswith('process.') and k.endswith('.container'):
-                self.containers.append(v.strip('"').strip("'"))
+                self.add_container(v.strip('"').strip("'"))
+
+    def add_container(self, container):
+        """Adds a container to :attr:`self.containers`, unless it is already there.
+
+        This way, each image is only pulled once even if several processes use it.
+        """
+        if container.replace('docker://', '') not in [c.replace('docker://', '') for c in self.containers]:
+            self.containers.append(container)
+
+    def pull_singularity_images(self):
+        """Pulls all images in :attr:`self.containers`, several at a time.
+
+        Up to :attr:`self.parallel_downloads` images are pulled at once.
+        Failed pulls are retried with an increasing delay.
+
+        Raises:
+            RuntimeWarning, if an image could not be pulled.
+            OSError, if singularity is not installed.
+        """
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.parallel_downloads) as executor:
+            futures = {executor.submit(self.pull_singularity_image_retry, c): c for c in self.containers}
+            try:
+                for idx, future in enumerate(concurrent.futures.as_completed(futures)):
+                    try:
+                        pulled = future.result()
+                    except OSError as e:
+                        if e.errno == errno.ENOENT:
+                            logging.error('Singularity is not installed!')
+                        raise e
+                    logging.info("[{}/{}] {} singularity image: {}".format(
+                        idx + 1, len(futures), 'Pulled' if pulled else 'Using cached', futures[future]
+                    ))
+            finally:
+                # Don't start any more pulls if one has failed
+                for future in futures:
+                    future.cancel()
+
+    def pull_singularity_image_retry(self, container):
+        """Calls :meth:`pull_singularity_image`, retrying up to :attr:`self.pull_retries` times if it fails.
+
+        Args:
+            container (str): A pipeline's container name.
+
+        Returns:
+            bool: True if the image was pulled, False if it was already in the image cache.
+
+        Raises:
+            RuntimeWarning, if the image could not be pulled after all retries.
+        """
+        for attempt in range(self.pull_retries + 1):
+            try:
+                return self.pull_singularity_image(container)
+            except RuntimeWarning as e:
+                if attempt == self.pull_retries:
+                    raise e
+                delay = PULL_RETRY_DELAY * 2 ** attempt
+                logging.warning("{}\nRetrying in {} seconds".format(e, delay))
+                time.sleep(delay)
 
 
     def pull_singularity_image(self, container):
@@ -262,59 +909,219 @@ class DownloadWorkflow(object):
             container (str): A pipeline's container name. Usually it is of similar format
                 to `nfcore/name:dev`.
 
+        Returns:
+            bool: True if the image was pulled, False if it was already in the image cache.
+
         Raises:
+            RuntimeWarning, if Singularity exits with an error or doesn't create the image.
+            OSError, if Singularity is not installed.
             Various exceptions possible from `subprocess` execution of Singularity.
         """
         out_name = '{}.simg'.format(container.replace('nfcore', 'nf-core').replace('/','-').replace(':', '-'))
         out_path = os.path.abspath(os.path.join(self.outdir, 'singularity-images', out_name))
         address = 'docker://{}'.format(container.replace('docker://', ''))
-        singularity_command = ["singularity", "pull", "--name", out_path, address]
+
+        # Use a copy from an earlier download if we have one
+        pull_path = out_path
+        if self.image_cache is not None:
+            if self.use_cached_image(container, out_path):
+                logging.debug("Using cached singularity image: {}".format(address))
+                return False
+            # Pull into the cache directory, so that the image can be moved into place
+            pull_path = '{}.{}.pulling'.format(self.image_cache.get_path(container), os.getpid())
+
+        singularity_command = ["singularity", "pull", "--name", pull_path, address]
         logging.info("Building singularity image from Docker Hub: {}".format(address))
         logging.debug("Singularity command: {}".format(' '.join(singularity_command)))
 
+        # Keep the output of parallel pulls from getting mixed up
+        capture_output = self.parallel_downloads > 1
+
         # Try to use singularity to pull image
-        try:
-            subprocess.call(singularity_command)
-        except OSError as e:
-            if e.errno == errno.ENOENT:
-                # Singularity is not installed
-                logging.error('Singularity is not installed!')
-            else:
-                # Something else went wrong with singularity command
-                raise e
+        # Raises OSError with errno.ENOENT if singularity is not installed
+        proc = subprocess.run(
+            singularity_command,
+            stdout=subprocess.PIPE if capture_output else None,
+            stderr=subprocess.STDOUT if capture_output else None,
+            universal_newlines=True
+        )
+        if proc.returncode != 0:
+            # Don't leave a broken image behind
+            if os.path.exists(pull_path):
+                os.remove(pull_path)
+            error_msg = "Singularity pull of {} failed with exit code {}".format(address, proc.returncode)
+            if capture_output and proc.stdout:
+                error_msg += ":\n{}".format('\n'.join(proc.stdout.strip().splitlines()[-5:]))
+            raise RuntimeWarning(error_msg)
+        if not os.path.isfile(pull_path):
+            raise RuntimeWarning("Singularity pull of {} did not create an image".format(address))
+        if self.image_cache is not None:
+            self.image_cache.add(container, pull_path)
+            self.use_cached_image(container, out_path)
+        return True
+
+    def use_cached_image(self, container, out_path):
+        """Puts an image from the image cache into the download.
+
+        If the download is going to be compressed, the image is not copied
+        into :attr:`self.outdir` at all. Instead, it is added to
+        :attr:`self.archive_images` to be written straight into the archive.
+
+        Returns:
+            bool: True if the image was found in the cache.
+        """
+        if self.compress_type is None:
+            return self.image_cache.fetch(container, out_path)
+        cache_path = self.image_cache.get_path(container)
+        if not os.path.isfile(cache_path):
+            return False
+        os.utime(cache_path)
+        self.archive_images.append((cache_path, out_path))
+        return True
 
     def compress_download(self):
-        """Take the downloaded files and make a compressed .tar.gz archive.
+        """Take the downloaded files and make a compressed archive.
+
+        Singularity images are read straight from the image cache.
+        Tar archives are streamed through a multi-threaded compression tool
+        if one is installed (``pigz``, ``pbzip2`` / ``lbzip2`` or ``zstd``).
+
+        Checksums are calculated as files are added to the archive, and a
+        checksum manifest is added at the end (see :func:`write_checksum_manifest`).
+        Checksums for the archive itself are calculated as it is written, and
+        saved next to it as ``<archive>.md5`` and ``<archive>.sha256``.
         """
         logging.debug('Creating archive: {}'.format(self.output_filename))
+        arcname = os.path.basename(self.outdir)
+        archive_files = self.get_archive_files()
 
-        # .tar.gz and .tar.bz2 files
-        if self.compress_type == 'tar.gz' or self.compress_type == 'tar.bz2':
-            ctype = self.compress_type.split('.')[1]
-            with tarfile.open(self.output_filename, "w:{}".format(ctype)) as tar:
-                tar.add(self.outdir, arcname=os.path.basename(self.outdir))
-            tar_flags = 'xzf' if ctype == 'gz' else 'xjf'
-            logging.info('Command to extract files: tar -{} {}'.format(tar_flags, self.output_filename))
-
-        # .zip files
-        if self.compress_type == 'zip':
-            with ZipFile(self.output_filename, 'w') as zipObj:
-               # Iterate over all the files in directory
-               for folderName, subfolders, filenames in os.walk(self.outdir):
-                   for filename in filenames:
-                       #create complete filepath of file in directory
-                       filePath = os.path.join(folderName, filename)
-                       # Add file to zip
-                       zipObj.write(filePath)
-            logging.info('Command to extract files: unzip {}'.format(self.output_filename))
+        with open(self.output_filename, 'wb') as fh:
+            out_fh = HashingFile(fh)
+
+            # .tar.gz, .tar.bz2 and .tar.zst files
+            if self.compress_type.startswith('tar.'):
+                ctype = self.compress_type.split('.')[1]
+                compressor = get_tar_compressor(ctype)
+                if compressor is not None:
+                    logging.debug("Compressing with: {}".format(' '.join(compressor)))
+                    proc = subprocess.Popen(compressor, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+                    # Hash the compressed output as it is written
+                    copier = threading.Thread(target=shutil.copyfileobj, args=(proc.stdout, out_fh, HASH_BUFFER_SIZE))
+                    copier.start()
+                    try:
+                        with tarfile.open(fileobj=proc.stdin, mode="w|") as tar:
+                            self.add_to_tar(tar, arcname, archive_files)
+                    except BaseException:
+                        # Don't leave the compressor (and the copier thread) waiting for more input
+                        proc.kill()
+                        proc.wait()
+                        raise
+                    finally:
+                        try:
+                            proc.stdin.close()
+                        except BrokenPipeError:
+                            # The compressor has exited - reported below or by the error above
+                            pass
+                        copier.join()
+                    if proc.wait() != 0:
+                        raise IOError("'{}' exited with code {}".format(compressor[0], proc.returncode))
+                else:
+                    with tarfile.open(fileobj=out_fh, mode="w|{}".format(ctype)) as tar:
+                        self.add_to_tar(tar, arcname, archive_files)
+
+            # .zip files
+            if self.compress_type == 'zip':
+                with ZipFile(out_fh, 'w') as zipObj:
+                    self.add_to_zip(zipObj, arcname, archive_files)
+
+        logging.info('Command to extract files: {} {}'.format(EXTRACT_COMMANDS[self.compress_type], self.output_filename))
 
         # Delete original files
         logging.debug('Deleting uncompressed files: {}'.format(self.outdir))
         shutil.rmtree(self.outdir)
 
-        # Caclualte md5sum for output file
-        self.validate_md5(self.output_filename)
+        # Save checksums for output file
+        for algorithm, checksum in sorted(out_fh.hexdigests().items()):
+            logging.info("{} checksum for {}: {}".format(algorithm.upper(), self.output_filename, checksum))
+            with open('{}.{}'.format(self.output_filename, algorithm), 'w') as fh:
+                fh.write('{}  {}\n'.format(checksum, os.path.basename(self.output_filename)))
+
+    def get_archive_files(self):
+        """Lists everything in the download, including images still in the image cache.
 
+        Returns:
+            list: (path on disk, path relative to :attr:`self.outdir`) for each directory and file
+        """
+        archive_files = []
+        for dirpath, dirnames, filenames in os.walk(self.outdir):
+            dirnames.sort()
+            for name in [''] + sorted(filenames):
+                path = os.path.join(dirpath, name) if name else dirpath
+                archive_files.append((path, os.path.normpath(os.path.relpath(path, self.outdir))))
+        for cache_path, out_path in sorted(self.archive_images, key=lambda i: i[1]):
+            archive_files.append((cache_path, os.path.relpath(out_path, os.path.abspath(self.outdir))))
+        return archive_files
+
+    def add_to_tar(self, tar, arcname, archive_files):
+        """Adds files to an open tar archive, followed by a checksum manifest.
+
+        Args:
+            tar (tarfile.TarFile): Archive to add files to.
+            arcname (str): Name of the top-level directory in the archive.
+            archive_files (list): Files to add, from :meth:`get_archive_files`.
+        """
+        checksums = {}
+        for path, rel_path in archive_files:
+            tarinfo = tar.gettarinfo(path, arcname=os.path.normpath(os.path.join(arcname, rel_path)))
+            if tarinfo.isreg():
+                with open(path, 'rb') as fh:
+                    hashing_fh = HashingFile(fh)
+                    tar.addfile(tarinfo, hashing_fh)
+                checksums[rel_path] = hashing_fh.hexdigests()
+            else:
+                tar.addfile(tarinfo)
+        for manifest_fn, content in get_checksum_manifests(checksums).items():
+            tarinfo = tarfile.TarInfo(os.path.join(arcname, manifest_fn))
+            tarinfo.size = len(content)
+            tarinfo.mtime = time.time()
+            tarinfo.mode = 0o644
+            tar.addfile(tarinfo, BytesIO(content))
+
+    def add_to_zip(self, zipObj, arcname, archive_files):
+        """Adds files to an open zip archive, followed by a checksum manifest.
+
+        Args:
+            zipObj (zipfile.ZipFile): Archive to add files to.
+            arcname (str): Name of the top-level directory in the archive.
+            archive_files (list): Files to add, from :meth:`get_archive_files`.
+        """
+        checksums = {}
+        for path, rel_path in archive_files:
+            if not os.path.isfile(path):
+                continue
+            zinfo = ZipInfo.from_file(path, arcname=os.path.join(arcname, rel_path))
+            with open(path, 'rb') as fh, zipObj.open(zinfo, 'w') as zip_fh:
+                hashing_fh = HashingFile(fh)
+                shutil.copyfileobj(hashing_fh, zip_fh, HASH_BUFFER_SIZE)
+            checksums[rel_path] = hashing_fh.hexdigests()
+        for manifest_fn, content in get_checksum_manifests(checksums).items():
+            zipObj.writestr(os.path.join(arcname, manifest_fn), content)
+
+    def write_checksum_manifest(self):
+        """Writes checksum manifests for every file in :attr:`self.outdir`.
+
+        Files are hashed in parallel.
+        """
+        paths = [path for path, _ in self.get_archive_files() if os.path.isfile(path)]
+        checksums = {}
+        for path, path_checksums in get_checksums(paths).items():
+            rel_path = os.path.relpath(path, self.outdir)
+            if rel_path not in [CHECKSUM_MANIFEST.format(algorithm) for algorithm in HASH_ALGORITHMS]:
+                checksums[rel_path] = path_checksums
+        for manifest_fn, content in get_checksum_manifests(checksums).items():
+            with open(os.path.join(self.outdir, manifest_fn), 'wb') as fh:
+                fh.write(content)
+        logging.info("Checksums for all files saved to: {}".format(os.path.join(self.outdir, CHECKSUM_MANIFEST.format('sha256'))))
 
     def validate_md5(self, fname, expected=None):
         """Calculates the md5sum for a file on the disk and validate with expected.
@@ -329,11 +1136,7 @@ class DownloadWorkflow(object):
         logging.debug("Validating image hash: {}".format(fname))
 
         # Calculate the md5 for the file on disk
-        hash_md5 = hashlib.md5()
-        with open(fname, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        file_hash = hash_md5.hexdigest()
+        file_hash = file_checksums(fname, ['md5'])['md5']
 
         if expected is None:
             logging.info("MD5 checksum for {}: {}".format(fname, file_hash))
@@ -342,3 +1145,122 @@ class DownloadWorkflow(object):
                 logging.debug('md5 sum of image matches expected: {}'.format(expected))
             else:
                 raise IOError ("{} md5 does not match remote: {} - {}".format(fname, expected, file_hash))
+
+
+def parse_pipeline_spec(spec):
+    """Splits a ``pipeline@release`` string into the pipeline name and release.
+
+    Returns:
+        tuple: (pipeline, release), with release None if not given
+    """
+    if '@' in spec:
+        pipeline, release = spec.rsplit('@', 1)
+        return pipeline, release or None
+    return spec, None
+
+
+def download_workflows_batch(specs, outdir=None, singularity=False, compress_type='tar.gz', parallel_downloads=4, configs_revision='master',
+                             singularity_cache=True, singularity_cache_dir=None, singularity_cache_size=IMAGE_CACHE_MAX_SIZE):
+    """Downloads several pipelines into a single directory tree or archive.
+
+    The list of nf-core pipelines and nf-core/configs are only fetched once, and
+    containers used by more than one pipeline are only pulled once. Pipelines are
+    downloaded at the same time. The output looks like this::
+
+        <outdir>/
+            configs/
+            nf-core-<pipeline>-<release>/workflow/
+            singularity-images/
+
+    Args:
+        specs (list): Pipelines to download, as ``pipeline`` or ``pipeline@release``.
+        outdir (str): Path to the local download directory. Defaults to `nf-core-pipelines`.
+        singularity (bool): Flag, if the Singularity containers should be downloaded as well. Defaults to False.
+        compress_type (str): Type of archive to create: `tar.gz`, `tar.bz2`, `tar.zst`, `zip` or `none`. Defaults to `tar.gz`.
+        parallel_downloads (int): Number of pipelines / singularity images to download at once. Defaults to 4.
+        configs_revision (str): Branch, tag or commit of nf-core/configs to download. Defaults to `master`.
+        singularity_cache (bool): Keep pulled images in a shared image cache, if there is a cache directory. Defaults to True.
+        singularity_cache_dir (str): Directory for the shared image cache. Defaults to `$NXF_SINGULARITY_CACHEDIR`.
+        singularity_cache_size (int): Size limit for the shared image cache, in bytes. Defaults to 100 GB.
+
+    Returns:
+        list: A :class:`DownloadWorkflow` object for each pipeline.
+    """
+    # Handles everything that is shared between the pipelines
+    batch_dl = DownloadWorkflow(
+        None, None, singularity, outdir or 'nf-core-pipelines', compress_type, parallel_downloads, configs_revision,
+        singularity_cache, singularity_cache_dir, singularity_cache_size
+    )
+    if batch_dl.compress_type is not None:
+        batch_dl.output_filename = '{}.{}'.format(batch_dl.outdir, batch_dl.compress_type)
+    for fn in [batch_dl.outdir, batch_dl.output_filename]:
+        if fn and os.path.exists(fn):
+            logging.error("Output '{}' already exists".format(fn))
+            sys.exit(1)
+    if batch_dl.compress_type == 'tar.zst' and get_tar_compressor('zst') is None:
+        logging.error("Compression type 'tar.zst' needs the 'zstd' command to be installed")
+        sys.exit(1)
+
+    # Find all of the pipelines with a single fetch of the pipelines list
+    wfs = nf_core.list.Workflows()
+    downloads = []
+    for spec in specs:
+        pipeline, release = parse_pipeline_spec(spec)
+        dl = DownloadWorkflow(pipeline, release, singularity, None, 'none', parallel_downloads, configs_revision)
+        try:
+            dl.fetch_workflow_details(wfs)
+        except LookupError:
+            sys.exit(1)
+        dl.outdir = os.path.join(batch_dl.outdir, dl.outdir)
+        dl.configs_dir = os.path.join(batch_dl.outdir, 'configs')
+        dl.show_progress = False
+        if dl.outdir not in [d.outdir for d in downloads]:
+            downloads.append(dl)
+
+    logging.info(
+        "Saving {} pipelines".format(len(downloads)) +
+        "".join("\n {} {}".format(dl.wf_name, dl.release) for dl in downloads) +
+        "\n nf-core/configs revision: {}".format(configs_revision) +
+        "\n Pull singularity containers: {}".format('Yes' if singularity else 'No') +
+        "\n Output {}: {}".format('file' if batch_dl.output_filename else 'directory', batch_dl.output_filename or batch_dl.outdir)
+    )
+    os.makedirs(batch_dl.outdir)
+
+    # Download the centralised configs once for all pipelines
+    logging.info("Downloading centralised configs from GitHub")
+    batch_dl.download_configs()
+
+    # Download the pipeline files, all at the same time
+    def download_wf(dl):
+        dl.download_wf_files()
+        dl.wf_use_local_configs()
+        if singularity:
+            dl.find_container_images()
+    logging.info("Downloading workflow files from GitHub")
+    with concurrent.futures.ThreadPoolExecutor(max_workers=parallel_downloads) as executor:
+        for dl, _ in zip(downloads, executor.map(download_wf, downloads)):
+            logging.debug("Downloaded {} {}".format(dl.wf_name, dl.release))
+
+    # Pull the singularity images used by any of the pipelines
+    if singularity:
+        for dl in downloads:
+            for container in dl.containers:
+                batch_dl.add_container(container)
+        if len(batch_dl.containers) == 0:
+            logging.info("No container names found in workflows")
+        else:
+            os.mkdir(os.path.join(batch_dl.outdir, 'singularity-images'))
+            batch_dl.image_cache = batch_dl.get_image_cache()
+            logging.info("Downloading {} singularity container{}".format(len(batch_dl.containers), 's' if len(batch_dl.containers) > 1 else ''))
+            batch_dl.pull_singularity_images()
+
+    # Compress everything into one archive
+    if batch_dl.compress_type is not None:
+        logging.info("Compressing download..")
+        batch_dl.compress_download()
+    else:
+        batch_dl.write_checksum_manifest()
+    if batch_dl.image_cache is not None:
+        batch_dl.image_cache.evict()
+
+    return downloads
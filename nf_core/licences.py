@@ -12,6 +12,7 @@ import tabulate
 import yaml
 
 import nf_core.lint
+import nf_core.utils
 
 
 class WorkflowLicences(object):
@@ -35,6 +36,9 @@ class WorkflowLicences(object):
     def fetch_conda_licences(self):
         """Fetch package licences from Anaconda and PyPi.
         """
+        # Set up local caching for requests to speed up remote queries
+        nf_core.utils.setup_requests_cachedir()
+
         env_url = 'https://raw.githubusercontent.com/nf-core/{}/master/environment.yml'.format(self.pipeline)
         response = requests.get(env_url)
 
@@ -5,33 +5,41 @@ Tests Nextflow-based pipelines to check that they adhere to
 the nf-core community guidelines.
 """
 
+import collections
+import concurrent.futures
 import datetime
+import fnmatch
 import git
+import hashlib
 import logging
 import io
 import json
+import mmap
 import os
 import re
 import requests
 import subprocess
 import textwrap
+import threading
 
 import click
 import requests
+import tabulate
 import yaml
 
+import nf_core.cache
 import nf_core.utils
 import nf_core.schema
 
-# Set up local caching for requests to speed up remote queries
-nf_core.utils.setup_requests_cachedir()
-
 # Don't pick up debug logs from the requests package
 logging.getLogger("requests").setLevel(logging.WARNING)
 logging.getLogger("urllib3").setLevel(logging.WARNING)
 
+# Number of lint checks to run at once
+CHECK_WORKERS = 8
+
 
-def run_linting(pipeline_dir, release_mode=False, md_fn=None, json_fn=None):
+def run_linting(pipeline_dir, release_mode=False, md_fn=None, json_fn=None, halt_on_failure=True, incremental=False):
     """Runs all nf-core linting checks on a given Nextflow pipeline project
     in either `release` mode or `normal` mode (default). Returns an object
     of type :class:`PipelineLint` after finished.
@@ -40,17 +48,22 @@ def run_linting(pipeline_dir, release_mode=False, md_fn=None, json_fn=None):
         pipeline_dir (str): The path to the Nextflow pipeline root directory
         release_mode (bool): Set this to `True`, if the linting should be run in the `release` mode.
                              See :class:`PipelineLint` for more information.
+        halt_on_failure (bool): Stop running lint checks after the first check with a failed test.
+        incremental (bool): Reuse cached results for checks whose inputs have not changed.
 
     Returns:
         An object of type :class:`PipelineLint` that contains all the linting results.
     """
 
     # Create the lint object
+    # Set up local caching for requests to speed up remote queries
+    nf_core.utils.setup_requests_cachedir()
+
     lint_obj = PipelineLint(pipeline_dir)
 
     # Run the linting tests
     try:
-        lint_obj.lint_pipeline(release_mode)
+        lint_obj.lint_pipeline(release_mode, halt_on_failure, incremental=incremental)
     except AssertionError as e:
         logging.critical("Critical error: {}".format(e))
         logging.info("Stopping tests...")
@@ -83,6 +96,149 @@ def run_linting(pipeline_dir, release_mode=False, md_fn=None, json_fn=None):
     return lint_obj
 
 
+def run_linting_batch(pipeline_dirs, release_mode=False, json_fn=None, halt_on_failure=True, incremental=False, max_workers=None):
+    """Runs all nf-core linting checks on many pipelines at once, using a pool of worker processes.
+
+    Worker processes are reused between pipelines, and share the HTTP request,
+    workflow config and lint result caches on disk.
+
+    Args:
+        pipeline_dirs (list): Paths to the Nextflow pipeline root directories
+        release_mode (bool): Set this to `True`, if the linting should be run in the `release` mode.
+        json_fn (str): File to write the lint results for all pipelines to (JSON)
+        halt_on_failure (bool): Stop running lint checks for a pipeline after the first check with a failed test.
+        incremental (bool): Reuse cached results for checks whose inputs have not changed.
+        max_workers (int): Number of pipelines to lint at once. Default: number of CPUs.
+
+    Returns:
+        dict: Lint results for each pipeline, in the format from :func:`PipelineLint.get_results_dict`.
+        Pipelines with a critical error have the message under ``critical_error``.
+    """
+    results = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_lint_pipeline_worker, pipeline_dir, release_mode, halt_on_failure, incremental): pipeline_dir
+            for pipeline_dir in pipeline_dirs
+        }
+        with click.progressbar(concurrent.futures.as_completed(futures), length=len(futures), label='Linting pipelines') as completed:
+            for future in completed:
+                results[futures[future]] = future.result()
+    # Keep the order that pipelines were given in
+    results = collections.OrderedDict((pipeline_dir, results[pipeline_dir]) for pipeline_dir in pipeline_dirs)
+
+    print_batch_results(results)
+
+    # Save results to JSON file
+    if json_fn is not None:
+        logging.info("Writing lint results to {}".format(json_fn))
+        now = datetime.datetime.now()
+        batch_results = {
+            'nf_core_tools_version': nf_core.__version__,
+            'date_run': now.strftime("%Y-%m-%d %H:%M:%S"),
+            'num_pipelines': len(results),
+            'num_pipelines_failed': len([r for r in results.values() if r['has_tests_failed'] or 'critical_error' in r]),
+            'pipelines': results
+        }
+        with open(json_fn, 'w') as fh:
+            json.dump(batch_results, fh, indent=4)
+
+    return results
+
+
+# Worker process that has been set up by _init_lint_worker
+_lint_worker_pid = None
+
+def _init_lint_worker():
+    """Sets up a worker process of :func:`run_linting_batch`, once per process.
+
+    This is called by each task rather than as a pool ``initializer``, which needs Python 3.7.
+    """
+    global _lint_worker_pid
+    if _lint_worker_pid == os.getpid():
+        return
+    # Results are reported once all pipelines are done
+    logging.getLogger().setLevel(logging.CRITICAL)
+    # Sets up a fresh requests cache in each worker process
+    nf_core.utils.setup_requests_cachedir()
+    _lint_worker_pid = os.getpid()
+
+
+def _lint_pipeline_worker(pipeline_dir, release_mode, halt_on_failure, incremental):
+    """Lints a single pipeline in a worker process of :func:`run_linting_batch`.
+
+    Returns:
+        dict: Lint results, from :func:`PipelineLint.get_results_dict`
+    """
+    _init_lint_worker()
+    lint_obj = PipelineLint(pipeline_dir)
+    lint_obj.show_progress = False
+    try:
+        lint_obj.lint_pipeline(release_mode, halt_on_failure, incremental=incremental)
+    except AssertionError as e:
+        results = lint_obj.get_results_dict()
+        results['critical_error'] = str(e)
+        return results
+    return lint_obj.get_results_dict()
+
+
+def find_pipeline_dirs(batch):
+    """Finds the pipelines to lint with ``nf-core lint --batch``.
+
+    Args:
+        batch (str): A directory containing pipeline directories, or a text file
+                     listing one pipeline directory per line.
+
+    Returns:
+        list: Paths to pipeline directories
+    """
+    if os.path.isdir(batch):
+        is_pipeline = lambda d: any(os.path.isfile(os.path.join(d, fn)) for fn in ['nextflow.config', 'main.nf'])
+        if is_pipeline(batch):
+            return [batch]
+        return [os.path.join(batch, d) for d in sorted(os.listdir(batch)) if is_pipeline(os.path.join(batch, d))]
+    with open(batch, 'r') as fh:
+        return [l.strip() for l in fh if l.strip() and not l.startswith('#')]
+
+
+def print_batch_results(results):
+    """Prints a summary table of the lint results for many pipelines"""
+    table = []
+    for pipeline_dir, r in results.items():
+        if 'critical_error' in r:
+            status = click.style('Critical error: {}'.format(r['critical_error']), fg='red')
+        elif r['has_tests_failed']:
+            status = click.style('Failed', fg='red')
+        elif r['has_tests_warned']:
+            status = click.style('Warnings', fg='yellow')
+        else:
+            status = click.style('Passed', fg='green')
+        table.append([pipeline_dir, r['num_tests_pass'], r['num_tests_warned'], r['num_tests_failed'], status])
+    logging.info("{}\n          LINTING RESULTS\n{}\n\n".format(click.style('='*29, dim=True), click.style('='*35, dim=True)) +
+        tabulate.tabulate(table, headers=['Pipeline', 'Passed', 'Warnings', 'Failed', 'Status'])
+    )
+
+
+class _LintResults(object):
+    """Descriptor for the ``passed``, ``warned`` and ``failed`` result lists.
+
+    While :func:`PipelineLint.lint_pipeline` runs checks in parallel, each check
+    records its results in its own lists, which are merged in order afterwards.
+    """
+    def __init__(self, list_type):
+        self.list_type = list_type
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        check_results = getattr(obj._check_results, 'results', None)
+        if check_results is not None:
+            return check_results[self.list_type]
+        return obj.__dict__[self.list_type]
+
+    def __set__(self, obj, value):
+        obj.__dict__[self.list_type] = value
+
+
 class PipelineLint(object):
     """Object to hold linting information and results.
     All objects attributes are set, after the :func:`PipelineLint.lint_pipeline` function was called.
@@ -92,6 +248,8 @@ class PipelineLint(object):
 
     Attributes:
         conda_config (dict): The parsed conda configuration file content (`environment.yml`).
+        api_rate_limiter (HostRateLimiter): Limits the number of Anaconda / PyPI API requests per second to each host.
+        api_workers (int): Maximum number of Anaconda / PyPI API requests to run at once.
         conda_package_info (dict): The conda package(s) information, based on the API requests to Anaconda cloud.
         config (dict): The Nextflow pipeline configuration file content.
         dockerfile (list): A list of lines (str) from the parsed Dockerfile.
@@ -100,8 +258,11 @@ class PipelineLint(object):
         minNextflowVersion (str): The minimum required Nextflow version to run the pipeline.
         passed (list): A list of tuples of the form: `(<passed no>, <reason>)`
         path (str): Path to the pipeline directory.
+        incremental (bool): `True` if results of checks with unchanged inputs are reused from the cache.
         pipeline_name (str): The pipeline name, without the `nf-core` tag, for example `hlatyping`.
         release_mode (bool): `True`, if you the to linting was run in release mode, `False` else.
+        reused_checks (list): Names of the checks whose results were reused by incremental linting.
+        show_progress (bool): Show a progress bar while running the lint checks. Default: `True`.
         warned (list): A list of tuples of the form: `(<warned no>, <reason>)`
 
     **Attribute specifications**
@@ -138,8 +299,72 @@ class PipelineLint(object):
             params.clusterOptions = false
             ...
     """
+    passed = _LintResults('passed')
+    warned = _LintResults('warned')
+    failed = _LintResults('failed')
+
+    # Checks that use attributes set by other checks, and so must run after them
+    check_dependencies = {
+        'check_licence': ['check_files_exist'],
+        'check_docker': ['check_files_exist'],
+        'check_nextflow_config': ['check_files_exist'],
+        'check_actions_branch_protection': ['check_nextflow_config'],
+        'check_actions_ci': ['check_nextflow_config'],
+        'check_actions_lint': ['check_files_exist'],
+        'check_actions_awstest': ['check_files_exist'],
+        'check_actions_awsfulltest': ['check_files_exist'],
+        'check_readme': ['check_nextflow_config'],
+        'check_conda_env_yaml': ['check_nextflow_config'],
+        'check_conda_dockerfile': ['check_docker'],
+        'check_pipeline_todos': ['check_files_exist'],
+        'check_pipeline_name': ['check_nextflow_config'],
+        'check_cookiecutter_strings': ['check_files_exist'],
+        'check_schema_lint': ['check_files_exist'],
+        'check_schema_params': ['check_nextflow_config', 'check_schema_lint'],
+        'check_version_consistency': ['check_nextflow_config']
+    }
+
+    # Inputs of checks whose results can be reused when linting with `incremental`:
+    # files relative to the pipeline directory ('**' for all pipeline files) and attributes set by other checks.
+    # Checks not listed set attributes used by other checks, or use remote APIs, so always run.
+    check_inputs = {
+        'check_licence': (['LICENSE', 'LICENSE.md', 'LICENCE', 'LICENCE.md'], []),
+        'check_actions_branch_protection': (['.github/workflows/branch.yml'], ['pipeline_name']),
+        'check_actions_ci': (['.github/workflows/ci.yml'], ['config', 'minNextflowVersion']),
+        'check_actions_lint': (['.github/workflows/linting.yml'], []),
+        'check_actions_awstest': (['.github/workflows/awstest.yml'], []),
+        'check_actions_awsfulltest': (['.github/workflows/awsfulltest.yml'], []),
+        'check_readme': (['README.md'], ['files', 'minNextflowVersion']),
+        'check_conda_dockerfile': ([], ['files', 'conda_config', 'dockerfile']),
+        'check_pipeline_todos': (['**'], []),
+        'check_pipeline_name': ([], ['pipeline_name']),
+        'check_cookiecutter_strings': (['**'], []),
+        'check_schema_params': (['nextflow_schema.json'], ['config'])
+    }
+
+    # Scanners run on the contents of every pipeline file by _scan_pipeline_files()
+    # Names map to a marker string that a line must contain, and the method to run on those lines
+    content_scanners = {
+        'todos': (b'TODO nf-core', '_scan_todos'),
+        'cookiecutter': (b'cookiecutter', '_scan_cookiecutter')
+    }
+
     def __init__(self, path):
         """ Initialise linting object """
+        self._check_results = threading.local()
+        self._file_index = None
+        self._file_index_lock = threading.Lock()
+        self._scan_results = None
+        self._scan_lock = threading.Lock()
+        self._git_blob_hashes = None
+        self._git_blob_hashes_lock = threading.Lock()
+        self.incremental = False
+        self.reused_checks = []
+        self.show_progress = True
+        self._api_sessions = threading.local()
+        self._api_prefetch = {}
+        self.api_workers = 16
+        self.api_rate_limiter = nf_core.utils.HostRateLimiter(rate=10)
         self.release_mode = False
         self.path = path
         self.git_sha = None
@@ -165,18 +390,27 @@ class PipelineLint(object):
         if os.environ.get('GITHUB_PR_COMMIT', '') != '':
             self.git_sha = os.environ['GITHUB_PR_COMMIT']
 
-    def lint_pipeline(self, release_mode=False):
+    def lint_pipeline(self, release_mode=False, halt_on_failure=True, max_workers=None, incremental=False):
         """Main linting function.
 
-        Takes the pipeline directory as the primary input and iterates through
-        the different linting checks in order. Collects any warnings or errors
+        Takes the pipeline directory as the primary input and runs through
+        the different linting checks. Collects any warnings or errors
         and returns summary at completion. Raises an exception if there is a
         critical error that makes the rest of the tests pointless (eg. no
         pipeline script). Results from this function are printed by the main script.
 
+        Checks run in parallel as soon as the checks they depend on
+        (see :attr:`check_dependencies`) have finished. Results are always
+        recorded in the order that the checks are listed below.
+
         Args:
             release_mode (boolean): Activates the release mode, which checks for
                 consistent version tags of containers. Default is `False`.
+            halt_on_failure (boolean): Stop after the first check with a failed test,
+                as if the checks had been run one after another. Default is `True`.
+            max_workers (int): Number of checks to run at once. Default: :data:`CHECK_WORKERS`.
+            incremental (boolean): Reuse cached results for checks whose inputs
+                (see :attr:`check_inputs`) have not changed since they last ran. Default is `False`.
 
         Returns:
             dict: Summary of test result messages structured as follows::
@@ -217,12 +451,163 @@ class PipelineLint(object):
             check_functions.extend([
                 'check_version_consistency'
             ])
-        with click.progressbar(check_functions, label='Running pipeline tests', item_show_func=repr) as fun_names:
-            for fun_name in fun_names:
-                getattr(self, fun_name)()
-                if len(self.failed) > 0:
-                    logging.error("Found test failures in '{}', halting lint run.".format(fun_name))
-                    break
+        self.incremental = incremental
+        self._run_checks(check_functions, halt_on_failure, max_workers)
+        if incremental:
+            logging.info("Reused cached results for {} of {} lint checks".format(len(self.reused_checks), len(check_functions)))
+
+    def _run_checks(self, check_functions, halt_on_failure=True, max_workers=None):
+        """Runs check functions in a thread pool and merges their results in the given order.
+
+        Args:
+            check_functions (list): Names of the check methods, in the order to report results.
+            halt_on_failure (boolean): Skip all checks listed after the first one with a failed test.
+            max_workers (int): Number of checks to run at once. Default: :data:`CHECK_WORKERS`.
+        """
+        max_workers = max_workers or CHECK_WORKERS
+        results = {}
+        errors = {}
+        # Position of the first check with failures or a critical error
+        halt_idx = len(check_functions)
+        pending = list(check_functions)
+        running = {}
+        progress_file = None if self.show_progress else io.StringIO()
+        with click.progressbar(length=len(check_functions), label='Running pipeline tests', item_show_func=repr, file=progress_file) as bar:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                while True:
+                    # Start checks that are ready to go, but only as many as there are free workers.
+                    # Nothing waits in the executor queue, so no more checks start once one has halted the run.
+                    for fun_name in list(pending):
+                        if check_functions.index(fun_name) > halt_idx:
+                            pending.remove(fun_name)
+                            continue
+                        if len(running) >= max_workers:
+                            break
+                        dependencies = self.check_dependencies.get(fun_name, [])
+                        if all(dep in results or dep not in check_functions for dep in dependencies):
+                            pending.remove(fun_name)
+                            running[executor.submit(self._run_check, fun_name)] = fun_name
+                    if len(running) == 0:
+                        break
+
+                    done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        fun_name = running.pop(future)
+                        try:
+                            results[fun_name] = future.result()
+                        except Exception as e:
+                            errors[fun_name] = e
+                            halt_idx = min(halt_idx, check_functions.index(fun_name))
+                        else:
+                            if halt_on_failure and len(results[fun_name]['failed']) > 0:
+                                halt_idx = min(halt_idx, check_functions.index(fun_name))
+                        bar.current_item = fun_name
+                        bar.update(1)
+
+        # Collect results in order, up to where the checks would have stopped if run one by one
+        for fun_name in check_functions[:halt_idx + 1]:
+            if fun_name in errors:
+                raise errors[fun_name]
+            if fun_name in results:
+                self.passed.extend(results[fun_name]['passed'])
+                self.warned.extend(results[fun_name]['warned'])
+                self.failed.extend(results[fun_name]['failed'])
+        if halt_idx < len(check_functions):
+            logging.error("Found test failures in '{}', halting lint run.".format(check_functions[halt_idx]))
+
+    def _run_check(self, fun_name):
+        """Runs a single check function, returning the results that it recorded.
+
+        With incremental linting, results are taken from the cache if the inputs
+        of the check have not changed, and saved to the cache otherwise.
+        """
+        cache_key = None
+        if self.incremental and fun_name in self.check_inputs:
+            cache_key = self._get_check_cache_key(fun_name)
+            cached_results = nf_core.cache.get_cache().get('lint_results', cache_key)
+            if cached_results is not None:
+                logging.debug("Reusing cached results for lint check '{}'".format(fun_name))
+                self.reused_checks.append(fun_name)
+                return {k: [tuple(r) for r in v] for k, v in cached_results.items()}
+
+        self._check_results.results = {'passed': [], 'warned': [], 'failed': []}
+        try:
+            getattr(self, fun_name)()
+            results = self._check_results.results
+        finally:
+            self._check_results.results = None
+
+        if cache_key is not None:
+            nf_core.cache.get_cache().set('lint_results', cache_key, results)
+        return results
+
+    def _get_check_cache_key(self, fun_name):
+        """Builds a cache key for the results of a check from everything listed in :attr:`check_inputs`.
+
+        Returns:
+            str: A sha256 hex digest
+        """
+        input_files, input_attrs = self.check_inputs[fun_name]
+        if '**' in input_files:
+            paths = self._list_pipeline_files()
+        else:
+            paths = [os.path.join(self.path, fn) for fn in input_files]
+        file_hashes = self._get_file_hashes([fn for fn in paths if os.path.isfile(fn)])
+        key_parts = [
+            fun_name,
+            nf_core.__version__,
+            os.path.abspath(self.path),
+            self.release_mode,
+            sorted([os.path.relpath(fn, self.path), file_hashes.get(fn)] for fn in paths),
+            [[attr, getattr(self, attr)] for attr in input_attrs]
+        ]
+        return hashlib.sha256(json.dumps(key_parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def _get_file_hashes(self, paths):
+        """Returns content hashes of pipeline files, for incremental linting.
+
+        Files that are tracked by git and have not been modified use the blob SHA
+        from the git index, so don't need to be read. Other files are hashed
+        with :func:`nf_core.utils.get_file_hashes`.
+
+        Returns:
+            dict: Content hash for each path
+        """
+        blob_hashes = self._get_git_blob_hashes()
+        file_hashes = {fn: blob_hashes[fn] for fn in paths if fn in blob_hashes}
+        file_hashes.update(nf_core.utils.get_file_hashes(
+            [fn for fn in paths if fn not in file_hashes],
+            nf_core.cache.get_cache()
+        ))
+        return file_hashes
+
+    def _get_git_blob_hashes(self):
+        """Returns git blob SHAs for all tracked files that match the git index.
+
+        Returns:
+            dict: ``git:<sha>`` for each unmodified tracked file. Empty if the pipeline is not a git repository.
+        """
+        with self._git_blob_hashes_lock:
+            if self._git_blob_hashes is not None:
+                return self._git_blob_hashes
+            self._git_blob_hashes = {}
+            try:
+                index_files = subprocess.check_output(['git', 'ls-files', '-s', '-z'], cwd=self.path, stderr=subprocess.DEVNULL)
+                modified_files = subprocess.check_output(['git', 'ls-files', '-m', '-z'], cwd=self.path, stderr=subprocess.DEVNULL)
+            except (subprocess.CalledProcessError, OSError) as e:
+                logging.debug("Couldn't call 'git ls-files': {}".format(e))
+                return self._git_blob_hashes
+            modified_files = set(os.path.join(self.path, fn.decode('utf-8')) for fn in modified_files.split(b'\0') if fn)
+            for entry in index_files.split(b'\0'):
+                if not entry:
+                    continue
+                # Format: <mode> <object> <stage>\t<file>
+                info, fn = entry.split(b'\t', 1)
+                mode, sha, stage = info.split(b' ')
+                fn = os.path.join(self.path, fn.decode('utf-8'))
+                if stage == b'0' and fn not in modified_files:
+                    self._git_blob_hashes[fn] = 'git:{}'.format(sha.decode('utf-8'))
+            return self._git_blob_hashes
 
     def check_files_exist(self):
         """Checks a given pipeline directory for required files.
@@ -840,74 +1225,153 @@ class PipelineLint(object):
         else:
             self.passed.append((8, "Conda environment name was correct ({})".format(expected_env_name)))
 
-        # Check conda dependency list
-        for dep in self.conda_config.get('dependencies', []):
-            if isinstance(dep, str):
-                # Check that each dependency has a version number
-                try:
-                    assert dep.count('=') in [1,2]
-                except AssertionError:
-                    self.failed.append((8, "Conda dependency did not have pinned version number: {}".format(dep)))
-                else:
-                    self.passed.append((8, "Conda dependency had pinned version number: {}".format(dep)))
+        # Start all Anaconda / PyPI API requests at once, results are used as the checks below get to them
+        prefetch = self._prefetch_package_info()
 
+        try:
+            # Check conda dependency list
+            for dep in self.conda_config.get('dependencies', []):
+                if isinstance(dep, str):
+                    # Check that each dependency has a version number
                     try:
-                        depname, depver = dep.split('=')[:2]
-                        self.check_anaconda_package(dep)
-                    except ValueError:
-                        pass
-                    else:
-                        # Check that required version is available at all
-                        if depver not in self.conda_package_info[dep].get('versions'):
-                            self.failed.append((8, "Conda dependency had an unknown version: {}".format(dep)))
-                            continue  # No need to test for latest version, continue linting
-                        # Check version is latest available
-                        last_ver = self.conda_package_info[dep].get('latest_version')
-                        if last_ver is not None and last_ver != depver:
-                            self.warned.append((8, "Conda package is not latest available: {}, {} available".format(dep, last_ver)))
-                        else:
-                            self.passed.append((8, "Conda package is latest available: {}".format(dep)))
-
-            elif isinstance(dep, dict):
-                for pip_dep in dep.get('pip', []):
-                    # Check that each pip dependency has a version number
-                    try:
-                        assert pip_dep.count('=') == 2
+                        assert dep.count('=') in [1,2]
                     except AssertionError:
-                        self.failed.append((8, "Pip dependency did not have pinned version number: {}".format(pip_dep)))
+                        self.failed.append((8, "Conda dependency did not have pinned version number: {}".format(dep)))
                     else:
-                        self.passed.append((8, "Pip dependency had pinned version number: {}".format(pip_dep)))
+                        self.passed.append((8, "Conda dependency had pinned version number: {}".format(dep)))
 
                         try:
-                            pip_depname, pip_depver = pip_dep.split('==', 1)
-                            self.check_pip_package(pip_dep)
+                            depname, depver = dep.split('=')[:2]
+                            self.check_anaconda_package(dep)
                         except ValueError:
                             pass
                         else:
-                            # Check, if PyPi package version is available at all
-                            if pip_depver not in self.conda_package_info[pip_dep].get('releases').keys():
-                                self.failed.append((8, "PyPi package had an unknown version: {}".format(pip_depver)))
-                                continue  # No need to test latest version, if not available
-                            last_ver = self.conda_package_info[pip_dep].get('info').get('version')
-                            if last_ver is not None and last_ver != pip_depver:
-                                self.warned.append((8, "PyPi package is not latest available: {}, {} available".format(pip_depver, last_ver)))
+                            # Check that required version is available at all
+                            if depver not in self.conda_package_info[dep].get('versions'):
+                                self.failed.append((8, "Conda dependency had an unknown version: {}".format(dep)))
+                                continue  # No need to test for latest version, continue linting
+                            # Check version is latest available
+                            last_ver = self.conda_package_info[dep].get('latest_version')
+                            if last_ver is not None and last_ver != depver:
+                                self.warned.append((8, "Conda package is not latest available: {}, {} available".format(dep, last_ver)))
                             else:
-                                self.passed.append((8, "PyPi package is latest available: {}".format(pip_depver)))
+                                self.passed.append((8, "Conda package is latest available: {}".format(dep)))
 
-    def check_anaconda_package(self, dep):
-        """Query conda package information.
+                elif isinstance(dep, dict):
+                    for pip_dep in dep.get('pip', []):
+                        # Check that each pip dependency has a version number
+                        try:
+                            assert pip_dep.count('=') == 2
+                        except AssertionError:
+                            self.failed.append((8, "Pip dependency did not have pinned version number: {}".format(pip_dep)))
+                        else:
+                            self.passed.append((8, "Pip dependency had pinned version number: {}".format(pip_dep)))
 
-        Sends a HTTP GET request to the Anaconda remote API.
+                            try:
+                                pip_depname, pip_depver = pip_dep.split('==', 1)
+                                self.check_pip_package(pip_dep)
+                            except ValueError:
+                                pass
+                            else:
+                                # Check, if PyPi package version is available at all
+                                if pip_depver not in self.conda_package_info[pip_dep].get('releases').keys():
+                                    self.failed.append((8, "PyPi package had an unknown version: {}".format(pip_depver)))
+                                    continue  # No need to test latest version, if not available
+                                last_ver = self.conda_package_info[pip_dep].get('info').get('version')
+                                if last_ver is not None and last_ver != pip_depver:
+                                    self.warned.append((8, "PyPi package is not latest available: {}, {} available".format(pip_depver, last_ver)))
+                                else:
+                                    self.passed.append((8, "PyPi package is latest available: {}".format(pip_depver)))
+        finally:
+            # Don't wait for any API requests that we didn't need
+            for future in self._api_prefetch.values():
+                future.cancel()
+            self._api_prefetch = {}
+            prefetch.shutdown()
+
+    def _prefetch_package_info(self):
+        """Sends API requests for every conda and pip dependency in a thread pool.
+
+        Anaconda channels are queried in parallel. Requests for a later channel are
+        skipped if the package has already been found in an earlier one.
+        Responses are stored in ``self._api_prefetch`` and picked up by
+        :func:`_api_get`, so the package checks report results in the same order
+        as when querying one package at a time.
 
-        Args:
-            dep (str): A conda package name.
+        Returns:
+            concurrent.futures.ThreadPoolExecutor: The executor, to be shut down when finished.
+        """
+        # Index of the first channel each package was found in
+        found = {}
+        found_lock = threading.Lock()
+
+        def fetch(url, package, channel_idx):
+            with found_lock:
+                if found.get(package, channel_idx) < channel_idx:
+                    return None
+            response = self._api_request(url)
+            if response.status_code == 200:
+                with found_lock:
+                    found[package] = min(found.get(package, channel_idx), channel_idx)
+            return response
+
+        # List requests by channel, so that the first channel for every package goes first
+        requests_by_channel = []
+        for dep in self.conda_config.get('dependencies', []):
+            if isinstance(dep, str) and dep.count('=') in [1,2]:
+                depname = dep.split('=', 1)[0]
+                for idx, (ch, url) in enumerate(self._get_anaconda_urls(dep)):
+                    while len(requests_by_channel) <= idx:
+                        requests_by_channel.append([])
+                    requests_by_channel[idx].append((url, depname, idx))
+            elif isinstance(dep, dict):
+                for pip_dep in dep.get('pip', []):
+                    if pip_dep.count('=') == 2:
+                        if len(requests_by_channel) == 0:
+                            requests_by_channel.append([])
+                        requests_by_channel[0].append((self._get_pip_url(pip_dep), pip_dep, 0))
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.api_workers)
+        for channel_requests in requests_by_channel:
+            for url, package, channel_idx in channel_requests:
+                if url not in self._api_prefetch:
+                    self._api_prefetch[url] = executor.submit(fetch, url, package, channel_idx)
+        return executor
+
+    def _api_get(self, url):
+        """Fetches a URL from the Anaconda or PyPI API.
+
+        Uses a response from :func:`_prefetch_package_info` if there is one.
 
         Raises:
-            A ValueError, if the package name can not be resolved.
+            ``requests.exceptions.Timeout`` or ``requests.exceptions.ConnectionError``
         """
-        # Check if each dependency is the latest available version
-        depname, depver = dep.split('=', 1)
-        dep_channels = self.conda_config.get('channels', [])
+        if url in self._api_prefetch:
+            response = self._api_prefetch[url].result()
+            if response is not None:
+                return response
+        return self._api_request(url)
+
+    def _api_request(self, url):
+        """Sends an API request with a connection pool for this thread, keeping to ``self.api_rate_limiter``."""
+        session = getattr(self._api_sessions, 'session', None)
+        if session is None:
+            session = requests.Session()
+            self._api_sessions.session = session
+        self.api_rate_limiter.wait(url)
+        return session.get(url, timeout=10)
+
+    def _get_anaconda_urls(self, dep):
+        """Returns the Anaconda API URLs to query for a conda dependency, in channel order.
+
+        Args:
+            dep (str): A conda dependency, eg. ``bioconda::fastqc=0.11.8``
+
+        Returns:
+            list: ``(channel, url)`` tuples
+        """
+        depname = dep.split('=', 1)[0]
+        dep_channels = list(self.conda_config.get('channels', []))
         # 'defaults' isn't actually a channel name. See https://docs.anaconda.com/anaconda/user-guide/tasks/using-repositories/
         if 'defaults' in dep_channels:
             dep_channels.remove('defaults')
@@ -922,10 +1386,28 @@ class PipelineLint(object):
         if '::' in depname:
             dep_channels = [depname.split('::')[0]]
             depname = depname.split('::')[1]
-        for ch in dep_channels:
-            anaconda_api_url = 'https://api.anaconda.org/package/{}/{}'.format(ch, depname)
+        return [(ch, 'https://api.anaconda.org/package/{}/{}'.format(ch, depname)) for ch in dep_channels]
+
+    def _get_pip_url(self, dep):
+        """Returns the PyPI API URL for a pip dependency, eg. ``multiqc==1.8``"""
+        pip_depname = dep.split('=', 1)[0]
+        return 'https://pypi.python.org/pypi/{}/json'.format(pip_depname)
+
+    def check_anaconda_package(self, dep):
+        """Query conda package information.
+
+        Sends a HTTP GET request to the Anaconda remote API.
+
+        Args:
+            dep (str): A conda package name.
+
+        Raises:
+            A ValueError, if the package name can not be resolved.
+        """
+        # Check if each dependency is the latest available version
+        for ch, anaconda_api_url in self._get_anaconda_urls(dep):
             try:
-                response = requests.get(anaconda_api_url, timeout=10)
+                response = self._api_get(anaconda_api_url)
             except (requests.exceptions.Timeout):
                 self.warned.append((8, "Anaconda API timed out: {}".format(anaconda_api_url)))
                 raise ValueError
@@ -958,10 +1440,9 @@ class PipelineLint(object):
         Raises:
             A ValueError, if the package name can not be resolved or the connection timed out.
         """
-        pip_depname, pip_depver = dep.split('=', 1)
-        pip_api_url = 'https://pypi.python.org/pypi/{}/json'.format(pip_depname)
+        pip_api_url = self._get_pip_url(dep)
         try:
-            response = requests.get(pip_api_url, timeout=10)
+            response = self._api_get(pip_api_url)
         except (requests.exceptions.Timeout):
             self.warned.append((8, "PyPi API timed out: {}".format(pip_api_url)))
             raise ValueError
@@ -1004,26 +1485,12 @@ class PipelineLint(object):
 
     def check_pipeline_todos(self):
         """ Go through all template files looking for the string 'TODO nf-core:' """
-        ignore = ['.git']
-        if os.path.isfile(os.path.join(self.path, '.gitignore')):
-            with io.open(os.path.join(self.path, '.gitignore'), 'rt', encoding='latin1') as fh:
-                for l in fh:
-                    ignore.append(os.path.basename(l.strip().rstrip('/')))
-        for root, dirs, files in os.walk(self.path):
-            # Ignore files
-            for i in ignore:
-                if i in dirs:
-                    dirs.remove(i)
-                if i in files:
-                    files.remove(i)
-            for fname in files:
-                with io.open(os.path.join(root, fname), 'rt', encoding='latin1') as fh:
-                    for l in fh:
-                        if 'TODO nf-core' in l:
-                            l = l.replace('<!--', '').replace('-->', '').replace('# TODO nf-core: ', '').replace('// TODO nf-core: ', '').replace('TODO nf-core: ', '').strip()
-                            if len(fname) + len(l) > 50:
-                                l = '{}..'.format(l[:50-len(fname)])
-                            self.warned.append((10, "TODO string found in '{}': {}".format(fname,l)))
+        for fn, lnum, l in self._scan_pipeline_files()['todos']:
+            fname = os.path.basename(fn)
+            l = l.replace('<!--', '').replace('-->', '').replace('# TODO nf-core: ', '').replace('// TODO nf-core: ', '').replace('TODO nf-core: ', '').strip()
+            if len(fname) + len(l) > 50:
+                l = '{}..'.format(l[:50-len(fname)])
+            self.warned.append((10, "TODO string found in '{}': {}".format(fname,l)))
 
     def check_pipeline_name(self):
         """Check whether pipeline name adheres to lower case/no hyphen naming convention"""
@@ -1040,35 +1507,108 @@ class PipelineLint(object):
         Look for the string 'cookiecutter' in all pipeline files.
         Finding it probably means that there has been a copy+paste error from the template.
         """
-        try:
-            # First, try to get the list of files using git
-            git_ls_files = subprocess.check_output(['git','ls-files'], cwd=self.path).splitlines()
-            list_of_files = [os.path.join(self.path, s.decode("utf-8")) for s in git_ls_files]
-        except subprocess.CalledProcessError as e:
-            # Failed, so probably not initialised as a git repository - just a list of all files
-            logging.debug("Couldn't call 'git ls-files': {}".format(e))
-            list_of_files = []
-            for subdir, dirs, files in os.walk(self.path):
-                for file in files:
-                    list_of_files.append(os.path.join(subdir, file))
-
-        # Loop through files, searching for string
         num_matches = 0
-        num_files = 0
-        for fn in list_of_files:
-            num_files += 1
-            with io.open(fn, 'r', encoding='latin1') as fh:
-                lnum = 0
-                for l in fh:
-                    lnum += 1
-                    cc_matches = re.findall(r"{{\s*cookiecutter[^}]*}}", l)
-                    if len(cc_matches) > 0:
-                        for cc_match in cc_matches:
-                            self.failed.append((13, "Found a cookiecutter template string in '{}' L{}: {}".format(fn, lnum, cc_match)))
-                            num_matches += 1
+        for fn, lnum, cc_match in self._scan_pipeline_files()['cookiecutter']:
+            self.failed.append((13, "Found a cookiecutter template string in '{}' L{}: {}".format(fn, lnum, cc_match)))
+            num_matches += 1
         if num_matches == 0:
-            self.passed.append((13, "Did not find any cookiecutter template strings ({} files)".format(num_files)))
+            self.passed.append((13, "Did not find any cookiecutter template strings ({} files)".format(len(self._list_pipeline_files()))))
+
+    def _list_pipeline_files(self):
+        """Lists all files in the pipeline, skipping anything ignored by git.
+
+        Uses ``git ls-files`` if the pipeline is a git repository, including
+        untracked files that are not ignored. Otherwise walks the directory,
+        skipping ``.git`` and anything matching a pattern in ``.gitignore``.
+        The list is only built once and then reused.
 
+        Returns:
+            list: Absolute paths to all pipeline files
+        """
+        with self._file_index_lock:
+            if self._file_index is not None:
+                return self._file_index
+            try:
+                git_ls_files = subprocess.check_output(
+                    ['git', 'ls-files', '-z', '--cached', '--others', '--exclude-standard'],
+                    cwd=self.path,
+                    stderr=subprocess.DEVNULL
+                )
+                list_of_files = [os.path.join(self.path, fn.decode('utf-8')) for fn in git_ls_files.split(b'\0') if fn]
+            except (subprocess.CalledProcessError, OSError) as e:
+                # Failed, so probably not initialised as a git repository - walk all files instead
+                logging.debug("Couldn't call 'git ls-files': {}".format(e))
+                ignore = ['.git']
+                if os.path.isfile(os.path.join(self.path, '.gitignore')):
+                    with io.open(os.path.join(self.path, '.gitignore'), 'rt', encoding='latin1') as fh:
+                        for l in fh:
+                            if l.strip() and not l.startswith('#'):
+                                ignore.append(l.strip().strip('/'))
+                list_of_files = []
+                for root, dirs, files in os.walk(self.path):
+                    relroot = os.path.relpath(root, self.path)
+                    is_ignored = lambda fn: any(
+                        fnmatch.fnmatch(fn, i) or fnmatch.fnmatch(os.path.normpath(os.path.join(relroot, fn)), i)
+                        for i in ignore
+                    )
+                    dirs[:] = sorted(d for d in dirs if not is_ignored(d))
+                    list_of_files.extend(os.path.join(root, fn) for fn in sorted(files) if not is_ignored(fn))
+            # Files that are tracked but deleted, or submodule directories
+            self._file_index = [fn for fn in list_of_files if os.path.isfile(fn)]
+            return self._file_index
+
+    def _scan_pipeline_files(self):
+        """Reads every pipeline file once, running all :attr:`content_scanners` on it.
+
+        Files that look binary are skipped. Large files are memory-mapped
+        and only the lines containing a scanner's marker string are decoded.
+        The scan is only done once and then reused.
+
+        Returns:
+            dict: For each scanner, a list of ``(file path, line number, match)`` tuples
+        """
+        with self._scan_lock:
+            if self._scan_results is not None:
+                return self._scan_results
+            scan_results = {name: [] for name in self.content_scanners}
+            for fn in self._list_pipeline_files():
+                try:
+                    with io.open(fn, 'rb') as fh:
+                        head = fh.read(8192)
+                        # Looks like a binary file
+                        if b'\0' in head:
+                            continue
+                        if len(head) < 8192:
+                            content = head
+                        elif os.fstat(fh.fileno()).st_size <= 1024 * 1024:
+                            content = head + fh.read()
+                        else:
+                            content = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+                        try:
+                            scanners = [(name, marker, getattr(self, scan_fn)) for name, (marker, scan_fn) in self.content_scanners.items() if content.find(marker) != -1]
+                            if len(scanners) == 0:
+                                continue
+                            lines = iter(content.readline, b'') if isinstance(content, mmap.mmap) else content.splitlines()
+                            for lnum, l in enumerate(lines, 1):
+                                for name, marker, scan_fn in scanners:
+                                    if marker in l:
+                                        for match in scan_fn(l.decode('latin1')):
+                                            scan_results[name].append((fn, lnum, match))
+                        finally:
+                            if isinstance(content, mmap.mmap):
+                                content.close()
+                except (IOError, ValueError) as e:
+                    logging.debug("Couldn't scan file '{}': {}".format(fn, e))
+            self._scan_results = scan_results
+            return self._scan_results
+
+    def _scan_todos(self, l):
+        """Content scanner for 'TODO nf-core' comments - returns the whole line"""
+        return [l] if 'TODO nf-core' in l else []
+
+    def _scan_cookiecutter(self, l):
+        """Content scanner for left-over cookiecutter template strings"""
+        return re.findall(r"{{\s*cookiecutter[^}]*}}", l)
 
     def check_schema_lint(self):
         """ Lint the pipeline JSON schema file """
@@ -1213,8 +1753,15 @@ class PipelineLint(object):
         """
 
         logging.info("Writing lint results to {}".format(json_fn))
+        with open(json_fn, 'w') as fh:
+            json.dump(self.get_results_dict(), fh, indent=4)
+
+    def get_results_dict(self):
+        """
+        Function to collect lint results in a dict, as saved by :func:`save_json_results`
+        """
         now = datetime.datetime.now()
-        results = {
+        return {
             'nf_core_tools_version': nf_core.__version__,
             'date_run': now.strftime("%Y-%m-%d %H:%M:%S"),
             'tests_pass': [[idx, self._strip_ansi_codes(msg)] for idx, msg in self.passed],
@@ -1228,8 +1775,6 @@ class PipelineLint(object):
             'has_tests_failed': len(self.failed) > 0,
             'markdown_result': self.get_results_md()
         }
-        with open(json_fn, 'w') as fh:
-            json.dump(results, fh, indent=4)
 
     def github_comment(self):
         """
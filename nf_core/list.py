@@ -4,7 +4,9 @@
 from __future__ import print_function
 from collections import OrderedDict
 
+import bisect
 import click
+import concurrent.futures
 import datetime
 import errno
 import json
@@ -13,15 +15,16 @@ import os
 import re
 import subprocess
 import sys
+import zlib
 
-import git
-import requests
 import tabulate
 
+import nf_core.cache
+import nf_core.catalogue
 import nf_core.utils
 
-# Set up local caching for requests to speed up remote queries
-nf_core.utils.setup_requests_cachedir()
+# Number of local workflows to inspect at once
+LOCAL_WORKFLOW_WORKERS = 8
 
 
 def list_workflows(filter_by=None, sort_by='release', as_json=False):
@@ -30,7 +33,7 @@ def list_workflows(filter_by=None, sort_by='release', as_json=False):
     Args:
         filter_by (list): A list of strings that can be used for filtering.
         sort_by (str): workflows can be sorted by keywords. Keyword must be one of
-            `release` (default), `name`, `stars`.
+            `release` (default), `pulled`, `name`, `stars`, `relevance`.
         as_json (boolean): Set to true, if the lists should be printed in JSON.
     """
     wfs = Workflows(filter_by, sort_by)
@@ -91,33 +94,37 @@ class Workflows(object):
     Args:
         filter_by (list): A list of strings that can be used for filtering.
         sort_by (str): workflows can be sorted by keywords. Keyword must be one of
-            `release` (default), `name`, `stars`.
+            `release` (default), `pulled`, `name`, `stars`, `relevance`.
     """
     def __init__(self, filter_by=None, sort_by='release'):
         self.remote_workflows = list()
         self.local_workflows = list()
         self.local_unmatched = list()
         self.keyword_filters = filter_by if filter_by is not None else []
+        self.keyword_index = None
         self.sort_workflows_by = sort_by
 
     def get_remote_workflows(self):
         """Retrieves remote workflows from `nf-co.re <https://nf-co.re>`_.
 
+        Workflows are read from the local catalogue of nf-core pipelines,
+        which is refreshed from nf-co.re first if it may be out of date.
+
         Remote workflows are stored in :attr:`self.remote_workflows` list.
         """
-        # List all repositories at nf-core
-        logging.debug("Fetching list of nf-core workflows")
-        nfcore_url = 'https://nf-co.re/pipelines.json'
-        response = requests.get(nfcore_url, timeout=10)
-        if response.status_code == 200:
-            repos = response.json()['remote_workflows']
-            for repo in repos:
+        catalogue = nf_core.catalogue.get_catalogue()
+        if catalogue.refresh():
+            for repo in catalogue.get_workflows():
                 self.remote_workflows.append(RemoteWorkflow(repo))
 
-    def get_local_nf_workflows(self):
+    def get_local_nf_workflows(self, max_workers=LOCAL_WORKFLOW_WORKERS):
         """Retrieves local Nextflow workflows.
 
         Local workflows are stored in :attr:`self.local_workflows` list.
+        Each workflow's git repository is inspected in a pool of threads.
+
+        Args:
+            max_workers (int): Number of workflows to inspect at once.
         """
         # Try to guess the local cache directory (much faster than calling nextflow)
         if len(os.environ.get('NXF_ASSETS', '')) > 0:
@@ -128,7 +135,10 @@ class Workflows(object):
             logging.debug("Guessed nextflow assets directory - pulling pipeline dirnames")
             for org_name in os.listdir(nextflow_wfdir):
                 for wf_name in os.listdir(os.path.join(nextflow_wfdir, org_name)):
-                    self.local_workflows.append( LocalWorkflow('{}/{}'.format(org_name, wf_name)) )
+                    wf = LocalWorkflow('{}/{}'.format(org_name, wf_name))
+                    if os.path.isdir(os.path.join(nextflow_wfdir, org_name, wf_name)):
+                        wf.local_path = os.path.join(nextflow_wfdir, org_name, wf_name)
+                    self.local_workflows.append(wf)
 
         # Fetch details about local cached pipelines with `nextflow list`
         else:
@@ -142,16 +152,38 @@ class Workflows(object):
             except subprocess.CalledProcessError as e:
                 raise AssertionError("`nextflow list` returned non-zero error code: %s,\n   %s", e.returncode, e.output)
             else:
+                if isinstance(nflist_raw, bytes):
+                    nflist_raw = nflist_raw.decode()
                 for wf_name in nflist_raw.splitlines():
                     if not str(wf_name).startswith('nf-core/'):
                         self.local_unmatched.append(wf_name)
                     else:
                         self.local_workflows.append( LocalWorkflow(wf_name) )
 
+                # Ask nextflow where one workflow lives, instead of running `nextflow info` for every one
+                if len(self.local_workflows) > 0:
+                    assets_dir = get_nf_assets_dir(self.local_workflows[0].full_name)
+                    if assets_dir is not None:
+                        for wf in self.local_workflows:
+                            wf_dir = os.path.join(assets_dir, wf.full_name)
+                            if os.path.isdir(wf_dir):
+                                wf.local_path = wf_dir
+
         # Find additional information about each workflow by checking its git history
         logging.debug("Fetching extra info about {} local workflows".format(len(self.local_workflows)))
-        for wf in self.local_workflows:
-            wf.get_local_nf_workflow_details()
+        if len(self.local_workflows) == 0:
+            return
+        # Look up cached git details for all workflows at once
+        cached = nf_core.cache.get_cache().get_many(
+            'local_workflows', [wf.local_path for wf in self.local_workflows if isinstance(wf.local_path, str)]
+        )
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(wf.get_local_nf_workflow_details, cached.get(wf.local_path))
+                for wf in self.local_workflows
+            ]
+            for future in futures:
+                future.result()
 
     def compare_remote_local(self):
         """Matches local to remote workflows.
@@ -160,73 +192,77 @@ class Workflows(object):
         with the latest one from remote.
 
         A boolean flag in :attr:`RemoteWorkflow.local_is_latest` is set to True, if the local workflow
-        is the latest.
+        is the latest. If the local commit is a release, its tag is saved in :attr:`LocalWorkflow.release_tag`
+        and the number of newer releases in :attr:`LocalWorkflow.releases_behind`.
         """
+        local_by_name = {lwf.full_name: lwf for lwf in self.local_workflows}
         for rwf in self.remote_workflows:
-            for lwf in self.local_workflows:
-                if rwf.full_name == lwf.full_name:
-                    rwf.local_wf = lwf
-                    if rwf.releases:
-                        if rwf.releases[-1]['tag_sha'] == lwf.commit_sha:
-                            rwf.local_is_latest = True
-                        else:
-                            rwf.local_is_latest = False
+            lwf = local_by_name.get(rwf.full_name)
+            if lwf is None:
+                continue
+            rwf.local_wf = lwf
+            lwf.release_tag = None
+            lwf.releases_behind = None
+            if rwf.releases:
+                release_index = {r.get('tag_sha'): idx for idx, r in enumerate(rwf.releases)}
+                idx = release_index.get(lwf.commit_sha)
+                rwf.local_is_latest = idx == len(rwf.releases) - 1
+                if idx is not None:
+                    lwf.release_tag = rwf.releases[idx].get('tag_name')
+                    lwf.releases_behind = len(rwf.releases) - 1 - idx
 
     def filtered_workflows(self):
         """Filters remote workflows for keywords.
 
+        Keywords are matched case-insensitively against the start of words in the
+        workflow names, descriptions and topics. All keywords must match.
+        The keyword index is built once and reused until the remote workflows change.
+
         Returns:
-            list: Filtered remote workflows.
+            list: Filtered remote workflows, best matches first.
         """
         # If no keywords, don't filter
         if not self.keyword_filters:
             return self.remote_workflows
 
-        filtered_workflows = []
-        for wf in self.remote_workflows:
-            for k in self.keyword_filters:
-                in_name = k in wf.name if wf.name else False
-                in_desc = k in wf.description if wf.description else False
-                in_topics = any([ k in t for t in wf.topics])
-                if not in_name and not in_desc and not in_topics:
-                    break
-            else:
-                # We didn't hit a break, so all keywords were found
-                filtered_workflows.append(wf)
-        return filtered_workflows
+        if self.keyword_index is None or self.keyword_index.workflows != self.remote_workflows:
+            self.keyword_index = KeywordIndex(self.remote_workflows)
+        return self.keyword_index.search(self.keyword_filters)
 
     def print_summary(self):
         """Prints a summary of all pipelines."""
 
         filtered_workflows = self.filtered_workflows()
 
-        # Sort by released / dev, then alphabetical
-        if not self.sort_workflows_by or self.sort_workflows_by == 'release':
-            filtered_workflows.sort(
-                key=lambda wf: (
-                    (wf.releases[-1].get('published_at_timestamp', 0) if len(wf.releases) > 0 else 0) * -1,
-                    wf.full_name.lower()
+        # Keep the order of the keyword search results when sorting by relevance
+        if self.sort_workflows_by != 'relevance':
+            # Sort by released / dev, then alphabetical
+            if not self.sort_workflows_by or self.sort_workflows_by == 'release':
+                filtered_workflows.sort(
+                    key=lambda wf: (
+                        (wf.releases[-1].get('published_at_timestamp', 0) if len(wf.releases) > 0 else 0) * -1,
+                        wf.full_name.lower()
+                    )
                 )
-            )
-        # Sort by date pulled
-        elif self.sort_workflows_by == 'pulled':
-            def sort_pulled_date(wf):
-                try:
-                    return wf.local_wf.last_pull * -1
-                except:
-                    return 0
-            filtered_workflows.sort(key=sort_pulled_date)
-        # Sort by name
-        elif self.sort_workflows_by == 'name':
-            filtered_workflows.sort( key=lambda wf: wf.full_name.lower() )
-        # Sort by stars, then name
-        elif self.sort_workflows_by == 'stars':
-            filtered_workflows.sort(
-                key=lambda wf: (
-                    wf.stargazers_count * -1,
-                    wf.full_name.lower()
+            # Sort by date pulled
+            elif self.sort_workflows_by == 'pulled':
+                def sort_pulled_date(wf):
+                    try:
+                        return wf.local_wf.last_pull * -1
+                    except:
+                        return 0
+                filtered_workflows.sort(key=sort_pulled_date)
+            # Sort by name
+            elif self.sort_workflows_by == 'name':
+                filtered_workflows.sort( key=lambda wf: wf.full_name.lower() )
+            # Sort by stars, then name
+            elif self.sort_workflows_by == 'stars':
+                filtered_workflows.sort(
+                    key=lambda wf: (
+                        wf.stargazers_count * -1,
+                        wf.full_name.lower()
+                    )
                 )
-            )
 
         # Build summary list to print
         summary = list()
@@ -244,6 +280,10 @@ class Workflows(object):
                     revision = wf.local_wf.commit_sha
                 if wf.local_is_latest:
                     is_latest = click.style('Yes ({})'.format(revision), fg='green')
+                elif wf.local_wf.releases_behind:
+                    is_latest = click.style('No ({}, {} release{} behind)'.format(
+                        revision, wf.local_wf.releases_behind, 's' if wf.local_wf.releases_behind > 1 else ''
+                    ), fg='red')
                 else:
                     is_latest = click.style('No ({})'.format(revision), fg='red')
             else:
@@ -269,6 +309,79 @@ class Workflows(object):
         }, default=lambda o: o.__dict__, indent=4))
 
 
+class KeywordIndex(object):
+    """Inverted index of the words in remote workflow names, descriptions and topics.
+
+    Args:
+        workflows (list): :class:`RemoteWorkflow` objects to index.
+    """
+
+    # How much a match in each field counts towards the ranking
+    FIELD_WEIGHTS = {'name': 3, 'topics': 2, 'description': 1}
+
+    def __init__(self, workflows):
+        self.workflows = list(workflows)
+        # term -> {workflow index: set of fields containing the term}
+        self.postings = {}
+        for i, wf in enumerate(self.workflows):
+            fields = {'name': [wf.name], 'topics': wf.topics or [], 'description': [wf.description]}
+            for field, texts in fields.items():
+                for text in texts:
+                    for term in tokenise(text):
+                        self.postings.setdefault(term, {}).setdefault(i, set()).add(field)
+        self.terms = sorted(self.postings)
+
+    def match(self, word):
+        """Finds workflows with a word starting with ``word``.
+
+        Each field that matches adds its weight to the score,
+        with whole word matches scoring twice as much as prefix matches.
+
+        Returns:
+            dict: ``{workflow index: score}``
+        """
+        field_scores = {}
+        i = bisect.bisect_left(self.terms, word)
+        while i < len(self.terms) and self.terms[i].startswith(word):
+            term = self.terms[i]
+            factor = 1.0 if term == word else 0.5
+            for wf_idx, fields in self.postings[term].items():
+                wf_scores = field_scores.setdefault(wf_idx, {})
+                for field in fields:
+                    wf_scores[field] = max(wf_scores.get(field, 0), self.FIELD_WEIGHTS[field] * factor)
+            i += 1
+        return {wf_idx: sum(wf_scores.values()) for wf_idx, wf_scores in field_scores.items()}
+
+    def search(self, keywords):
+        """Finds workflows matching all keywords.
+
+        Args:
+            keywords (list): Keywords to search for, case insensitive.
+
+        Returns:
+            list: Matching workflows, highest scoring first, then alphabetical.
+        """
+        total_scores = None
+        for keyword in keywords:
+            for word in tokenise(keyword):
+                scores = self.match(word)
+                if total_scores is None:
+                    total_scores = scores
+                else:
+                    total_scores = {i: total_scores[i] + scores[i] for i in total_scores if i in scores}
+        if total_scores is None:
+            return list(self.workflows)
+        ranked = sorted(total_scores, key=lambda i: (-total_scores[i], (self.workflows[i].full_name or '').lower()))
+        return [self.workflows[i] for i in ranked]
+
+
+def tokenise(text):
+    """Splits text into lower case words, eg. ``RNA-seq`` becomes ``['rna', 'seq']``."""
+    if not text:
+        return []
+    return re.findall(r'[a-z0-9]+', text.lower())
+
+
 class RemoteWorkflow(object):
     """A information container for a remote workflow.
 
@@ -295,12 +408,14 @@ class RemoteWorkflow(object):
         self.local_wf = None
         self.local_is_latest = None
 
-        # Beautify date
+        # Beautify date (the catalogue has already parsed it)
         for release in self.releases:
-            release['published_at_pretty'] = pretty_date(
-                datetime.datetime.strptime(release.get('published_at'), "%Y-%m-%dT%H:%M:%SZ")
-            )
-            release['published_at_timestamp'] = int(datetime.datetime.strptime(release.get('published_at'), "%Y-%m-%dT%H:%M:%SZ").strftime("%s"))
+            if 'published_at_timestamp' not in release:
+                release['published_at_timestamp'] = nf_core.catalogue.parse_timestamp(release.get('published_at'))
+            release['published_at_pretty'] = pretty_date(release['published_at_timestamp'])
+
+        # Oldest release first, so that the latest release is always the last one
+        self.releases.sort(key=lambda r: r['published_at_timestamp'])
 
 
 class LocalWorkflow(object):
@@ -318,9 +433,20 @@ class LocalWorkflow(object):
         self.last_pull = None
         self.last_pull_date = None
         self.last_pull_pretty = None
+        self.release_tag = None
+        self.releases_behind = None
 
-    def get_local_nf_workflow_details(self):
-        """ Get full details about a local cached workflow """
+    def get_local_nf_workflow_details(self, cached=None):
+        """ Get full details about a local cached workflow
+
+        Git details are saved in the ``local_workflows`` namespace of the nf-core
+        cache, along with the modification times of the files in ``.git`` that
+        change when the workflow is pulled or checked out.
+
+        Args:
+            cached (dict): Cache entry for this workflow, if already fetched.
+                Used instead of reading the repository if it is still up to date.
+        """
 
         if self.local_path is None:
 
@@ -335,50 +461,35 @@ class LocalWorkflow(object):
 
             # Use `nextflow info` to get more details about the workflow
             else:
-                try:
-                    with open(os.devnull, 'w') as devnull:
-                        nfinfo_raw = subprocess.check_output(['nextflow', 'info', '-d', self.full_name], stderr=devnull)
-                except OSError as e:
-                    if e.errno == errno.ENOENT:
-                        raise AssertionError("It looks like Nextflow is not installed. It is required for most nf-core functions.")
-                except subprocess.CalledProcessError as e:
-                    raise AssertionError("`nextflow list` returned non-zero error code: %s,\n   %s", e.returncode, e.output)
-                else:
-                    re_patterns = {
-                        'repository': r"repository\s*: (.*)",
-                        'local_path': r"local path\s*: (.*)"
-                    }
-                    if isinstance(nfinfo_raw, bytes):
-                        nfinfo_raw = nfinfo_raw.decode()
-                    for key, pattern in re_patterns.items():
-                        m = re.search(pattern, nfinfo_raw)
-                        if m:
-                            setattr(self, key, m.group(1))
+                nfinfo = nextflow_info(self.full_name)
+                for key in ['repository', 'local_path']:
+                    if nfinfo.get(key) is not None:
+                        setattr(self, key, nfinfo[key])
 
         # Pull information from the local git repository
         if self.local_path is not None:
             logging.debug("Pulling git info from {}".format(self.local_path))
             try:
-                repo = git.Repo(self.local_path)
-                self.commit_sha = str(repo.head.commit.hexsha)
-                self.remote_url = str(repo.remotes.origin.url)
+                stamp = git_stamp(self.local_path)
+                if cached is not None and cached.get('stamp') == stamp:
+                    logging.debug("Using cached git info for {}".format(self.local_path))
+                    git_info = cached
+                else:
+                    # Read the git files directly if we can, it's much faster than GitPython
+                    git_info = read_git_metadata(self.local_path)
+                    if git_info is None:
+                        logging.debug("Falling back to GitPython for {}".format(self.local_path))
+                        git_info = read_git_metadata_gitpython(self.local_path)
+                    git_info['stamp'] = stamp
+                    nf_core.cache.get_cache().set('local_workflows', self.local_path, git_info)
+                self.commit_sha = git_info['commit_sha']
+                self.remote_url = git_info['remote_url']
+                self.branch = git_info['branch']
+                self.active_tag = git_info['active_tag']
                 self.last_pull = os.stat(os.path.join(self.local_path, '.git', 'FETCH_HEAD')).st_mtime
                 self.last_pull_date = datetime.datetime.fromtimestamp(self.last_pull).strftime("%Y-%m-%d %H:%M:%S")
                 self.last_pull_pretty = pretty_date(self.last_pull)
 
-                # Get the checked out branch if we can
-                try:
-                    self.branch = str(repo.active_branch)
-                except TypeError:
-                    self.branch = None
-
-                # See if we are on a tag (release)
-                self.active_tag = None
-                for tag in repo.tags:
-                    if str(tag.commit) == str(self.commit_sha):
-                        self.active_tag = tag
-
-
             # I'm not sure that we need this any more, it predated the self.branch catch above for detacted HEAD
             except TypeError as e:
                 logging.error(
@@ -390,6 +501,257 @@ class LocalWorkflow(object):
                 )
 
 
+def git_stamp(repo_path):
+    """Returns the modification times and sizes of the files in ``.git``
+    that change when a repository is fetched, checked out or its refs are packed.
+
+    Returns:
+        list: ``[filename, mtime, size]`` for each file, with None for missing files.
+    """
+    stamp = []
+    for fn in ['HEAD', 'FETCH_HEAD', 'packed-refs']:
+        try:
+            st = os.stat(os.path.join(repo_path, '.git', fn))
+            stamp.append([fn, st.st_mtime_ns, st.st_size])
+        except (IOError, OSError):
+            stamp.append([fn, None, None])
+    return stamp
+
+
+def read_git_metadata(repo_path):
+    """Reads the checked out commit, branch, tag and origin URL of a git repository.
+
+    Parses ``HEAD``, ``packed-refs``, ``refs/tags`` and ``config`` in the ``.git``
+    directory without loading the repository with GitPython. Tags are collected
+    into a commit to tag index once, instead of resolving every tag object.
+
+    Args:
+        repo_path (str): Path to the repository working tree.
+
+    Returns:
+        dict: ``commit_sha``, ``branch``, ``active_tag`` and ``remote_url``,
+        or None if the repository can't be read this way (eg. a tag object that
+        is only stored in a pack file), in which case GitPython should be used.
+    """
+    git_dir = os.path.join(repo_path, '.git')
+    if not os.path.isdir(git_dir):
+        return None
+    try:
+        with open(os.path.join(git_dir, 'HEAD')) as fh:
+            head = fh.read().strip()
+        packed_refs, packed_peeled = read_packed_refs(git_dir)
+
+        # HEAD is either a symbolic ref to a branch, or a commit hash when detached
+        branch = None
+        if head.startswith('ref:'):
+            ref = head[4:].strip()
+            commit_sha = read_loose_ref(git_dir, ref) or packed_refs.get(ref)
+            if ref.startswith('refs/heads/'):
+                branch = ref[len('refs/heads/'):]
+        else:
+            commit_sha = head
+        if commit_sha is None or not re.match(r'^[0-9a-f]{40}$', commit_sha):
+            return None
+
+        # Build the commit -> tag index
+        tag_refs = {}
+        for ref, sha in packed_refs.items():
+            if ref.startswith('refs/tags/'):
+                tag_refs[ref] = packed_peeled.get(ref, sha)
+        tags_dir = os.path.join(git_dir, 'refs', 'tags')
+        for root, dirs, files in os.walk(tags_dir):
+            for fn in files:
+                ref = os.path.relpath(os.path.join(root, fn), git_dir).replace(os.sep, '/')
+                tag_refs[ref] = read_loose_ref(git_dir, ref)
+        commit_tags = {}
+        for ref in sorted(tag_refs):
+            sha = tag_refs[ref]
+            # Loose refs can point to annotated tag objects, which need peeling to their commit
+            if ref not in packed_peeled and sha != commit_sha:
+                sha = peel_loose_tag(git_dir, sha)
+                if sha is None:
+                    return None
+            commit_tags[sha] = ref[len('refs/tags/'):]
+
+        return {
+            'commit_sha': commit_sha,
+            'branch': branch,
+            'active_tag': commit_tags.get(commit_sha),
+            'remote_url': read_git_remote_url(git_dir)
+        }
+    except (IOError, OSError, ValueError, zlib.error) as e:
+        logging.debug("Could not read git metadata from {}: {}".format(git_dir, e))
+        return None
+
+
+def read_git_metadata_gitpython(repo_path):
+    """Reads the same information as :func:`read_git_metadata`, using GitPython.
+
+    Slower, but works for any repository layout.
+    """
+    import git
+    repo = git.Repo(repo_path)
+    commit_sha = str(repo.head.commit.hexsha)
+
+    # Get the checked out branch if we can
+    try:
+        branch = str(repo.active_branch)
+    except TypeError:
+        branch = None
+
+    # See if we are on a tag (release)
+    active_tag = None
+    for tag in repo.tags:
+        if str(tag.commit) == commit_sha:
+            active_tag = str(tag)
+
+    return {
+        'commit_sha': commit_sha,
+        'branch': branch,
+        'active_tag': active_tag,
+        'remote_url': str(repo.remotes.origin.url)
+    }
+
+
+def read_loose_ref(git_dir, ref):
+    """Returns the hash stored in a loose ref file, or None if there isn't one."""
+    try:
+        with open(os.path.join(git_dir, *ref.split('/'))) as fh:
+            sha = fh.read().strip()
+    except (IOError, OSError):
+        return None
+    # Follow symbolic refs
+    if sha.startswith('ref:'):
+        return read_loose_ref(git_dir, sha[4:].strip())
+    return sha
+
+
+def read_packed_refs(git_dir):
+    """Parses ``.git/packed-refs``.
+
+    Returns:
+        tuple: Dicts of ``{ref: hash}`` and of ``{ref: commit hash}`` for tags
+        whose commit is known without reading the tag object.
+    """
+    refs = {}
+    peeled = {}
+    fully_peeled = False
+    try:
+        with open(os.path.join(git_dir, 'packed-refs')) as fh:
+            last_ref = None
+            for line in fh:
+                line = line.strip()
+                if line.startswith('# pack-refs with:'):
+                    traits = line.split(':', 1)[1].split()
+                    fully_peeled = 'peeled' in traits or 'fully-peeled' in traits
+                if not line or line.startswith('#'):
+                    continue
+                if line.startswith('^'):
+                    if last_ref is not None:
+                        peeled[last_ref] = line[1:]
+                    continue
+                sha, last_ref = line.split(' ', 1)
+                refs[last_ref] = sha
+    except (IOError, OSError):
+        pass
+    # With the peeled trait, tags without a peeled line already point to a commit
+    if fully_peeled:
+        for ref, sha in refs.items():
+            if ref.startswith('refs/tags/'):
+                peeled.setdefault(ref, sha)
+    return refs, peeled
+
+
+def peel_loose_tag(git_dir, sha):
+    """Returns the commit that an object points to, following annotated tags.
+
+    Only loose objects are read. Returns None if the object is in a pack file,
+    so that the caller can fall back to GitPython.
+    """
+    for _ in range(10):
+        try:
+            with open(os.path.join(git_dir, 'objects', sha[:2], sha[2:]), 'rb') as fh:
+                obj = zlib.decompress(fh.read())
+        except (IOError, OSError):
+            return None
+        header, _, body = obj.partition(b'\0')
+        if header.startswith(b'commit '):
+            return sha
+        if not header.startswith(b'tag '):
+            return None
+        m = re.match(br'object ([0-9a-f]{40})', body)
+        if not m:
+            return None
+        sha = m.group(1).decode()
+    return None
+
+
+def read_git_remote_url(git_dir):
+    """Returns the URL of the ``origin`` remote from ``.git/config``, or None."""
+    in_origin = False
+    with open(os.path.join(git_dir, 'config')) as fh:
+        for line in fh:
+            line = line.strip()
+            if line.startswith('['):
+                in_origin = re.match(r'^\[remote\s+"origin"\]$', line) is not None
+            elif in_origin:
+                key, _, value = line.partition('=')
+                if key.strip() == 'url':
+                    return value.strip()
+    return None
+
+
+def nextflow_info(workflow):
+    """Runs ``nextflow info`` for a workflow.
+
+    Args:
+        workflow (str): Workflow name, eg. ``nf-core/rnaseq``
+
+    Returns:
+        dict: ``repository`` and ``local_path`` of the workflow, where found.
+    """
+    try:
+        with open(os.devnull, 'w') as devnull:
+            nfinfo_raw = subprocess.check_output(['nextflow', 'info', '-d', workflow], stderr=devnull)
+    except OSError as e:
+        if e.errno == errno.ENOENT:
+            raise AssertionError("It looks like Nextflow is not installed. It is required for most nf-core functions.")
+        raise
+    except subprocess.CalledProcessError as e:
+        raise AssertionError("`nextflow info` returned non-zero error code: %s,\n   %s", e.returncode, e.output)
+    re_patterns = {
+        'repository': r"repository\s*: (.*)",
+        'local_path': r"local path\s*: (.*)"
+    }
+    if isinstance(nfinfo_raw, bytes):
+        nfinfo_raw = nfinfo_raw.decode()
+    nfinfo = {}
+    for key, pattern in re_patterns.items():
+        m = re.search(pattern, nfinfo_raw)
+        if m:
+            nfinfo[key] = m.group(1).strip()
+    return nfinfo
+
+
+def get_nf_assets_dir(workflow):
+    """Finds the directory where nextflow keeps pulled workflows.
+
+    Calls ``nextflow info`` once for a workflow that we know is pulled,
+    and strips the workflow name from the end of its local path.
+
+    Returns:
+        str: Path to the nextflow assets directory, or None if it could not be found.
+    """
+    local_path = nextflow_info(workflow).get('local_path')
+    if local_path is None:
+        return None
+    local_path = os.path.normpath(local_path)
+    wf_suffix = os.path.join('', *workflow.split('/'))
+    if not local_path.endswith(os.sep + wf_suffix):
+        return None
+    return local_path[:-len(wf_suffix)].rstrip(os.sep)
+
+
 def pretty_date(time):
     """Transforms a datetime object or a int() Epoch timestamp into a
     pretty string like 'an hour ago', 'Yesterday', '3 months ago',
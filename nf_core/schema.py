@@ -4,21 +4,206 @@
 from __future__ import print_function
 
 import click
+import collections
+import concurrent.futures
 import copy
+import hashlib
+import itertools
 import jinja2
 import json
 import jsonschema
 import logging
 import os
 import requests
-import requests_cache
 import sys
+import threading
 import time
 import webbrowser
 import yaml
 
 import nf_core.list, nf_core.utils
 
+# Number of compiled schema validators to keep
+VALIDATOR_CACHE_SIZE = 64
+
+# Files to validate when given a directory of params files
+PARAMS_FILE_EXTENSIONS = ('.json', '.yml', '.yaml')
+
+# Number of params files sent to each worker process at a time
+VALIDATE_CHUNK_SIZE = 16
+
+# Compiled validators, keyed by a hash of the schema
+_validators = collections.OrderedDict()
+_validators_lock = threading.Lock()
+
+
+def schema_hash(schema):
+    """Returns a SHA-256 hash of the contents of a schema, ignoring key order."""
+    return hashlib.sha256(json.dumps(schema, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+
+def get_validator(schema):
+    """Returns a compiled Draft 7 validator for a schema.
+
+    The schema is checked against the JSON Schema meta-schema the first time
+    it is seen, and the validator is then reused for any schema with the same contents.
+
+    Raises:
+        jsonschema.exceptions.SchemaError, if the schema is not valid JSON Schema.
+    """
+    key = schema_hash(schema)
+    with _validators_lock:
+        if key in _validators:
+            _validators.move_to_end(key)
+            return _validators[key]
+    jsonschema.Draft7Validator.check_schema(schema)
+    # Copy the schema, so that later changes to it don't affect the cached validator
+    validator = jsonschema.Draft7Validator(copy.deepcopy(schema))
+    with _validators_lock:
+        _validators[key] = validator
+        while len(_validators) > VALIDATOR_CACHE_SIZE:
+            _validators.popitem(last=False)
+    return validator
+
+
+def read_params_file(params_path):
+    """ Load a parameters file (JSON/YAML)
+
+    Returns:
+        dict: The parameters
+
+    Raises:
+        AssertionError, if the file can't be loaded as either JSON or YAML.
+    """
+    # First, try to load as JSON
+    try:
+        with open(params_path, 'r') as fh:
+            params = json.load(fh)
+        logging.debug("Loaded JSON input params: {}".format(params_path))
+    except Exception as json_e:
+        logging.debug("Could not load input params as JSON: {}".format(json_e))
+        # This failed, try to load as YAML
+        try:
+            with open(params_path, 'r') as fh:
+                params = yaml.safe_load(fh)
+            logging.debug("Loaded YAML input params: {}".format(params_path))
+        except Exception as yaml_e:
+            error_msg = "Could not load params file as either JSON or YAML:\n JSON: {}\n YAML: {}".format(json_e, yaml_e)
+            raise AssertionError(error_msg)
+    if not isinstance(params, dict):
+        raise AssertionError("Params file should contain a mapping of parameter names to values: {}".format(params_path))
+    return params
+
+
+def find_params_files(paths):
+    """ Expand directories in a list of paths to the params files inside them
+
+    Args:
+        paths (list): Paths to params files, or directories of ``.json`` / ``.yml`` / ``.yaml`` files
+
+    Returns:
+        list: Paths to params files, with the files in each directory sorted by name
+    """
+    params_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for fn in sorted(os.listdir(path)):
+                if fn.endswith(PARAMS_FILE_EXTENSIONS) and os.path.isfile(os.path.join(path, fn)):
+                    params_files.append(os.path.join(path, fn))
+        else:
+            params_files.append(path)
+    return params_files
+
+
+def read_params_jsonl(fh):
+    """ Read sets of parameters from a JSON lines file, one JSON object per line
+
+    Lines are parsed when they are validated, so that a broken line only fails itself.
+
+    Yields:
+        tuple: ``(name, line)``, where ``name`` is ``<filename>:<line number>``
+    """
+    name = getattr(fh, 'name', 'jsonl')
+    for line_number, line in enumerate(fh, start=1):
+        if line.strip():
+            yield ('{}:{}'.format(name, line_number), line)
+
+
+def validate_params_file(validator, params_path):
+    """ Validate a parameters file with a compiled validator
+
+    Args:
+        validator (jsonschema.Draft7Validator): Compiled validator, from :func:`get_validator`
+        params_path (str or tuple): Path to a params file, or a ``(name, JSON string)`` tuple
+            from :func:`read_params_jsonl`
+
+    Returns:
+        dict: ``params_file``, ``valid`` and a list of ``errors``, each with the
+        ``param`` path (dot-separated, empty for the top level) and a ``message``.
+    """
+    if isinstance(params_path, tuple):
+        name, params_json = params_path
+    else:
+        name, params_json = params_path, None
+    result = {'params_file': name, 'valid': False, 'errors': []}
+    try:
+        if params_json is None:
+            params = read_params_file(params_path)
+        else:
+            params = json.loads(params_json)
+            if not isinstance(params, dict):
+                raise AssertionError("Params should be a JSON object of parameter names to values")
+    except (AssertionError, ValueError) as e:
+        result['errors'].append({'param': '', 'message': str(e)})
+        return result
+    for error in sorted(validator.iter_errors(params), key=lambda e: list(e.absolute_path)):
+        result['errors'].append({
+            'param': '.'.join(str(p) for p in error.absolute_path),
+            'message': error.message
+        })
+    result['valid'] = len(result['errors']) == 0
+    return result
+
+
+def _validate_params_worker(schema, params_paths):
+    """ Validate a chunk of params files in a worker process, compiling the schema once per process """
+    validator = get_validator(schema)
+    return [validate_params_file(validator, params_path) for params_path in params_paths]
+
+
+def print_validation_results(results, as_json=False):
+    """ Print results from :meth:`PipelineSchema.validate_many` as they arrive
+
+    Args:
+        results (iterable): Validation results
+        as_json (bool): Print each result as a line of JSON to stdout, instead of log messages
+
+    Returns:
+        bool: True if all params files were valid
+    """
+    num_valid = 0
+    num_invalid = 0
+    for result in results:
+        if result['valid']:
+            num_valid += 1
+        else:
+            num_invalid += 1
+        if as_json:
+            print(json.dumps(result))
+            sys.stdout.flush()
+        elif result['valid']:
+            logging.info(click.style("[✓] {}".format(result['params_file']), fg='green'))
+        else:
+            logging.error(click.style("[✗] {}\n  {}".format(
+                result['params_file'],
+                "\n  ".join(
+                    "{}: {}".format(e['param'], e['message']) if e['param'] else e['message']
+                    for e in result['errors']
+                )
+            ), fg='red'))
+    logging.info("Validated {} params files: {} valid, {} invalid".format(num_valid + num_invalid, num_valid, num_invalid))
+    return num_invalid == 0
+
 
 class PipelineSchema (object):
     """ Class to generate a schema object with
@@ -139,30 +324,19 @@ class PipelineSchema (object):
         These should be input parameters used to run a pipeline with
         the Nextflow -params-file option.
         """
-        # First, try to load as JSON
         try:
-            with open(params_path, 'r') as fh:
-                params = json.load(fh)
-                self.input_params.update(params)
-            logging.debug("Loaded JSON input params: {}".format(params_path))
-        except Exception as json_e:
-            logging.debug("Could not load input params as JSON: {}".format(json_e))
-            # This failed, try to load as YAML
-            try:
-                with open(params_path, 'r') as fh:
-                    params = yaml.safe_load(fh)
-                    self.input_params.update(params)
-                    logging.debug("Loaded YAML input params: {}".format(params_path))
-            except Exception as yaml_e:
-                error_msg = "Could not load params file as either JSON or YAML:\n JSON: {}\n YAML: {}".format(json_e, yaml_e)
-                logging.error(error_msg)
-                raise AssertionError(error_msg)
+            self.input_params.update(read_params_file(params_path))
+        except AssertionError as e:
+            logging.error(e)
+            raise
 
     def validate_params(self):
         """ Check given parameters against a schema and validate """
         try:
             assert self.flat_schema is not None
-            jsonschema.validate(self.input_params, self.flat_schema)
+            error = jsonschema.exceptions.best_match(get_validator(self.flat_schema).iter_errors(self.input_params))
+            if error is not None:
+                raise error
         except AssertionError:
             logging.error(click.style("[✗] Flattened JSON Schema not found", fg='red'))
             return False
@@ -172,11 +346,47 @@ class PipelineSchema (object):
         logging.info(click.style("[✓] Input parameters look valid", fg='green'))
         return True
 
+    def validate_many(self, params_files, max_workers=1):
+        """ Validate many parameter files against the flattened schema
+
+        The schema is only compiled once (once per worker process), and each file
+        is validated on its own, without changing :attr:`self.input_params`.
+
+        Args:
+            params_files (iterable): Paths to JSON / YAML params files, or ``(name, JSON string)``
+                tuples from :func:`read_params_jsonl`
+            max_workers (int): Number of worker processes to validate files in.
+                Default: 1, validate in this process. None uses the number of CPUs.
+
+        Yields:
+            dict: Result for each file as it is validated, in the order given. See :func:`validate_params_file`
+        """
+        assert self.flat_schema is not None, "Flattened JSON Schema not found"
+        if max_workers == 1:
+            validator = get_validator(self.flat_schema)
+            for params_path in params_files:
+                yield validate_params_file(validator, params_path)
+            return
+        # Only read ahead a couple of chunks per worker, so that long streams of params aren't read up front
+        max_pending = 2 * (max_workers or os.cpu_count() or 1)
+        params_files = iter(params_files)
+        pending = collections.deque()
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            while True:
+                while len(pending) < max_pending:
+                    chunk = list(itertools.islice(params_files, VALIDATE_CHUNK_SIZE))
+                    if not chunk:
+                        break
+                    pending.append(executor.submit(_validate_params_worker, self.flat_schema, chunk))
+                if not pending:
+                    break
+                for result in pending.popleft().result():
+                    yield result
 
     def validate_schema(self, schema):
         """ Check that the Schema is valid """
         try:
-            jsonschema.Draft7Validator.check_schema(schema)
+            get_validator(schema)
             logging.debug("JSON Schema Draft7 validated")
         except jsonschema.exceptions.SchemaError as e:
             raise AssertionError("Schema does not validate as Draft 7 JSON Schema:\n {}".format(e))
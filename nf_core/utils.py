@@ -11,10 +11,19 @@ import logging
 import os
 import re
 import requests
-import requests_cache
+import shutil
 import subprocess
 import sys
+import threading
 import time
+import urllib.parse
+
+import nf_core.cache
+import nf_core.config_daemon
+import nf_core.config_parser
+
+# Process that installed the requests cache, if any
+_requests_cache_pid = None
 
 def fetch_wf_config(wf_path):
     """Uses Nextflow to retrieve the the configuration variables
@@ -28,45 +37,255 @@ def fetch_wf_config(wf_path):
     """
 
     config = dict()
-    cache_fn = None
-    cache_basedir = None
-    cache_path = None
-
-    # Build a cache directory if we can
-    if os.path.isdir(os.path.join(os.getenv("HOME"), '.nextflow')):
-        cache_basedir = os.path.join(os.getenv("HOME"), '.nextflow', 'nf-core')
-        if not os.path.isdir(cache_basedir):
-            os.mkdir(cache_basedir)
-
-    # If we're given a workflow object with a commit, see if we have a cached copy
-    cache_fn = None
-    # Make a filename based on file contents
-    concat_hash = ''
-    for fn in ['nextflow.config', 'main.nf']:
-        try:
-            with open(os.path.join(wf_path, fn), 'rb') as fh:
-                concat_hash += hashlib.sha256(fh.read()).hexdigest()
-        except FileNotFoundError as e:
-            pass
-    # Hash the hash
-    if len(concat_hash) > 0:
-        bighash = hashlib.sha256(concat_hash.encode('utf-8')).hexdigest()
-        cache_fn = 'wf-config-cache-{}.json'.format(bighash[:25])
-
-    if cache_basedir and cache_fn:
-        cache_path = os.path.join(cache_basedir, cache_fn)
-        if os.path.isfile(cache_path):
-            logging.debug("Found a config cache, loading: {}".format(cache_path))
-            with open(cache_path, 'r') as fh:
-                config = json.load(fh)
-            return config
+    cache = nf_core.cache.get_cache()
+    parser_mode = os.environ.get('NFCORE_CONFIG_PARSER', '')
+
+    # Make a cache key based on the contents of every config file, the Nextflow version and environment
+    # Verify mode always evaluates the config, otherwise a cache hit would skip the comparison
+    cache_key = get_wf_config_cache_key(wf_path, cache)
+    if cache_key is not None and parser_mode != 'verify':
+        cached_config = cache.get('wf_config', cache_key)
+        if cached_config is not None:
+            logging.debug("Found a config cache entry: {}".format(cache_key))
+            return cached_config
     logging.debug("No config cache found")
 
+    # Try evaluating the config in Python, without starting a JVM
+    if parser_mode in ['python', 'verify']:
+        try:
+            config = nf_core.config_parser.fetch_wf_config(wf_path)
+        except nf_core.config_parser.ConfigParseError as e:
+            logging.debug("Could not evaluate config in Python, falling back to Nextflow: {}".format(e))
+            config = dict()
+        else:
+            logging.debug("Evaluated workflow config in Python: {}".format(wf_path))
+
+    # Check the Python config against what Nextflow gives
+    if parser_mode == 'verify':
+        nf_config = fetch_wf_config_nextflow(wf_path)
+        if len(config) > 0:
+            differences = nf_core.config_parser.compare_wf_config(config, nf_config)
+            for k in sorted(differences):
+                logging.warning("Python config parser mismatch for '{}': {} (Nextflow: {})".format(k, *differences[k]))
+        config = nf_config
+
+    # Ask the long-lived config worker if it has been enabled
+    if len(config) == 0 and os.environ.get('NFCORE_CONFIG_DAEMON', '') != '':
+        daemon_config = nf_core.config_daemon.fetch_wf_config(wf_path)
+        if daemon_config is not None:
+            config = daemon_config
+
+    # Call `nextflow config` ourselves
+    if len(config) == 0:
+        config = fetch_wf_config_nextflow(wf_path)
+
+    # Scrape main.nf for additional parameter declarations
+    # Values in this file are likely to be complex, so don't both trying to capture them. Just get the param name.
+    try:
+        main_nf = os.path.join(wf_path, 'main.nf')
+        with open(main_nf, 'r') as fh:
+            for l in fh:
+                match = re.match(r'^\s*(params\.[a-zA-Z0-9_]+)\s*=', l)
+                if match:
+                    config[match.group(1)] = 'false'
+    except FileNotFoundError as e:
+        logging.debug("Could not open {} to look for parameter declarations - {}".format(main_nf, e))
+
+    # If we can, save a cached copy
+    if cache_key is not None:
+        logging.debug("Saving config cache entry: {}".format(cache_key))
+        cache.set('wf_config', cache_key, config)
+
+    return config
+
+
+def get_wf_config_files(wf_path, cache=None):
+    """Finds all files that can affect the config of a workflow.
+
+    Follows ``includeConfig`` statements transitively, starting from ``nextflow.config``.
+    Remote includes and paths that can't be resolved without running Nextflow are skipped.
+    Includes inside profiles or conditional blocks are also followed, to be safe.
+
+    The includes found in each file are stored in the ``config_includes``
+    namespace of ``cache`` alongside its size and modification time, so
+    that only files that have changed are read again.
+
+    Args:
+        wf_path (str): Nextflow workflow file system path.
+        cache (CacheStore): Cache to store the includes of each file in. Default: don't store them.
+
+    Returns:
+        list: Absolute paths of existing files, including ``main.nf``.
+    """
+    wf_path = os.path.abspath(wf_path)
+    known_includes = (cache.get('config_includes', wf_path) if cache is not None else None) or {}
+    file_includes = {}
+    config_files = []
+    to_scan = [os.path.join(wf_path, 'nextflow.config')]
+    while len(to_scan) > 0:
+        fn = to_scan.pop(0)
+        if fn in config_files or not os.path.isfile(fn):
+            continue
+        config_files.append(fn)
+        st = os.stat(fn)
+        known = known_includes.get(fn)
+        if known is not None and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+            includes = known[2]
+        else:
+            includes = find_config_includes(fn, wf_path)
+        # Don't trust the modification time of files that were only just written
+        if time.time() - st.st_mtime > 2:
+            file_includes[fn] = [st.st_size, st.st_mtime_ns, includes]
+        to_scan.extend(includes)
+    main_nf = os.path.join(wf_path, 'main.nf')
+    if os.path.isfile(main_nf):
+        config_files.append(main_nf)
+
+    # Save updated includes
+    if cache is not None and file_includes != known_includes:
+        cache.set('config_includes', wf_path, file_includes)
+    return config_files
+
+
+def find_config_includes(fn, wf_path):
+    """Finds the local files included by a config file with ``includeConfig``.
+
+    Args:
+        fn (str): Absolute path to the config file.
+        wf_path (str): Absolute path to the workflow, used for ``baseDir`` / ``projectDir``.
+
+    Returns:
+        list: Absolute paths of the included files, which may not exist.
+    """
+    include_re = re.compile(r'includeConfig\s*\(?\s*([\'"])(.+?)\1')
+    includes = []
+    with open(fn, 'r', errors='replace') as fh:
+        content = fh.read()
+    for match in include_re.finditer(content):
+        include_path = re.sub(r'\$\{?(baseDir|projectDir)\}?', lambda m: wf_path, match.group(2))
+        if '$' in include_path or re.match(r'^\w+://', include_path):
+            logging.debug("Skipping config include for cache key: {}".format(match.group(2)))
+            continue
+        if not os.path.isabs(include_path):
+            include_path = os.path.join(os.path.dirname(fn), include_path)
+        includes.append(os.path.normpath(include_path))
+    return includes
+
+
+def get_nextflow_version():
+    """Finds the Nextflow version without starting a JVM.
+
+    Uses ``$NXF_VER`` if set, otherwise reads the default version from the
+    ``nextflow`` launcher script. If that can't be found, the path, size and
+    modification time of the launcher are returned instead, which still
+    change when Nextflow is updated.
+
+    Returns:
+        str: Nextflow version (or launcher fingerprint), or None if Nextflow was not found.
+    """
+    if os.environ.get('NXF_VER', '') != '':
+        return os.environ['NXF_VER']
+    nf_launcher = shutil.which('nextflow')
+    if nf_launcher is None:
+        return None
+    try:
+        with open(nf_launcher, 'r', errors='replace') as fh:
+            match = re.search(r'NXF_VER=\$\{NXF_VER:-[\'"]?([\w.\-]+)[\'"]?\}', fh.read(65536))
+        if match:
+            return match.group(1)
+        st = os.stat(nf_launcher)
+    except OSError:
+        return None
+    return '{}:{}:{}'.format(nf_launcher, st.st_size, st.st_mtime_ns)
+
+
+def get_wf_config_cache_key(wf_path, cache=None):
+    """Builds a cache key for the config of a workflow.
+
+    The key covers the contents of all files from :func:`get_wf_config_files`,
+    the Nextflow version, all ``NXF_*`` environment variables and the
+    config parser in use. File contents are hashed with :func:`get_file_hashes`.
+
+    Args:
+        wf_path (str): Nextflow workflow file system path.
+        cache (CacheStore): Cache to store file hashes and config includes in. Default: don't store them.
+
+    Returns:
+        str: A sha256 hex digest, or None if the workflow has no config files.
+    """
+    config_files = get_wf_config_files(wf_path, cache)
+    if len(config_files) == 0:
+        return None
+
+    file_hashes = get_file_hashes(config_files, cache)
+    wf_path = os.path.abspath(wf_path)
+    key_parts = [[os.path.relpath(fn, wf_path), file_hashes[fn]] for fn in config_files]
+    key_parts.append(['nextflow', get_nextflow_version()])
+    key_parts.append(['parser', os.environ.get('NFCORE_CONFIG_PARSER', '')])
+    for k in sorted(os.environ):
+        if k.startswith('NXF_'):
+            key_parts.append([k, os.environ[k]])
+
+    return hashlib.sha256(json.dumps(key_parts).encode('utf-8')).hexdigest()
+
+
+def get_file_hashes(paths, cache=None):
+    """Returns sha256 hashes of the contents of files.
+
+    To avoid re-reading unchanged files, hashes are stored in the ``file_hashes``
+    namespace of ``cache`` alongside the size and modification time of
+    each file and reused if these have not changed.
+
+    Args:
+        paths (list): Absolute paths to existing files.
+        cache (CacheStore): Cache to store file hashes in. Default: don't store them.
+
+    Returns:
+        dict: sha256 hex digest for each path
+    """
+    # Load known file hashes
+    known_hashes = cache.get_many('file_hashes', paths) if cache is not None else {}
+    new_hashes = {}
+    file_hashes = {}
+    for fn in paths:
+        st = os.stat(fn)
+        known = known_hashes.get(fn)
+        if known is not None and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+            file_hashes[fn] = known[2]
+            continue
+        sha = hashlib.sha256()
+        with open(fn, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(1024 * 1024), b''):
+                sha.update(chunk)
+        file_hashes[fn] = sha.hexdigest()
+        # Don't trust the modification time of files that were only just written
+        if time.time() - st.st_mtime > 2:
+            new_hashes[fn] = [st.st_size, st.st_mtime_ns, file_hashes[fn]]
+
+    # Save updated file hashes
+    if cache is not None:
+        cache.set_many('file_hashes', new_hashes)
+    return file_hashes
+
+
+def fetch_wf_config_nextflow(wf_path, env=None):
+    """Runs ``nextflow config -flat`` and parses the output.
+
+    Does not use any caching and does not look at ``main.nf`` -
+    see :func:`fetch_wf_config` for that.
+
+    Args:
+        wf_path (str): Nextflow workflow file system path.
+        env (dict): Environment to run Nextflow with. Default: the current environment.
 
+    Returns:
+        dict: Workflow configuration settings.
+    """
+    config = dict()
     # Call `nextflow config` and pipe stderr to /dev/null
     try:
         with open(os.devnull, 'w') as devnull:
-            nfconfig_raw = subprocess.check_output(['nextflow', 'config', '-flat', wf_path], stderr=devnull)
+            nfconfig_raw = subprocess.check_output(['nextflow', 'config', '-flat', wf_path], stderr=devnull, env=env)
     except OSError as e:
         if e.errno == errno.ENOENT:
             raise AssertionError("It looks like Nextflow is not installed. It is required for most nf-core functions.")
@@ -80,25 +299,6 @@ def fetch_wf_config(wf_path):
                 config[k] = v
             except ValueError:
                 logging.debug("Couldn't find key=value config pair:\n  {}".format(ul))
-
-    # Scrape main.nf for additional parameter declarations
-    # Values in this file are likely to be complex, so don't both trying to capture them. Just get the param name.
-    try:
-        main_nf = os.path.join(wf_path, 'main.nf')
-        with open(main_nf, 'r') as fh:
-            for l in fh:
-                match = re.match(r'^\s*(params\.[a-zA-Z0-9_]+)\s*=', l)
-                if match:
-                    config[match.group(1)] = 'false'
-    except FileNotFoundError as e:
-        logging.debug("Could not open {} to look for parameter declarations - {}".format(main_nf, e))
-
-    # If we can, save a cached copy
-    if cache_path:
-        logging.debug("Saving config cache: {}".format(cache_path))
-        with open(cache_path, 'w') as fh:
-            json.dump(config, fh, indent=4)
-
     return config
 
 
@@ -106,8 +306,12 @@ def setup_requests_cachedir():
     """Sets up local caching for faster remote HTTP requests.
 
     Caching directory will be set up in the user's home directory under
-    a .nfcore_cache subdir.
+    a .nfcore_cache subdir. Only done once per process, so this can be
+    called by every function that talks to a remote API.
     """
+    global _requests_cache_pid
+    if _requests_cache_pid == os.getpid():
+        return
     # Only import it if we need it
     import requests_cache
 
@@ -120,6 +324,7 @@ def setup_requests_cachedir():
         expire_after=datetime.timedelta(hours=1),
         backend='sqlite',
     )
+    _requests_cache_pid = os.getpid()
 
 def wait_cli_function(poll_func, poll_every=20):
     """
@@ -166,7 +371,9 @@ def poll_nfcore_web_api(api_url, post_data=None):
     Expects API reponse to be valid JSON and contain a top-level 'status' key.
     """
     # Clear requests_cache so that we get the updated statuses
-    requests_cache.clear()
+    if _requests_cache_pid is not None:
+        import requests_cache
+        requests_cache.clear()
     try:
         if post_data is None:
             response = requests.get(api_url, headers={'Cache-Control': 'no-cache'})
@@ -189,3 +396,27 @@ def poll_nfcore_web_api(api_url, post_data=None):
                 raise AssertionError("nf-core website API results response not recognised: {}\n See verbose log for full response".format(api_url))
             else:
                 return web_response
+
+
+class HostRateLimiter(object):
+    """Spaces out HTTP requests to each host, for use from many threads at once.
+
+    Args:
+        rate (float): Maximum number of requests per second to a single host. Default: no limit.
+    """
+    def __init__(self, rate=None):
+        self.rate = rate
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        """Blocks until a request to the host of ``url`` may be sent."""
+        if not self.rate:
+            return
+        host = urllib.parse.urlparse(url).netloc
+        with self._lock:
+            now = time.time()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + 1.0 / self.rate
+        if slot > now:
+            time.sleep(slot - now)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+""" Tests covering the on-disk cache store.
+"""
+
+import nf_core.cache
+
+import mock
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+NF_CORE_SCRIPT = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'scripts', 'nf-core')
+
+class TestCache(unittest.TestCase):
+    """Class for cache store tests"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = nf_core.cache.CacheStore(os.path.join(self.tmp_dir, 'cache', 'cache.sqlite'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_get_set(self):
+        """ Values are stored per namespace and round-trip through JSON """
+        assert self.cache.get('foo', 'key') is None
+        self.cache.set('foo', 'key', {'a': [1, 2]})
+        assert self.cache.get('foo', 'key') == {'a': [1, 2]}
+        assert self.cache.get('bar', 'key') is None
+        self.cache.delete('foo', 'key')
+        assert self.cache.get('foo', 'key') is None
+
+    def test_get_many(self):
+        self.cache.set_many('foo', {'a': 1, 'b': 2})
+        assert self.cache.get_many('foo', ['a', 'b', 'c']) == {'a': 1, 'b': 2}
+        assert sorted(self.cache.keys('foo')) == ['a', 'b']
+
+    def test_stats(self):
+        """ Hits and misses are counted per namespace """
+        self.cache.set('foo', 'key', 'value')
+        self.cache.get('foo', 'key')
+        self.cache.get('foo', 'other')
+        self.cache.get_many('foo', ['key', 'other'])
+        stats = self.cache.stats()['foo']
+        assert stats['entries'] == 1
+        assert stats['hits'] == 2
+        assert stats['misses'] == 2
+
+    def test_total_size(self):
+        """ The running total matches the entries after every kind of write """
+        def summed_size():
+            return self.cache._connect().execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        self.cache.set_many('foo', {'a': 'x' * 10, 'b': 'x' * 20})
+        self.cache.set('foo', 'a', 'x' * 30)
+        assert self.cache.total_size() == summed_size() > 0
+        self.cache.delete('foo', 'b')
+        assert self.cache.total_size() == summed_size()
+        self.cache.set('bar', 'c', 1)
+        self.cache.clear('foo')
+        assert self.cache.total_size() == summed_size() > 0
+        self.cache.clear()
+        assert self.cache.total_size() == 0
+
+    def test_evict_least_recently_used(self):
+        """ The oldest entries are evicted once the cache is too big """
+        self.cache.max_size = 100
+        with mock.patch('time.time', return_value=1000):
+            self.cache.set('foo', 'old', 'x' * 40)
+        with mock.patch('time.time', return_value=2000):
+            self.cache.set('foo', 'new', 'x' * 40)
+        with mock.patch('time.time', return_value=3000):
+            # Using the older entry makes it the most recently used
+            self.cache.get('foo', 'old')
+            self.cache.set('foo', 'newest', 'x' * 40)
+        assert self.cache.get('foo', 'new') is None
+        assert self.cache.get('foo', 'old') is not None
+        assert self.cache.get('foo', 'newest') is not None
+        assert self.cache.total_size() <= 100
+
+    def test_prune_max_age(self):
+        with mock.patch('time.time', return_value=time.time() - 3600):
+            self.cache.set('foo', 'old', 1)
+        self.cache.set('foo', 'new', 2)
+        assert self.cache.prune(max_age=60) == 1
+        assert self.cache.get_many('foo', ['old', 'new']) == {'new': 2}
+
+    def test_prune_daily(self):
+        """ Stale entries are pruned on first use once a day, even when the cache is small """
+        now = time.time()
+        with mock.patch('time.time', return_value=now - nf_core.cache.MAX_AGE - 3600):
+            self.cache.set('foo', 'old', 1)
+        self.cache.set('foo', 'new', 2)
+        assert sorted(self.cache.keys('foo')) == ['new', 'old']
+        # A new process using the cache a day later prunes the stale entry
+        cache = nf_core.cache.CacheStore(self.cache.path)
+        with mock.patch('time.time', return_value=now + nf_core.cache.PRUNE_INTERVAL + 1):
+            assert cache.get('foo', 'new') == 2
+        assert cache.keys('foo') == ['new']
+
+    def test_clear(self):
+        self.cache.set('foo', 'key', 1)
+        self.cache.set('bar', 'key', 1)
+        assert self.cache.clear('foo') == 1
+        assert list(self.cache.stats()) == ['bar']
+        assert self.cache.clear() == 1
+        assert self.cache.stats() == {}
+
+    def test_cache_cli_help(self):
+        """ The nf-core script starts and lists the cache subcommands """
+        for args in [['--help'], ['cache', '--help']]:
+            proc = subprocess.run(
+                [sys.executable, NF_CORE_SCRIPT] + args,
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True
+            )
+            assert proc.returncode == 0, proc.stderr
+            assert ('cache' if args[0] == '--help' else 'prune') in proc.stdout
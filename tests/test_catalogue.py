@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+""" Tests covering the local catalogue of nf-core pipelines.
+"""
+
+import nf_core.catalogue
+
+import mock
+import os
+import requests
+import shutil
+import tempfile
+import unittest
+
+PIPELINES = [
+    {
+        'name': 'rnaseq',
+        'full_name': 'nf-core/rnaseq',
+        'description': 'RNA sequencing analysis pipeline',
+        'topics': ['RNA-seq', 'pipeline'],
+        'stargazers_count': 81,
+        'releases': [
+            {'tag_name': '1.3', 'tag_sha': 'a' * 40, 'published_at': '2019-03-26T10:00:00Z'},
+            {'tag_name': '1.4', 'tag_sha': 'b' * 40, 'published_at': '2019-10-01T00:00:00Z'}
+        ]
+    },
+    {
+        'name': 'atacseq',
+        'full_name': 'nf-core/atacseq',
+        'description': 'ATAC-seq analysis pipeline',
+        'topics': ['atac-seq', 'pipeline'],
+        'stargazers_count': 20,
+        'releases': []
+    }
+]
+
+def mock_response(status_code, workflows=None, etag=None):
+    response = mock.Mock()
+    response.status_code = status_code
+    response.headers = {'ETag': etag} if etag else {}
+    response.json.return_value = {'remote_workflows': workflows}
+    return response
+
+class TestCatalogue(unittest.TestCase):
+    """Class for pipeline catalogue tests"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.catalogue = nf_core.catalogue.RemoteCatalogue(os.path.join(self.tmp_dir, 'pipelines.sqlite'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_parse_timestamp(self):
+        assert nf_core.catalogue.parse_timestamp('1970-01-02T00:00:00Z') == 86400
+
+    def test_query(self):
+        """ Pipelines can be queried by name, topic and release hash """
+        self.catalogue.update(PIPELINES)
+        assert [wf['name'] for wf in self.catalogue.get_workflows()] == ['atacseq', 'rnaseq']
+        assert [wf['name'] for wf in self.catalogue.get_workflows(sort_by='stars')] == ['rnaseq', 'atacseq']
+        assert [wf['name'] for wf in self.catalogue.get_workflows(topic='rna-seq')] == ['rnaseq']
+        rnaseq = self.catalogue.get_workflow('nf-core/rnaseq')
+        assert rnaseq == self.catalogue.get_workflow('rnaseq')
+        assert rnaseq['releases'][1]['published_at_timestamp'] == nf_core.catalogue.parse_timestamp('2019-10-01T00:00:00Z')
+        assert self.catalogue.get_workflow('missing') is None
+        assert self.catalogue.find_release('b' * 40) == ('rnaseq', '1.4')
+        assert self.catalogue.find_release('c' * 40) is None
+
+        # Updating replaces everything
+        self.catalogue.update(PIPELINES[1:])
+        assert [wf['name'] for wf in self.catalogue.get_workflows()] == ['atacseq']
+        assert self.catalogue.find_release('b' * 40) is None
+
+    @mock.patch('requests.get')
+    def test_refresh(self, mock_get):
+        """ The catalogue is only fetched again when it may have changed """
+        mock_get.return_value = mock_response(200, PIPELINES, etag='"v1"')
+        assert self.catalogue.refresh()
+        assert len(self.catalogue.get_workflows()) == 2
+        assert mock_get.call_args[1]['headers'] == {'Cache-Control': 'no-store'}
+
+        # Checked recently, so no request
+        assert self.catalogue.refresh()
+        assert mock_get.call_count == 1
+
+        # Unchanged
+        mock_get.return_value = mock_response(304)
+        assert self.catalogue.refresh(max_age=0)
+        assert mock_get.call_args[1]['headers']['If-None-Match'] == '"v1"'
+        assert len(self.catalogue.get_workflows()) == 2
+
+        # Offline, so use the last snapshot
+        mock_get.side_effect = requests.exceptions.ConnectionError('offline')
+        assert self.catalogue.refresh(max_age=0)
+        assert len(self.catalogue.get_workflows()) == 2
+
+    @mock.patch('requests.get')
+    def test_refresh_offline_no_snapshot(self, mock_get):
+        mock_get.side_effect = requests.exceptions.ConnectionError('offline')
+        assert not self.catalogue.refresh()
+        mock_get.side_effect = None
+        mock_get.return_value = mock_response(500)
+        assert not self.catalogue.refresh()
+        assert self.catalogue.get_workflows() == []
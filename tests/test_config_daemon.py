@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+""" Tests covering the long-lived config worker
+"""
+
+import nf_core.config_daemon
+import nf_core.utils
+
+import fcntl
+import mock
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+PATH_WORKING_EXAMPLE = os.path.join(os.path.dirname(__file__), 'lint_examples/minimalworkingexample')
+
+class TestConfigDaemon(unittest.TestCase):
+    """Class for config worker tests"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.tmp_dir, 'test.sock')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def start_server(self):
+        """ Run a config worker in a background thread """
+        server = nf_core.config_daemon.ConfigDaemon(self.socket_path)
+        thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.1})
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    @mock.patch('nf_core.utils.fetch_wf_config_nextflow')
+    def test_fetch_config_from_daemon(self, mock_nextflow):
+        """ Config comes back from the worker and is only resolved once """
+        mock_nextflow.return_value = {'params.outdir': "'./results'"}
+        self.start_server()
+        for _ in range(3):
+            config = nf_core.config_daemon.fetch_wf_config(PATH_WORKING_EXAMPLE, self.socket_path, start=False)
+            assert config == {'params.outdir': "'./results'"}
+        assert mock_nextflow.call_count == 1
+
+    @mock.patch('nf_core.utils.fetch_wf_config_nextflow')
+    def test_fetch_config_daemon_error(self, mock_nextflow):
+        """ Errors from Nextflow are passed back to the client """
+        mock_nextflow.side_effect = AssertionError("It looks like Nextflow is not installed.")
+        self.start_server()
+        with self.assertRaises(AssertionError):
+            nf_core.config_daemon.fetch_wf_config(PATH_WORKING_EXAMPLE, self.socket_path, start=False)
+
+    def test_fetch_config_no_daemon(self):
+        """ Returns None if no worker is listening, so that callers fall back """
+        config = nf_core.config_daemon.fetch_wf_config(PATH_WORKING_EXAMPLE, self.socket_path, start=False)
+        assert config is None
+
+    @mock.patch('nf_core.utils.fetch_wf_config_nextflow')
+    def test_fingerprint_invalidates(self, mock_nextflow):
+        """ Editing a config file means Nextflow is called again """
+        wf_path = os.path.join(self.tmp_dir, 'wf')
+        shutil.copytree(PATH_WORKING_EXAMPLE, wf_path)
+        mock_nextflow.return_value = {}
+        server = nf_core.config_daemon.ConfigDaemon(self.socket_path)
+        self.addCleanup(server.server_close)
+        server.resolve(wf_path)
+        server.resolve(wf_path)
+        with open(os.path.join(wf_path, 'nextflow.config'), 'a') as fh:
+            fh.write("\nincludeConfig 'conf/base.config'\n")
+        server.resolve(wf_path)
+        assert mock_nextflow.call_count == 2
+        # Included files are part of the fingerprint too
+        with open(os.path.join(wf_path, 'conf', 'base.config'), 'a') as fh:
+            fh.write('\nprocess.cpus = 2\n')
+        server.resolve(wf_path)
+        assert mock_nextflow.call_count == 3
+
+    @mock.patch('nf_core.config_daemon.ConfigDaemon')
+    def test_run_daemon_locked(self, mock_daemon):
+        """ A worker doesn't replace the socket while another worker holds the lock """
+        with open(self.socket_path, 'w') as fh:
+            fh.write('stale')
+        with open('{}.lock'.format(self.socket_path), 'w') as lock_fh:
+            fcntl.flock(lock_fh, fcntl.LOCK_EX)
+            nf_core.config_daemon.run_daemon(self.socket_path)
+        mock_daemon.assert_not_called()
+        assert os.path.isfile(self.socket_path)
+
+    def test_run_daemon_stale_socket(self):
+        """ A socket left behind by a dead worker is replaced """
+        with open(self.socket_path, 'w') as fh:
+            fh.write('stale')
+        nf_core.config_daemon.run_daemon(self.socket_path, idle_timeout=0)
+        assert not os.path.exists(self.socket_path)
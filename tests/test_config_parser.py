@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+""" Tests covering the pure-Python Nextflow config parser
+"""
+
+import nf_core.cache
+import nf_core.config_parser
+import nf_core.utils
+
+import mock
+import os
+import shutil
+import tempfile
+import unittest
+
+PATH_WORKING_EXAMPLE = os.path.join(os.path.dirname(__file__), 'lint_examples/minimalworkingexample')
+PATH_TEMPLATE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'nf_core', 'pipeline-template', '{{cookiecutter.name_noslash}}')
+
+class TestConfigParser(unittest.TestCase):
+    """Class for config parser tests"""
+
+    def setUp(self):
+        self.wf_path = tempfile.mkdtemp()
+        # Keep fetch_wf_config away from the user's ~/.nfcore/cache.sqlite
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache_patch = mock.patch('nf_core.cache.get_cache', return_value=nf_core.cache.CacheStore(os.path.join(self.cache_dir, 'cache.sqlite')))
+        self.cache_patch.start()
+
+    def tearDown(self):
+        self.cache_patch.stop()
+        shutil.rmtree(self.cache_dir)
+        shutil.rmtree(self.wf_path)
+
+    def parse_config(self, content, profiles=None, files=None):
+        """ Write a nextflow.config and parse it """
+        for fn, file_content in dict(files or {}, **{'nextflow.config': content}).items():
+            path = os.path.join(self.wf_path, fn)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'w') as fh:
+                fh.write(file_content)
+        return nf_core.config_parser.fetch_wf_config(self.wf_path, profiles)
+
+    def test_working_example(self):
+        """ Parse the minimal working example used for lint tests """
+        config = nf_core.config_parser.fetch_wf_config(PATH_WORKING_EXAMPLE)
+        assert config['manifest.name'] == "'nf-core/tools'"
+        assert config['process.memory'] == "'2 GB'"
+        assert config['process.time'] == "'14h'"
+        assert config['params.single_end'] == 'false'
+        assert config['params.custom_config_base'] == "'https://raw.githubusercontent.com/nf-core/configs/master'"
+
+    def test_pipeline_template(self):
+        """ Parse the pipeline template, with includes, try / catch, if, def and profiles """
+        config = nf_core.config_parser.fetch_wf_config(PATH_TEMPLATE)
+        assert config['params.tracedir'] == "'./results/pipeline_info'"
+        assert config['params.max_time'] == "'10d'"
+        assert config['params.max_memory'] == "'128 GB'"
+        assert config['process.shell'] == "['/bin/bash', '-euo', 'pipefail']"
+        assert config['process.cpus'] == "{ check_max( 1 * task.attempt, 'cpus' ) }"
+        assert config['process.withName:get_software_versions.cache'] == 'false'
+        assert config['env.PYTHONNOUSERSITE'] == '1'
+        assert 'params.genomes.GRCh37.fasta' in config
+        assert 'docker.enabled' not in config
+
+    def test_profiles(self):
+        """ Only selected profiles are applied """
+        config = nf_core.config_parser.fetch_wf_config(PATH_TEMPLATE, ['docker', 'test'])
+        assert config['docker.enabled'] == 'true'
+        assert config['docker.runOptions'] == "'-u $(id -u):$(id -g)'"
+        assert 'singularity.enabled' not in config
+        assert 'params.input_paths' in config
+
+    def test_if_else(self):
+        config = self.parse_config("params.a = false\nif (!params.a) {\n  params.b = 1\n} else {\n  params.b = 2\n}\n")
+        assert config['params.b'] == '1'
+
+    def test_include_relative(self):
+        config = self.parse_config(
+            "includeConfig 'conf/base.config'\n",
+            files={'conf/base.config': "includeConfig 'other.config'\nprocess { cpus = 2 }", 'conf/other.config': "params.x = 'y'"}
+        )
+        assert config == {'process.cpus': '2', 'params.x': "'y'"}
+
+    def test_gstring_and_operators(self):
+        config = self.parse_config(
+            "params {\n  outdir = 'results'\n  name = \"$params.outdir/${params.outdir + '_x'}\"\n  n = (2 + 3) * 2\n  e = params.missing ?: 'default'\n}\n"
+        )
+        assert config['params.name'] == "'results/results_x'"
+        assert config['params.n'] == '10'
+        assert config['params.e'] == "'default'"
+
+    def test_try_rollback(self):
+        """ A failed include in a try block undoes the assignments made before it """
+        config = self.parse_config("params.a = 1\ntry {\n  params.a = 2\n  params.b = 3\n  includeConfig 'not_here.config'\n} catch (Exception e) {\n}\n")
+        assert config == {'params.a': '1'}
+
+    def test_try_unsupported_syntax(self):
+        """ Unsupported syntax inside a try block is not swallowed """
+        with self.assertRaises(nf_core.config_parser.ConfigParseError):
+            self.parse_config("try {\n  params.x = new File('foo').text\n} catch (Exception e) {\n}\n")
+
+    def test_division(self):
+        """ Integer division only gives a value when Groovy would print the same thing """
+        config = self.parse_config("params.a = 4 / 2\nparams.b = 5.0 / 2\n")
+        assert config == {'params.a': '2', 'params.b': '2.5'}
+        with self.assertRaises(nf_core.config_parser.ConfigParseError):
+            self.parse_config("params.c = 5 / 2\n")
+
+    def test_unsupported_syntax(self):
+        """ Syntax outside the supported subset raises a ConfigParseError """
+        with self.assertRaises(nf_core.config_parser.ConfigParseError):
+            self.parse_config("params.x = new File('foo').text\n")
+
+    def test_missing_include(self):
+        with self.assertRaises(nf_core.config_parser.ConfigParseError):
+            self.parse_config("includeConfig 'not_here.config'\n")
+
+    def test_include_cycle(self):
+        """ Config files that include each other raise an error instead of recursing forever """
+        with self.assertRaises(nf_core.config_parser.ConfigIncludeError):
+            self.parse_config("includeConfig 'conf/base.config'\n", files={'conf/base.config': "includeConfig '../nextflow.config'"})
+
+    def test_evaluation_error(self):
+        """ Errors from evaluating values are raised as a ConfigParseError """
+        with self.assertRaises(nf_core.config_parser.ConfigParseError):
+            self.parse_config("params.x = 'abc'.toInteger()\n")
+
+    def test_compare_configs(self):
+        differences = nf_core.config_parser.compare_wf_config({'a': '1', 'b': '2'}, {'a': '1', 'b': '3', 'c': '4'})
+        assert differences == {'b': ('2', '3'), 'c': (None, '4')}
+
+    @mock.patch.dict(os.environ, {'NFCORE_CONFIG_PARSER': 'python'})
+    @mock.patch('nf_core.utils.fetch_wf_config_nextflow')
+    def test_fetch_wf_config_python(self, mock_nextflow):
+        """ fetch_wf_config uses the Python parser without calling Nextflow """
+        config = nf_core.utils.fetch_wf_config(PATH_WORKING_EXAMPLE)
+        assert config['manifest.name'] == "'nf-core/tools'"
+        mock_nextflow.assert_not_called()
+
+    @mock.patch.dict(os.environ, {'NFCORE_CONFIG_PARSER': 'verify'})
+    @mock.patch('nf_core.utils.fetch_wf_config_nextflow')
+    def test_fetch_wf_config_verify(self, mock_nextflow):
+        """ Verify mode returns the Nextflow config """
+        mock_nextflow.return_value = {'manifest.name': "'nf-core/other'"}
+        config = nf_core.utils.fetch_wf_config(PATH_WORKING_EXAMPLE)
+        assert config['manifest.name'] == "'nf-core/other'"
+
+    @mock.patch.dict(os.environ, {'NFCORE_CONFIG_PARSER': 'verify'})
+    @mock.patch('nf_core.utils.fetch_wf_config_nextflow')
+    def test_fetch_wf_config_verify_cached(self, mock_nextflow):
+        """ Verify mode compares against Nextflow even when the config is cached """
+        mock_nextflow.return_value = {'manifest.name': "'nf-core/other'"}
+        nf_core.utils.fetch_wf_config(PATH_WORKING_EXAMPLE)
+        with mock.patch('logging.warning') as mock_warning:
+            nf_core.utils.fetch_wf_config(PATH_WORKING_EXAMPLE)
+        assert mock_nextflow.call_count == 2
+        mock_warning.assert_any_call("Python config parser mismatch for 'manifest.name': 'nf-core/tools' (Nextflow: 'nf-core/other')")
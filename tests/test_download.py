@@ -2,18 +2,45 @@
 """Tests for the download subcommand of nf-core tools
 """
 
+import nf_core.cache
+import nf_core.download
 import nf_core.utils
 from nf_core.download import DownloadWorkflow
 
+import click.testing
+import errno
 import hashlib
+import importlib.machinery
+import importlib.util
 import mock
 import os
 import pytest
+import requests
 import shutil
+import tarfile
 import tempfile
 import unittest
+from zipfile import ZipFile
 
 PATH_WORKING_EXAMPLE = os.path.join(os.path.dirname(__file__), 'lint_examples/minimalworkingexample')
+NF_CORE_SCRIPT = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'scripts', 'nf-core')
+
+def load_cli():
+    """ Loads the nf-core command line script as a module, to run it with click's CliRunner """
+    loader = importlib.machinery.SourceFileLoader('nf_core_script', NF_CORE_SCRIPT)
+    module = importlib.util.module_from_spec(importlib.util.spec_from_loader(loader.name, loader))
+    loader.exec_module(module)
+    return module.nf_core_cli
+
+def mock_download_response(content, status_code=200, headers=None):
+    """ Makes a fake streamed requests response """
+    response = mock.MagicMock()
+    response.status_code = status_code
+    response.headers = {'Content-Length': str(len(content))}
+    response.headers.update(headers or {})
+    response.iter_content.return_value = [content[i:i+4] for i in range(0, len(content), 4)]
+    response.__enter__.return_value = response
+    return response
 
 class DownloadTest(unittest.TestCase):
 
@@ -113,6 +140,115 @@ class DownloadTest(unittest.TestCase):
         download_obj.wf_download_url = "https://github.com/nf-core/methylseq/archive/1.0.zip"
         download_obj.download_wf_files()
 
+    #
+    # Tests for 'download_file'
+    #
+    @mock.patch('requests.get')
+    def test_download_file(self, mock_get):
+        """ Files are streamed to disk and the partial file is moved into place """
+        tmp_dir = tempfile.mkdtemp()
+        out_fn = os.path.join(tmp_dir, 'test.zip')
+        mock_get.return_value = mock_download_response(b'0123456789', headers={'ETag': '"abc"'})
+        nf_core.download.download_file('https://example.com/test.zip', out_fn, show_progress=False)
+        with open(out_fn, 'rb') as fh:
+            assert fh.read() == b'0123456789'
+        assert os.listdir(tmp_dir) == ['test.zip']
+        assert mock_get.call_args[1]['stream'] is True
+        assert 'Range' not in mock_get.call_args[1]['headers']
+        shutil.rmtree(tmp_dir)
+
+    @mock.patch('requests.get')
+    def test_download_file_resume(self, mock_get):
+        """ Partial downloads are resumed with a Range request """
+        tmp_dir = tempfile.mkdtemp()
+        out_fn = os.path.join(tmp_dir, 'test.zip')
+        with open(out_fn + '.part', 'wb') as fh:
+            fh.write(b'01234')
+        with open(out_fn + '.part.etag', 'w') as fh:
+            fh.write('"abc"')
+        mock_get.return_value = mock_download_response(b'56789', status_code=206)
+        nf_core.download.download_file('https://example.com/test.zip', out_fn, show_progress=False)
+        with open(out_fn, 'rb') as fh:
+            assert fh.read() == b'0123456789'
+        assert mock_get.call_args[1]['headers']['Range'] == 'bytes=5-'
+        assert mock_get.call_args[1]['headers']['If-Range'] == '"abc"'
+        assert os.listdir(tmp_dir) == ['test.zip']
+        shutil.rmtree(tmp_dir)
+
+    @mock.patch('requests.get')
+    def test_download_file_changed(self, mock_get):
+        """ The download starts again if the file changed since the partial download """
+        tmp_dir = tempfile.mkdtemp()
+        out_fn = os.path.join(tmp_dir, 'test.zip')
+        with open(out_fn + '.part', 'wb') as fh:
+            fh.write(b'old')
+        with open(out_fn + '.part.etag', 'w') as fh:
+            fh.write('"abc"')
+        mock_get.return_value = mock_download_response(b'new content', headers={'ETag': '"def"'})
+        nf_core.download.download_file('https://example.com/test.zip', out_fn, show_progress=False)
+        with open(out_fn, 'rb') as fh:
+            assert fh.read() == b'new content'
+        shutil.rmtree(tmp_dir)
+
+    @mock.patch('requests.get')
+    @pytest.mark.xfail(raises=IOError)
+    def test_download_file_incomplete(self, mock_get):
+        tmp_dir = tempfile.mkdtemp()
+        response = mock_download_response(b'01234')
+        response.headers['Content-Length'] = '10'
+        mock_get.return_value = response
+        nf_core.download.download_file('https://example.com/test.zip', os.path.join(tmp_dir, 'test.zip'), show_progress=False)
+
+    #
+    # Tests for 'fetch_cached_file'
+    #
+    @mock.patch('requests.get')
+    def test_fetch_cached_file(self, mock_get):
+        """ Files are only downloaded again if the server says they have changed """
+        tmp_dir = tempfile.mkdtemp()
+        cache_fn = os.path.join(tmp_dir, 'configs', 'configs-master.zip')
+        with mock.patch('nf_core.cache.get_cache', return_value=nf_core.cache.CacheStore(os.path.join(tmp_dir, 'cache.sqlite'))):
+            mock_get.return_value = mock_download_response(b'configs', headers={'ETag': '"abc"'})
+            nf_core.download.fetch_cached_file('https://example.com/master.zip', cache_fn)
+            assert 'If-None-Match' not in mock_get.call_args[1]['headers']
+
+            # Not modified
+            mock_get.return_value = mock_download_response(b'', status_code=304)
+            nf_core.download.fetch_cached_file('https://example.com/master.zip', cache_fn)
+            assert mock_get.call_args[1]['headers']['If-None-Match'] == '"abc"'
+            with open(cache_fn, 'rb') as fh:
+                assert fh.read() == b'configs'
+
+            # Offline
+            mock_get.side_effect = requests.exceptions.ConnectionError()
+            assert nf_core.download.fetch_cached_file('https://example.com/master.zip', cache_fn) == cache_fn
+
+            # Immutable files aren't checked at all
+            mock_get.reset_mock()
+            nf_core.download.fetch_cached_file('https://example.com/master.zip', cache_fn, immutable=True)
+            assert mock_get.call_count == 0
+        shutil.rmtree(tmp_dir)
+
+    @mock.patch('nf_core.download.download_file')
+    def test_fetch_cached_file_temp_names(self, mock_download):
+        """ Each download writes to its own temporary file in the cache directory """
+        tmp_dir = tempfile.mkdtemp()
+        cache_fn = os.path.join(tmp_dir, 'configs', 'configs-master.zip')
+        tmp_fns = []
+        def download(url, out_fn, headers=None):
+            tmp_fns.append(out_fn)
+            with open(out_fn, 'wb') as fh:
+                fh.write(b'configs')
+            return {'ETag': '"abc"'}
+        mock_download.side_effect = download
+        with mock.patch('nf_core.cache.get_cache', return_value=nf_core.cache.CacheStore(os.path.join(tmp_dir, 'cache.sqlite'))):
+            nf_core.download.fetch_cached_file('https://example.com/master.zip', cache_fn)
+            nf_core.download.fetch_cached_file('https://example.com/master.zip', cache_fn)
+        assert len(set(tmp_fns)) == 2
+        assert all(os.path.dirname(fn) == os.path.dirname(cache_fn) for fn in tmp_fns)
+        assert os.listdir(os.path.dirname(cache_fn)) == ['configs-master.zip']
+        shutil.rmtree(tmp_dir)
+
     #
     # Tests for 'download_configs'
     #
@@ -124,6 +260,24 @@ class DownloadTest(unittest.TestCase):
             )
         download_obj.download_configs()
 
+    @mock.patch('nf_core.download.fetch_cached_file')
+    def test_download_configs_revision(self, mock_fetch):
+        """ A pinned configs revision is downloaded and extracted from the cache """
+        tmp_dir = tempfile.mkdtemp()
+        def fake_fetch(url, cache_fn, immutable=False):
+            os.makedirs(os.path.dirname(cache_fn), exist_ok=True)
+            with ZipFile(cache_fn, 'w') as zip_fh:
+                zip_fh.writestr('configs-1.0/nfcore_custom.config', 'config')
+            return cache_fn
+        mock_fetch.side_effect = fake_fetch
+        with mock.patch.dict(os.environ, {'HOME': tmp_dir}):
+            download_obj = DownloadWorkflow(pipeline = "dummy", outdir = os.path.join(tmp_dir, 'out'), configs_revision = "v1.0")
+            download_obj.download_configs()
+        assert mock_fetch.call_args[0][0] == 'https://github.com/nf-core/configs/archive/v1.0.zip'
+        assert mock_fetch.call_args[0][2] is False
+        assert os.path.isfile(os.path.join(tmp_dir, 'out', 'configs', 'nfcore_custom.config'))
+        shutil.rmtree(tmp_dir)
+
     #
     # Tests for 'wf_use_local_configs'
     #
@@ -159,6 +313,20 @@ class DownloadTest(unittest.TestCase):
         assert len(download_obj.containers) == 1
         assert download_obj.containers[0] == 'cutting-edge-container'
 
+    @mock.patch('nf_core.utils.fetch_wf_config')
+    def test_find_container_images_duplicates(self, mock_fetch_wf_config):
+        """ Each image is only listed once, even if used by several processes """
+        download_obj = DownloadWorkflow(
+            pipeline = "dummy",
+            outdir = tempfile.mkdtemp())
+        mock_fetch_wf_config.return_value = {
+            'process.container': 'nfcore/dummy:1.0',
+            'process.mapping.container': 'docker://nfcore/dummy:1.0',
+            'process.other.container': 'nfcore/other:1.0'
+        }
+        download_obj.find_container_images()
+        assert download_obj.containers == ['nfcore/dummy:1.0', 'nfcore/other:1.0']
+
     #
     # Tests for 'validate_md5'
     #
@@ -205,6 +373,285 @@ class DownloadTest(unittest.TestCase):
         # Clean up
         shutil.rmtree(tmp_dir)
 
+    @mock.patch('subprocess.run')
+    @pytest.mark.xfail(raises=RuntimeWarning)
+    def test_pull_singularity_image_fails(self, mock_run):
+        tmp_dir = tempfile.mkdtemp()
+        download_obj = DownloadWorkflow(pipeline = "dummy", outdir = tmp_dir)
+        mock_run.return_value = mock.Mock(returncode=255, stdout="FATAL: Unable to pull")
+        download_obj.pull_singularity_image("a-container")
+
+    @mock.patch('time.sleep')
+    @mock.patch('nf_core.download.DownloadWorkflow.pull_singularity_image')
+    def test_pull_singularity_images(self, mock_pull, mock_sleep):
+        """ Images are pulled in parallel and failed pulls are retried """
+        download_obj = DownloadWorkflow(pipeline = "dummy", parallel_downloads = 3)
+        download_obj.containers = ['nfcore/a:1.0', 'nfcore/b:1.0', 'nfcore/c:1.0']
+        failures = {'nfcore/b:1.0': 2}
+        def fake_pull(container):
+            if failures.get(container, 0) > 0:
+                failures[container] -= 1
+                raise RuntimeWarning("Singularity pull failed")
+        mock_pull.side_effect = fake_pull
+        download_obj.pull_singularity_images()
+        assert sorted(c[0][0] for c in mock_pull.call_args_list) == ['nfcore/a:1.0'] + ['nfcore/b:1.0'] * 3 + ['nfcore/c:1.0']
+        assert [c[0][0] for c in mock_sleep.call_args_list] == [5, 10]
+
+    @mock.patch('time.sleep')
+    @mock.patch('nf_core.download.DownloadWorkflow.pull_singularity_image')
+    @pytest.mark.xfail(raises=RuntimeWarning)
+    def test_pull_singularity_images_retries_exhausted(self, mock_pull, mock_sleep):
+        download_obj = DownloadWorkflow(pipeline = "dummy")
+        download_obj.containers = ['nfcore/a:1.0']
+        mock_pull.side_effect = RuntimeWarning("Singularity pull failed")
+        download_obj.pull_singularity_images()
+
+    @mock.patch('logging.info')
+    @mock.patch('subprocess.run')
+    def test_pull_singularity_images_not_installed(self, mock_run, mock_log_info):
+        """ A missing singularity stops the download instead of reporting images that were never pulled """
+        tmp_dir = tempfile.mkdtemp()
+        download_obj = DownloadWorkflow(pipeline = "dummy", outdir = tmp_dir)
+        download_obj.containers = ['nfcore/a:1.0', 'nfcore/b:1.0']
+        mock_run.side_effect = FileNotFoundError(errno.ENOENT, "No such file or directory: 'singularity'")
+        with pytest.raises(OSError):
+            download_obj.pull_singularity_images()
+        assert not any('Pulled singularity image' in str(c) for c in mock_log_info.call_args_list)
+        shutil.rmtree(tmp_dir)
+
+    #
+    # Tests for 'SingularityImageCache'
+    #
+    def test_image_cache_nxf_cachedir(self):
+        """ Images are kept in $NXF_SINGULARITY_CACHEDIR, named like Nextflow does """
+        tmp_dir = tempfile.mkdtemp()
+        with mock.patch.dict(os.environ, {'NXF_SINGULARITY_CACHEDIR': tmp_dir}):
+            image_cache = nf_core.download.SingularityImageCache()
+        assert image_cache.get_path('docker://nfcore/rnaseq:1.4') == os.path.join(tmp_dir, 'nfcore-rnaseq-1.4.img')
+        shutil.rmtree(tmp_dir)
+
+    def test_get_image_cache(self):
+        """ The image cache is only used if there is a cache directory, and can be turned off """
+        tmp_dir = tempfile.mkdtemp()
+        with mock.patch.dict(os.environ, {'NXF_SINGULARITY_CACHEDIR': ''}):
+            assert DownloadWorkflow(pipeline = "dummy").get_image_cache() is None
+            image_cache = DownloadWorkflow(pipeline = "dummy", singularity_cache_dir = tmp_dir, singularity_cache_size = 1024).get_image_cache()
+            assert image_cache.cache_dir == tmp_dir
+            assert image_cache.max_size == 1024
+        with mock.patch.dict(os.environ, {'NXF_SINGULARITY_CACHEDIR': tmp_dir}):
+            assert DownloadWorkflow(pipeline = "dummy").get_image_cache().cache_dir == tmp_dir
+            assert DownloadWorkflow(pipeline = "dummy", singularity_cache = False).get_image_cache() is None
+        shutil.rmtree(tmp_dir)
+
+    def test_image_cache_dedup(self):
+        """ Identical images are only stored once """
+        tmp_dir = tempfile.mkdtemp()
+        image_cache = nf_core.download.SingularityImageCache(os.path.join(tmp_dir, 'cache'), index_dir=os.path.join(tmp_dir, 'index'))
+        for container in ['nfcore/dummy:1.0', 'nfcore/dummy:1.1']:
+            pull_path = os.path.join(image_cache.cache_dir, 'pulling')
+            with open(pull_path, 'w') as fh:
+                fh.write('image')
+            image_cache.add(container, pull_path)
+        st_1 = os.stat(image_cache.get_path('nfcore/dummy:1.0'))
+        st_2 = os.stat(image_cache.get_path('nfcore/dummy:1.1'))
+        assert st_1.st_ino == st_2.st_ino
+        assert not os.path.exists(pull_path)
+        # The index is kept out of the image directory
+        assert sorted(os.listdir(image_cache.cache_dir)) == ['nfcore-dummy-1.0.img', 'nfcore-dummy-1.1.img']
+        assert len(os.listdir(os.path.join(tmp_dir, 'index'))) > 0
+
+        # Cached images are linked into the output directory
+        out_path = os.path.join(tmp_dir, 'dummy.simg')
+        assert image_cache.fetch('nfcore/dummy:1.1', out_path)
+        assert os.stat(out_path).st_ino == st_1.st_ino
+        assert not image_cache.fetch('nfcore/dummy:2.0', out_path)
+        shutil.rmtree(tmp_dir)
+
+    def test_image_cache_evict(self):
+        """ Least recently used images are removed once the cache is too big """
+        tmp_dir = tempfile.mkdtemp()
+        image_cache = nf_core.download.SingularityImageCache(os.path.join(tmp_dir, 'cache'), max_size=25, index_dir=os.path.join(tmp_dir, 'index'))
+        for idx, container in enumerate(['nfcore/a:1.0', 'nfcore/b:1.0', 'nfcore/c:1.0']):
+            pull_path = os.path.join(image_cache.cache_dir, 'pulling')
+            with open(pull_path, 'w') as fh:
+                fh.write(str(idx) * 10)
+            image_cache.add(container, pull_path)
+            os.utime(image_cache.get_path(container), (1000 + idx, 1000 + idx))
+        # Images we didn't add are left alone
+        with open(os.path.join(image_cache.cache_dir, 'nextflow-image.img'), 'w') as fh:
+            fh.write('x' * 100)
+        assert image_cache.evict() == 1
+        assert not os.path.exists(image_cache.get_path('nfcore/a:1.0'))
+        assert os.path.exists(image_cache.get_path('nfcore/b:1.0'))
+        assert os.path.exists(os.path.join(image_cache.cache_dir, 'nextflow-image.img'))
+        shutil.rmtree(tmp_dir)
+
+    @mock.patch('subprocess.run')
+    def test_pull_singularity_image_cached(self, mock_run):
+        """ Images are only pulled if they are not already in the cache """
+        tmp_dir = tempfile.mkdtemp()
+        os.mkdir(os.path.join(tmp_dir, 'singularity-images'))
+        download_obj = DownloadWorkflow(pipeline = "dummy", outdir = tmp_dir, compress_type = 'none')
+        download_obj.image_cache = nf_core.download.SingularityImageCache(os.path.join(tmp_dir, 'cache'), index_dir=os.path.join(tmp_dir, 'index'))
+        def fake_pull(command, **kwargs):
+            with open(command[3], 'w') as fh:
+                fh.write('image')
+            return mock.Mock(returncode=0, stdout='')
+        mock_run.side_effect = fake_pull
+        download_obj.pull_singularity_image('nfcore/dummy:1.0')
+        download_obj.pull_singularity_image('nfcore/dummy:1.0')
+        assert mock_run.call_count == 1
+        assert os.listdir(os.path.join(tmp_dir, 'singularity-images')) == ['nf-core-dummy-1.0.simg']
+        shutil.rmtree(tmp_dir)
+
+    #
+    # Tests for 'compress_download'
+    #
+    def _make_compress_example(self, compress_type):
+        """ Makes a download directory, with one image still in the image cache """
+        tmp_dir = tempfile.mkdtemp()
+        download_obj = DownloadWorkflow(pipeline = "dummy", outdir = os.path.join(tmp_dir, 'nf-core-dummy'), compress_type = compress_type)
+        download_obj.output_filename = '{}.{}'.format(download_obj.outdir, compress_type)
+        os.makedirs(os.path.join(download_obj.outdir, 'workflow'))
+        os.makedirs(os.path.join(download_obj.outdir, 'singularity-images'))
+        with open(os.path.join(download_obj.outdir, 'workflow', 'main.nf'), 'w') as fh:
+            fh.write('main')
+        cache_path = os.path.join(tmp_dir, 'nfcore-dummy-1.0.img')
+        with open(cache_path, 'w') as fh:
+            fh.write('image')
+        download_obj.archive_images = [(cache_path, os.path.join(download_obj.outdir, 'singularity-images', 'nf-core-dummy-1.0.simg'))]
+        return tmp_dir, download_obj
+
+    @mock.patch('nf_core.download.get_tar_compressor')
+    def test_compress_download_tar(self, mock_compressor):
+        """ Cached images are added to the archive without copying them to the outdir """
+        for compressor in [None, ['gzip', '-c']]:
+            mock_compressor.return_value = compressor
+            tmp_dir, download_obj = self._make_compress_example('tar.gz')
+            download_obj.compress_download()
+            assert not os.path.exists(download_obj.outdir)
+            with tarfile.open(download_obj.output_filename, 'r:gz') as tar:
+                assert sorted(tar.getnames()) == [
+                    'nf-core-dummy',
+                    'nf-core-dummy/checksums.md5',
+                    'nf-core-dummy/checksums.sha256',
+                    'nf-core-dummy/singularity-images',
+                    'nf-core-dummy/singularity-images/nf-core-dummy-1.0.simg',
+                    'nf-core-dummy/workflow',
+                    'nf-core-dummy/workflow/main.nf'
+                ]
+                assert tar.extractfile('nf-core-dummy/singularity-images/nf-core-dummy-1.0.simg').read() == b'image'
+            assert nf_core.download.verify_download(download_obj.output_filename)
+            shutil.rmtree(tmp_dir)
+
+    @mock.patch('nf_core.download.get_tar_compressor')
+    def test_compress_download_tar_error(self, mock_compressor):
+        """ Errors while writing the archive are raised instead of hanging the compressor """
+        mock_compressor.return_value = ['gzip', '-c']
+        tmp_dir, download_obj = self._make_compress_example('tar.gz')
+        with mock.patch.object(download_obj, 'add_to_tar', side_effect=IOError('missing image')):
+            with pytest.raises(IOError, match='missing image'):
+                download_obj.compress_download()
+        shutil.rmtree(tmp_dir)
+
+    def test_compress_download_zip(self):
+        tmp_dir, download_obj = self._make_compress_example('zip')
+        download_obj.compress_download()
+        with ZipFile(download_obj.output_filename) as zip_fh:
+            names = sorted(os.path.basename(n) for n in zip_fh.namelist())
+        assert names == ['checksums.md5', 'checksums.sha256', 'main.nf', 'nf-core-dummy-1.0.simg']
+        assert nf_core.download.verify_download(download_obj.output_filename)
+        shutil.rmtree(tmp_dir)
+
+    def test_compress_download_checksums(self):
+        """ Checksums are saved for the archive and every file in it """
+        tmp_dir, download_obj = self._make_compress_example('tar.gz')
+        download_obj.compress_download()
+        with open(download_obj.output_filename + '.sha256') as fh:
+            checksum, fn = fh.read().split()
+        assert fn == 'nf-core-dummy.tar.gz'
+        assert checksum == nf_core.download.file_checksums(download_obj.output_filename)['sha256']
+        with tarfile.open(download_obj.output_filename, 'r:gz') as tar:
+            manifest = nf_core.download.read_checksum_manifest(tar.extractfile('nf-core-dummy/checksums.sha256').read())
+        assert manifest == {
+            'singularity-images/nf-core-dummy-1.0.simg': hashlib.sha256(b'image').hexdigest(),
+            'workflow/main.nf': hashlib.sha256(b'main').hexdigest()
+        }
+
+        # A corrupted archive fails verification
+        with open(download_obj.output_filename, 'ab') as fh:
+            fh.write(b'x')
+        assert not nf_core.download.verify_download(download_obj.output_filename)
+        shutil.rmtree(tmp_dir)
+
+    def test_verify_download_dir(self):
+        """ Uncompressed downloads get a checksum manifest that can be verified """
+        tmp_dir, download_obj = self._make_compress_example('none')
+        download_obj.write_checksum_manifest()
+        assert nf_core.download.verify_download(download_obj.outdir)
+        with open(os.path.join(download_obj.outdir, 'workflow', 'main.nf'), 'w') as fh:
+            fh.write('changed')
+        assert not nf_core.download.verify_download(download_obj.outdir)
+        shutil.rmtree(tmp_dir)
+
+    def test_file_checksums(self):
+        tmpfile = tempfile.mkstemp()[1]
+        with open(tmpfile, 'wb') as fh:
+            fh.write(b'test' * 1000000)
+        assert nf_core.download.file_checksums(tmpfile) == {
+            'md5': hashlib.md5(b'test' * 1000000).hexdigest(),
+            'sha256': hashlib.sha256(b'test' * 1000000).hexdigest()
+        }
+        os.remove(tmpfile)
+
+    #
+    # Tests for 'download_workflows_batch'
+    #
+    def test_parse_pipeline_spec(self):
+        assert nf_core.download.parse_pipeline_spec('rnaseq@1.4') == ('rnaseq', '1.4')
+        assert nf_core.download.parse_pipeline_spec('nf-core/rnaseq') == ('nf-core/rnaseq', None)
+
+    @mock.patch('nf_core.download.DownloadWorkflow.pull_singularity_image')
+    @mock.patch('nf_core.utils.fetch_wf_config')
+    @mock.patch('nf_core.download.DownloadWorkflow.download_configs')
+    @mock.patch('nf_core.download.DownloadWorkflow.download_wf_files', autospec=True)
+    @mock.patch('nf_core.list.Workflows')
+    def test_download_workflows_batch(self, mock_workflows, mock_wf_files, mock_configs, mock_fetch_wf_config, mock_pull):
+        """ Pipelines share one pipeline list fetch, one copy of the configs and their images """
+        tmp_dir = tempfile.mkdtemp()
+        outdir = os.path.join(tmp_dir, 'staging')
+        remote_workflows = []
+        for name in ['rnaseq', 'methylseq']:
+            wf = mock.Mock()
+            wf.name = name
+            wf.full_name = 'nf-core/{}'.format(name)
+            wf.releases = [{'tag_name': '1.0', 'tag_sha': 'abc', 'published_at_timestamp': 1}]
+            remote_workflows.append(wf)
+        mock_workflows.return_value.remote_workflows = remote_workflows
+
+        def fake_wf_files(dl):
+            os.makedirs(os.path.join(dl.outdir, 'workflow'))
+            with open(os.path.join(dl.outdir, 'workflow', 'nextflow.config'), 'w') as fh:
+                fh.write("includeConfig 'https://raw.githubusercontent.com/nf-core/configs/${params.custom_config_version}/nfcore_custom.config'")
+        mock_wf_files.side_effect = fake_wf_files
+        mock_configs.side_effect = lambda: os.makedirs(os.path.join(outdir, 'configs'))
+        mock_fetch_wf_config.side_effect = [
+            {'process.container': 'nfcore/rnaseq:1.0', 'process.fastqc.container': 'biocontainers/fastqc:0.11.9'},
+            {'process.container': 'nfcore/methylseq:1.0', 'process.fastqc.container': 'docker://biocontainers/fastqc:0.11.9'},
+        ]
+
+        with mock.patch.dict(os.environ, {'NXF_SINGULARITY_CACHEDIR': os.path.join(tmp_dir, 'cache')}):
+            downloads = nf_core.download.download_workflows_batch(['rnaseq@1.0', 'methylseq', 'rnaseq@1.0'], outdir, singularity=True, compress_type='none')
+
+        assert [dl.outdir for dl in downloads] == [os.path.join(outdir, 'nf-core-rnaseq-1.0'), os.path.join(outdir, 'nf-core-methylseq-1.0')]
+        assert mock_workflows.call_count == 1
+        assert mock_configs.call_count == 1
+        assert sorted(c[0][0] for c in mock_pull.call_args_list) == ['biocontainers/fastqc:0.11.9', 'nfcore/methylseq:1.0', 'nfcore/rnaseq:1.0']
+        with open(os.path.join(outdir, 'nf-core-rnaseq-1.0', 'workflow', 'nextflow.config')) as fh:
+            assert fh.read() == "includeConfig '../../configs//nfcore_custom.config'"
+        assert os.path.isfile(os.path.join(outdir, 'checksums.sha256'))
+        shutil.rmtree(tmp_dir)
+
     #
     # Tests for the main entry method 'download_workflow'
     #
@@ -223,3 +670,39 @@ class DownloadTest(unittest.TestCase):
 
         # Clean up
         shutil.rmtree(tmp_dir)
+
+    #
+    # Tests for the 'nf-core download' command
+    #
+    @mock.patch('nf_core.download.DownloadWorkflow')
+    def test_cli_download(self, mock_download):
+        """ nf-core download runs the download for a single pipeline """
+        result = click.testing.CliRunner().invoke(load_cli(), ['download', 'nf-core/methylseq@1.5', '-c', 'none'])
+        assert result.exit_code == 0, result.output
+        mock_download.assert_called_once_with(
+            'nf-core/methylseq', '1.5', False, None, 'none', 4, 'master',
+            singularity_cache=True, singularity_cache_dir=None, singularity_cache_size=100 * 1024 * 1024 * 1024
+        )
+        mock_download.return_value.download_workflow.assert_called_once_with()
+
+    @mock.patch('nf_core.download.DownloadWorkflow')
+    def test_cli_download_image_cache(self, mock_download):
+        """ The singularity image cache can be moved, resized or turned off """
+        result = click.testing.CliRunner().invoke(load_cli(), [
+            'download', 'methylseq', '--singularity', '--singularity-cache-dir', 'images', '--singularity-cache-size', '2', '--no-singularity-cache'
+        ])
+        assert result.exit_code == 0, result.output
+        mock_download.assert_called_once_with(
+            'methylseq', None, True, None, 'tar.gz', 4, 'master',
+            singularity_cache=False, singularity_cache_dir='images', singularity_cache_size=2 * 1024 * 1024 * 1024
+        )
+
+    @mock.patch('nf_core.download.download_workflows_batch')
+    def test_cli_download_batch(self, mock_batch):
+        """ nf-core download with several pipelines downloads them together """
+        result = click.testing.CliRunner().invoke(load_cli(), ['download', 'rnaseq@1.4.2', 'methylseq'])
+        assert result.exit_code == 0, result.output
+        mock_batch.assert_called_once_with(
+            ['rnaseq@1.4.2', 'methylseq'], None, False, 'tar.gz', 4, 'master',
+            singularity_cache=True, singularity_cache_dir=None, singularity_cache_size=100 * 1024 * 1024 * 1024
+        )
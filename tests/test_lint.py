@@ -11,15 +11,20 @@ Provide example wokflow directory contents like:
         |     |...
         |--test_lint.py
 """
+import git
+import io
 import json
 import mock
 import os
 import pytest
 import requests
+import shutil
 import tempfile
+import time
 import unittest
 import yaml
 
+import nf_core.cache
 import nf_core.lint
 
 
@@ -83,6 +88,113 @@ class TestLint(unittest.TestCase):
         expectations = {"failed": 0, "warned": 4, "passed": MAX_PASS_CHECKS + ADD_PASS_RELEASE}
         self.assess_lint_status(lint_obj, **expectations)
 
+    def _mock_checks(self, lint_obj, durations, failing=[]):
+        """Replace check functions with ones that sleep and then record a result"""
+        started = []
+        for fun_name, duration in durations.items():
+            def check(fun_name=fun_name, duration=duration):
+                started.append(fun_name)
+                time.sleep(duration)
+                if fun_name in failing:
+                    lint_obj.failed.append((0, fun_name))
+                else:
+                    lint_obj.passed.append((0, fun_name))
+            setattr(lint_obj, fun_name, check)
+        return started
+
+    def test_run_checks_ordered_results(self):
+        """Results are recorded in check order, whatever order the checks finish in"""
+        lint_obj = nf_core.lint.PipelineLint(PATH_WORKING_EXAMPLE)
+        lint_obj.check_dependencies = {'check_c': ['check_a']}
+        started = self._mock_checks(lint_obj, {'check_a': 0.2, 'check_b': 0.1, 'check_c': 0})
+        lint_obj._run_checks(['check_a', 'check_b', 'check_c'])
+        assert [msg for _, msg in lint_obj.passed] == ['check_a', 'check_b', 'check_c']
+        # check_c has to wait for check_a
+        assert started.index('check_c') > started.index('check_a')
+
+    def test_run_checks_halt_on_failure(self):
+        """Checks after the first failure are dropped, as when running one by one"""
+        lint_obj = nf_core.lint.PipelineLint(PATH_WORKING_EXAMPLE)
+        lint_obj.check_dependencies = {}
+        self._mock_checks(lint_obj, {'check_a': 0.1, 'check_b': 0, 'check_c': 0}, failing=['check_b', 'check_c'])
+        lint_obj._run_checks(['check_a', 'check_b', 'check_c'])
+        self.assess_lint_status(lint_obj, passed=1, failed=1)
+
+        lint_obj = nf_core.lint.PipelineLint(PATH_WORKING_EXAMPLE)
+        self._mock_checks(lint_obj, {'check_a': 0.1, 'check_b': 0, 'check_c': 0}, failing=['check_b', 'check_c'])
+        lint_obj._run_checks(['check_a', 'check_b', 'check_c'], halt_on_failure=False)
+        self.assess_lint_status(lint_obj, passed=1, failed=2)
+
+    def test_run_checks_halt_stops_queued(self):
+        """Checks after a failure are not started, even if they were ready to run"""
+        lint_obj = nf_core.lint.PipelineLint(PATH_WORKING_EXAMPLE)
+        lint_obj.check_dependencies = {}
+        started = self._mock_checks(lint_obj, {'check_a': 0, 'check_b': 0, 'check_c': 0}, failing=['check_a'])
+        lint_obj._run_checks(['check_a', 'check_b', 'check_c'], max_workers=1)
+        assert started == ['check_a']
+
+    @pytest.mark.xfail(raises=AssertionError)
+    def test_run_checks_critical(self):
+        """Critical errors are raised from the main thread"""
+        lint_obj = nf_core.lint.PipelineLint(PATH_CRITICAL_EXAMPLE)
+        lint_obj._run_checks(['check_files_exist', 'check_licence'])
+
+    def test_run_checks_incremental(self):
+        """Results are reused for checks whose input files have not changed"""
+        tmpdir = tempfile.mkdtemp()
+        wf_path = os.path.join(tmpdir, 'wf')
+        shutil.copytree(PATH_WORKING_EXAMPLE, wf_path)
+        cache = nf_core.cache.CacheStore(os.path.join(tmpdir, 'cache.sqlite'))
+        check_functions = ['check_licence', 'check_actions_lint', 'check_pipeline_todos']
+
+        def run_incremental():
+            lint_obj = nf_core.lint.PipelineLint(wf_path)
+            lint_obj.incremental = True
+            with mock.patch('nf_core.cache.get_cache', return_value=cache):
+                lint_obj._run_checks(check_functions)
+            return lint_obj
+
+        first_run = run_incremental()
+        assert first_run.reused_checks == []
+        second_run = run_incremental()
+        assert sorted(second_run.reused_checks) == sorted(check_functions)
+        assert (second_run.passed, second_run.warned, second_run.failed) == (first_run.passed, first_run.warned, first_run.failed)
+
+        # Only the TODO check reads main.nf
+        with open(os.path.join(wf_path, 'main.nf'), 'a') as fh:
+            fh.write("// TODO nf-core: Write the pipeline\n")
+        third_run = run_incremental()
+        assert sorted(third_run.reused_checks) == ['check_actions_lint', 'check_licence']
+        assert third_run.warned == first_run.warned + [(10, "TODO string found in 'main.nf': Write the pipeline")]
+
+    @mock.patch.dict(os.environ, {'NFCORE_CONFIG_PARSER': 'python'})
+    def test_run_linting_batch(self):
+        """Test linting several pipelines at once, in worker processes"""
+        json_fn = os.path.join(tempfile.mkdtemp(), 'lint_results.json')
+        pipeline_dirs = [PATH_CRITICAL_EXAMPLE, PATH_WORKING_EXAMPLE]
+        results = nf_core.lint.run_linting_batch(pipeline_dirs, json_fn=json_fn, max_workers=2)
+        assert list(results) == pipeline_dirs
+        assert 'critical_error' in results[PATH_CRITICAL_EXAMPLE]
+        assert results[PATH_WORKING_EXAMPLE]['num_tests_pass'] > 0
+        with open(json_fn, 'r') as fh:
+            saved_results = json.load(fh)
+        assert saved_results['num_pipelines'] == 2
+        assert saved_results['num_pipelines_failed'] >= 1
+        assert saved_results['pipelines'][PATH_WORKING_EXAMPLE]['tests_pass'] == results[PATH_WORKING_EXAMPLE]['tests_pass']
+
+    def test_find_pipeline_dirs(self):
+        """Find pipelines to lint in a directory, or listed in a file"""
+        lint_examples = os.path.join(WD, 'lint_examples')
+        pipeline_dirs = nf_core.lint.find_pipeline_dirs(lint_examples)
+        assert PATH_WORKING_EXAMPLE in pipeline_dirs
+        # Has neither a nextflow.config or main.nf
+        assert PATH_CRITICAL_EXAMPLE not in pipeline_dirs
+        assert nf_core.lint.find_pipeline_dirs(PATH_WORKING_EXAMPLE) == [PATH_WORKING_EXAMPLE]
+        list_fn = os.path.join(tempfile.mkdtemp(), 'pipelines.txt')
+        with open(list_fn, 'w') as fh:
+            fh.write("# Pipelines\n{}\n\n{}\n".format(PATH_WORKING_EXAMPLE, PATH_FAILING_EXAMPLE))
+        assert nf_core.lint.find_pipeline_dirs(list_fn) == [PATH_WORKING_EXAMPLE, PATH_FAILING_EXAMPLE]
+
     def test_failing_dockerfile_example(self):
         """Tests for empty Dockerfile"""
         lint_obj = nf_core.lint.PipelineLint(PATH_FAILING_EXAMPLE)
@@ -352,7 +464,7 @@ class TestLint(unittest.TestCase):
         expectations = {"failed": 3, "warned": 1, "passed": 2}
         self.assess_lint_status(lint_obj, **expectations)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     @pytest.mark.xfail(raises=ValueError)
     def test_conda_env_timeout(self, mock_get):
         """ Tests the conda environment handles API timeouts """
@@ -420,7 +532,7 @@ class TestLint(unittest.TestCase):
         expectations = {"failed": 0, "warned": 1, "passed": 2}
         self.assess_lint_status(lint_obj, **expectations)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_pypi_timeout_warn(self, mock_get):
         """ Tests the PyPi connection and simulates a request timeout, which should
         return in an addiional warning in the linting """
@@ -436,7 +548,7 @@ class TestLint(unittest.TestCase):
         expectations = {"failed": 0, "warned": 1, "passed": 2}
         self.assess_lint_status(lint_obj, **expectations)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_pypi_connection_error_warn(self, mock_get):
         """ Tests the PyPi connection and simulates a connection error, which should
         result in an additional warning, as we cannot test if dependent module is latest """
@@ -452,6 +564,47 @@ class TestLint(unittest.TestCase):
         expectations = {"failed": 0, "warned": 1, "passed": 2}
         self.assess_lint_status(lint_obj, **expectations)
 
+    @mock.patch('requests.Session.get')
+    def test_conda_env_concurrent_lookups(self, mock_get):
+        """ Tests that API lookups run at once but give the same results in order """
+        def fake_get(url, timeout=None):
+            # Earlier packages respond slowest
+            time.sleep({'fastqc': 0.2, 'multiqc': 0.1}.get(url.split('/')[-1], 0))
+            response = mock.Mock()
+            response.status_code = 404 if '/conda-forge/' in url else 200
+            response.json.return_value = {'versions': ['0.11.8', '1.7'], 'latest_version': '1.7'}
+            return response
+        mock_get.side_effect = fake_get
+        lint_obj = nf_core.lint.PipelineLint(PATH_WORKING_EXAMPLE)
+        lint_obj.files = ['environment.yml']
+        lint_obj.pipeline_name = 'tools'
+        lint_obj.config['manifest.version'] = '0.4'
+        lint_obj.conda_config = {
+            'name': 'nf-core-tools-0.4',
+            'channels': ['conda-forge', 'bioconda', 'defaults'],
+            'dependencies': ['fastqc=0.11.8', 'multiqc=1.7', 'bioconda::picard=1.7']
+        }
+        lint_obj.api_rate_limiter.rate = None
+        start = time.time()
+        lint_obj.check_conda_env_yaml()
+        assert time.time() - start < 0.3
+        assert [msg for _, msg in lint_obj.warned] == ['Conda package is not latest available: fastqc=0.11.8, 1.7 available']
+        assert [msg for _, msg in lint_obj.passed][1:] == [
+            'Conda dependency had pinned version number: fastqc=0.11.8',
+            'Conda dependency had pinned version number: multiqc=1.7',
+            'Conda package is latest available: multiqc=1.7',
+            'Conda dependency had pinned version number: bioconda::picard=1.7',
+            'Conda package is latest available: bioconda::picard=1.7'
+        ]
+
+        # Channels after the one a package is found in are skipped
+        mock_get.reset_mock()
+        lint_obj.api_workers = 1
+        lint_obj.check_conda_env_yaml()
+        requested = [c[0][0] for c in mock_get.call_args_list]
+        assert len(requested) == 5
+        assert not any('/main/' in url for url in requested)
+
     def test_pip_dependency_fail(self):
         """ Tests the PyPi API package information query """
         lint_obj = nf_core.lint.PipelineLint(PATH_WORKING_EXAMPLE)
@@ -506,6 +659,46 @@ class TestLint(unittest.TestCase):
         expectations = {"failed": 0, "warned": 1, "passed": 0}
         self.assess_lint_status(critical_lint_obj, **expectations)
 
+    def _make_scan_example(self):
+        """Make a pipeline directory with files for the TODO and cookiecutter checks"""
+        tmpdir = tempfile.mkdtemp()
+        with open(os.path.join(tmpdir, 'main.nf'), 'w') as fh:
+            fh.write("// TODO nf-core: Add more processes\nprocess foo {}\n")
+        with open(os.path.join(tmpdir, '.gitignore'), 'w') as fh:
+            fh.write("results/\n*.log\n")
+        os.mkdir(os.path.join(tmpdir, 'results'))
+        with open(os.path.join(tmpdir, 'results', 'report.txt'), 'w') as fh:
+            fh.write("TODO nf-core: ignored\n")
+        with open(os.path.join(tmpdir, 'trace.log'), 'w') as fh:
+            fh.write("TODO nf-core: ignored\n")
+        with open(os.path.join(tmpdir, 'image.png'), 'wb') as fh:
+            fh.write(b'\x89PNG\x00\x00TODO nf-core: binary')
+        with open(os.path.join(tmpdir, 'big.txt'), 'w') as fh:
+            fh.write("nothing to see\n" * 100000)
+            fh.write("name: {{ cookiecutter.name }}\n")
+        return tmpdir
+
+    def test_scan_pipeline_files(self):
+        """Tests that files are listed and scanned once for all content scanners"""
+        tmpdir = self._make_scan_example()
+        lint_obj = nf_core.lint.PipelineLint(tmpdir)
+        files = [os.path.relpath(fn, tmpdir) for fn in lint_obj._list_pipeline_files()]
+        assert sorted(files) == ['.gitignore', 'big.txt', 'image.png', 'main.nf']
+        with mock.patch('io.open', wraps=io.open) as mock_open:
+            lint_obj.check_pipeline_todos()
+            lint_obj.check_cookiecutter_strings()
+            assert mock_open.call_count == 4
+        assert lint_obj.warned == [(10, "TODO string found in 'main.nf': Add more processes")]
+        assert lint_obj.failed == [(13, "Found a cookiecutter template string in '{}' L100001: {{{{ cookiecutter.name }}}}".format(os.path.join(tmpdir, 'big.txt')))]
+
+    def test_list_pipeline_files_git(self):
+        """Tests that untracked files are listed, but not those ignored by git"""
+        tmpdir = self._make_scan_example()
+        git.Repo.init(tmpdir)
+        lint_obj = nf_core.lint.PipelineLint(tmpdir)
+        files = [os.path.relpath(fn, tmpdir) for fn in lint_obj._list_pipeline_files()]
+        assert sorted(files) == ['.gitignore', 'big.txt', 'image.png', 'main.nf']
+
     def test_json_output(self):
         """
         Test creation of a JSON file with lint results
@@ -2,11 +2,15 @@
 """ Tests covering the workflow listing code.
 """
 
+import nf_core.cache
+import nf_core.catalogue
 import nf_core.list
 
 import mock
 import os
 import pytest
+import shutil
+import tempfile
 import time
 import unittest
 
@@ -15,6 +19,22 @@ from datetime import datetime
 class TestLint(unittest.TestCase):
     """Class for list tests"""
 
+    def setUp(self):
+        # Keep the remote pipeline catalogue and local workflow cache away from ~/.nfcore
+        self.tmp_dir = tempfile.mkdtemp()
+        self.catalogue = nf_core.catalogue.RemoteCatalogue(os.path.join(self.tmp_dir, 'pipelines.sqlite'))
+        self.patches = [
+            mock.patch('nf_core.catalogue.get_catalogue', return_value=self.catalogue),
+            mock.patch('nf_core.cache.get_cache', return_value=nf_core.cache.CacheStore(os.path.join(self.tmp_dir, 'cache.sqlite')))
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        shutil.rmtree(self.tmp_dir)
+
     @mock.patch('json.dumps')
     @mock.patch('subprocess.check_output')
     @mock.patch('nf_core.list.LocalWorkflow')
@@ -158,3 +178,234 @@ class TestLint(unittest.TestCase):
         workflows_obj.remote_workflows.append(rwf_ex2)
 
         assert len(workflows_obj.filtered_workflows()) == 1
+
+    @mock.patch('nf_core.list.LocalWorkflow.get_local_nf_workflow_details', autospec=True)
+    @mock.patch('subprocess.check_output')
+    def test_local_workflows_single_nextflow_info(self, mock_subprocess, mock_details):
+        """ Without an assets directory, `nextflow info` is only run once for all workflows """
+        tmp_dir = tempfile.mkdtemp()
+        for wf_name in ['nf-core/wf-a', 'nf-core/wf-b']:
+            os.makedirs(os.path.join(tmp_dir, 'assets', wf_name))
+
+        def check_output(cmd, **kwargs):
+            if cmd[1] == 'list':
+                return b'nf-core/wf-a\nnf-core/wf-b\nother/wf-c\n'
+            return 'repository  : https://github.com/{0}\nlocal path  : {1}/assets/{0}\n'.format(cmd[-1], tmp_dir).encode()
+        mock_subprocess.side_effect = check_output
+
+        with mock.patch.dict(os.environ, {'NXF_ASSETS': os.path.join(tmp_dir, 'missing')}):
+            workflows_obj = nf_core.list.Workflows()
+            workflows_obj.get_local_nf_workflows()
+        shutil.rmtree(tmp_dir)
+
+        assert mock_subprocess.call_count == 2
+        assert workflows_obj.local_unmatched == ['other/wf-c']
+        assert [wf.local_path for wf in workflows_obj.local_workflows] == [
+            os.path.join(tmp_dir, 'assets', 'nf-core', 'wf-a'),
+            os.path.join(tmp_dir, 'assets', 'nf-core', 'wf-b')
+        ]
+        assert mock_details.call_count == 2
+
+    @pytest.mark.xfail(raises=AssertionError)
+    @mock.patch('nf_core.list.LocalWorkflow.get_local_nf_workflow_details')
+    def test_local_workflows_inspection_fails(self, mock_details):
+        """ Errors from inspecting workflows in the thread pool are raised """
+        mock_details.side_effect = AssertionError('Broken workflow')
+        tmp_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(tmp_dir, 'nf-core', 'wf-a'))
+        try:
+            with mock.patch.dict(os.environ, {'NXF_ASSETS': tmp_dir}):
+                nf_core.list.Workflows().get_local_nf_workflows()
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def _make_git_repo(self):
+        """ Makes a repository with two commits, a lightweight and an annotated tag """
+        import git
+        repo_dir = tempfile.mkdtemp()
+        repo = git.Repo.init(repo_dir)
+        with repo.config_writer() as cw:
+            cw.set_value('user', 'name', 'Test')
+            cw.set_value('user', 'email', 'test@example.com')
+        repo.create_remote('origin', 'https://github.com/nf-core/dummy.git')
+        for i in range(2):
+            with open(os.path.join(repo_dir, 'main.nf'), 'w') as fh:
+                fh.write(str(i))
+            repo.index.add(['main.nf'])
+            commit = repo.index.commit('Commit {}'.format(i))
+            repo.create_tag('1.{}'.format(i), ref=commit)
+        repo.create_tag('2.0', ref=commit, message='Annotated release')
+        return repo_dir, repo
+
+    def test_read_git_metadata(self):
+        """ Reading git files directly gives the same result as GitPython """
+        repo_dir, repo = self._make_git_repo()
+        try:
+            git_info = nf_core.list.read_git_metadata(repo_dir)
+            assert git_info == nf_core.list.read_git_metadata_gitpython(repo_dir)
+            assert git_info['commit_sha'] == repo.head.commit.hexsha
+            assert git_info['branch'] == str(repo.active_branch)
+            assert git_info['active_tag'] == '2.0'
+            assert git_info['remote_url'] == 'https://github.com/nf-core/dummy.git'
+
+            # Detached HEAD on an older release, with all refs packed
+            repo.git.pack_refs('--all')
+            repo.git.checkout('1.0')
+            git_info = nf_core.list.read_git_metadata(repo_dir)
+            assert git_info == nf_core.list.read_git_metadata_gitpython(repo_dir)
+            assert git_info['branch'] is None
+            assert git_info['active_tag'] == '1.0'
+        finally:
+            shutil.rmtree(repo_dir)
+
+    def test_read_git_metadata_packed_objects(self):
+        """ Annotated tags that are only in a pack file are left to GitPython """
+        repo_dir, repo = self._make_git_repo()
+        try:
+            repo.git.gc()
+            os.makedirs(os.path.join(repo_dir, '.git', 'refs', 'tags', 'new'))
+            with open(os.path.join(repo_dir, '.git', 'refs', 'tags', 'new', '3.0'), 'w') as fh:
+                fh.write(repo.tags['2.0'].tag.hexsha + '\n')
+            assert nf_core.list.read_git_metadata(repo_dir) is None
+            local_wf = nf_core.list.LocalWorkflow('nf-core/dummy')
+            local_wf.local_path = repo_dir
+            open(os.path.join(repo_dir, '.git', 'FETCH_HEAD'), 'w').close()
+            with mock.patch('nf_core.cache.get_cache', return_value=nf_core.cache.CacheStore(os.path.join(repo_dir, 'cache.sqlite'))):
+                local_wf.get_local_nf_workflow_details()
+            assert local_wf.commit_sha == repo.head.commit.hexsha
+            assert local_wf.active_tag == 'new/3.0'
+        finally:
+            shutil.rmtree(repo_dir)
+
+    def test_local_workflow_details_cached(self):
+        """ Git details are cached until the repository is pulled again """
+        repo_dir, repo = self._make_git_repo()
+        try:
+            assets_dir = os.path.join(repo_dir, '.git', 'assets')
+            os.makedirs(os.path.join(assets_dir, 'nf-core'))
+            os.symlink(repo_dir, os.path.join(assets_dir, 'nf-core', 'dummy'))
+            open(os.path.join(repo_dir, '.git', 'FETCH_HEAD'), 'w').close()
+            cache = nf_core.cache.CacheStore(os.path.join(repo_dir, '.git', 'cache.sqlite'))
+
+            def list_local():
+                workflows_obj = nf_core.list.Workflows()
+                workflows_obj.get_local_nf_workflows()
+                assert len(workflows_obj.local_workflows) == 1
+                return workflows_obj.local_workflows[0]
+
+            with mock.patch.dict(os.environ, {'NXF_ASSETS': assets_dir}), \
+                    mock.patch('nf_core.cache.get_cache', return_value=cache), \
+                    mock.patch('nf_core.list.read_git_metadata', wraps=nf_core.list.read_git_metadata) as mock_read:
+                assert list_local().active_tag == '2.0'
+                assert mock_read.call_count == 1
+
+                # Nothing has changed, so the repository isn't read again
+                local_wf = list_local()
+                assert mock_read.call_count == 1
+                assert local_wf.commit_sha == repo.head.commit.hexsha
+                assert local_wf.active_tag == '2.0'
+                assert local_wf.last_pull_pretty is not None
+
+                # Checking out another release changes HEAD
+                repo.git.checkout('1.0')
+                assert list_local().active_tag == '1.0'
+                assert mock_read.call_count == 2
+
+                # A pull updates FETCH_HEAD
+                with open(os.path.join(repo_dir, '.git', 'FETCH_HEAD'), 'w') as fh:
+                    fh.write('pulled')
+                list_local()
+                assert mock_read.call_count == 3
+        finally:
+            shutil.rmtree(repo_dir)
+
+    def test_get_remote_workflows_from_catalogue(self):
+        """ Remote workflows are read from the pipeline catalogue, with release dates already parsed """
+        self.catalogue.update([{
+            'name': 'myWF',
+            'full_name': 'nf-core/myWF',
+            'releases': [{'tag_name': '1.0', 'tag_sha': 'aw3s0meh1sh', 'published_at': '2020-01-01T00:00:00Z'}]
+        }])
+        with mock.patch.object(self.catalogue, 'refresh', return_value=True), \
+                mock.patch('nf_core.catalogue.parse_timestamp') as mock_parse:
+            workflows_obj = nf_core.list.Workflows()
+            workflows_obj.get_remote_workflows()
+        assert mock_parse.call_count == 0
+        assert len(workflows_obj.remote_workflows) == 1
+        release = workflows_obj.remote_workflows[0].releases[0]
+        assert release['published_at_timestamp'] == 1577836800
+        assert release['published_at_pretty'] is not None
+
+    def test_keyword_index(self):
+        """ Keywords match the start of words, case insensitive, ranked by where they match """
+        def remote(name, description, topics):
+            return nf_core.list.RemoteWorkflow({
+                'name': name,
+                'full_name': 'nf-core/{}'.format(name),
+                'description': description,
+                'topics': topics
+            })
+        rnaseq = remote('rnaseq', 'RNA sequencing analysis pipeline', ['RNA-seq', 'pipeline'])
+        smrnaseq = remote('smrnaseq', 'Small RNA-seq best practice analysis pipeline', ['small-rna'])
+        atacseq = remote('atacseq', 'ATAC-seq peak-calling and QC analysis pipeline', ['ATAC-seq'])
+        rnafusion = remote('rnafusion', 'RNA-seq analysis pipeline for detection of gene-fusions', [])
+        workflows_obj = nf_core.list.Workflows(['RNA'])
+        workflows_obj.remote_workflows = [atacseq, rnafusion, rnaseq, smrnaseq]
+
+        # Matches in more fields, and whole word matches, rank higher
+        assert workflows_obj.filtered_workflows() == [rnaseq, smrnaseq, rnafusion]
+        index = workflows_obj.keyword_index
+        assert workflows_obj.filtered_workflows() == [rnaseq, smrnaseq, rnafusion]
+        assert workflows_obj.keyword_index is index
+
+        workflows_obj.keyword_filters = ['rna', 'fusion']
+        assert workflows_obj.filtered_workflows() == [rnafusion]
+        workflows_obj.keyword_filters = ['peak-call']
+        assert workflows_obj.filtered_workflows() == [atacseq]
+        workflows_obj.keyword_filters = ['seq']
+        assert workflows_obj.filtered_workflows() == [atacseq, rnaseq, rnafusion, smrnaseq]
+
+        # The index is rebuilt when the workflows change
+        workflows_obj.remote_workflows.remove(rnaseq)
+        assert workflows_obj.filtered_workflows() == [atacseq, rnafusion, smrnaseq]
+        assert workflows_obj.keyword_index is not index
+
+    def test_compare_remote_local_releases_behind(self):
+        """ Local workflows are matched to the release they were checked out at """
+        wfs = nf_core.list.Workflows()
+        rwf = nf_core.list.RemoteWorkflow({
+            'name': 'myWF',
+            'full_name': 'nf-core/myWF',
+            'releases': [
+                {'tag_name': '1.1', 'tag_sha': 'sha11', 'published_at': '2020-02-01T00:00:00Z'},
+                {'tag_name': '2.0', 'tag_sha': 'sha20', 'published_at': '2020-03-01T00:00:00Z'},
+                {'tag_name': '1.0', 'tag_sha': 'sha10', 'published_at': '2020-01-01T00:00:00Z'}
+            ]
+        })
+        # Releases are sorted by date, not by the order they are listed
+        assert [r['tag_name'] for r in rwf.releases] == ['1.0', '1.1', '2.0']
+        other_rwf = nf_core.list.RemoteWorkflow({'name': 'other', 'full_name': 'nf-core/other'})
+        wfs.remote_workflows = [other_rwf, rwf]
+        lwf = nf_core.list.LocalWorkflow('nf-core/myWF')
+        wfs.local_workflows = [nf_core.list.LocalWorkflow('nf-core/unknown'), lwf]
+
+        lwf.commit_sha = 'sha10'
+        wfs.compare_remote_local()
+        assert rwf.local_wf is lwf
+        assert other_rwf.local_wf is None
+        assert not rwf.local_is_latest
+        assert lwf.release_tag == '1.0'
+        assert lwf.releases_behind == 2
+
+        lwf.commit_sha = 'sha20'
+        wfs.compare_remote_local()
+        assert rwf.local_is_latest
+        assert lwf.release_tag == '2.0'
+        assert lwf.releases_behind == 0
+
+        # Not a release
+        lwf.commit_sha = 'dev'
+        wfs.compare_remote_local()
+        assert not rwf.local_is_latest
+        assert lwf.release_tag is None
+        assert lwf.releases_behind is None
@@ -137,6 +137,95 @@ class TestSchema(unittest.TestCase):
         self.schema_obj.input_params = {'fubar': 'input'}
         assert not self.schema_obj.validate_params()
 
+    def test_validator_cache(self):
+        """ Validators are compiled once per schema, and the schema is only checked once """
+        schema = {'type': 'object', 'properties': {'input': {'type': 'string'}}}
+        with mock.patch('jsonschema.Draft7Validator.check_schema') as mock_check:
+            validator = nf_core.schema.get_validator(schema)
+            # Same contents, different object and key order
+            assert nf_core.schema.get_validator(json.loads(json.dumps(schema, sort_keys=True))) is validator
+            assert mock_check.call_count == 1
+            schema['properties']['input']['type'] = 'integer'
+            assert nf_core.schema.get_validator(schema) is not validator
+            assert mock_check.call_count == 2
+        assert validator.is_valid({'input': 'fubar'})
+
+    def test_validate_many(self):
+        """ Validate several params files, with one result for each """
+        self.schema_obj.schema_filename = self.template_schema
+        self.schema_obj.load_schema()
+        self.schema_obj.flatten_schema()
+        tmp_dir = tempfile.mkdtemp()
+        params_files = []
+        for i, params in enumerate([{'input': 'fubar'}, {'input': 'fubar', 'max_cpus': 'lots'}, {'fubar': 'input'}]):
+            params_files.append(os.path.join(tmp_dir, 'params_{}.json'.format(i)))
+            with open(params_files[-1], 'w') as fh:
+                json.dump(params, fh)
+        params_files.append(os.path.join(tmp_dir, 'missing.json'))
+
+        results = self.schema_obj.validate_many(iter(params_files))
+        result = next(results)
+        assert result == {'params_file': params_files[0], 'valid': True, 'errors': []}
+        results = [result] + list(results)
+        shutil.rmtree(tmp_dir)
+
+        assert [r['params_file'] for r in results] == params_files
+        assert [r['valid'] for r in results] == [True, False, False, False]
+        assert [e['param'] for e in results[1]['errors']] == ['max_cpus']
+        assert results[2]['errors'][0]['param'] == ''
+        assert "'input' is a required property" in results[2]['errors'][0]['message']
+        assert results[3]['errors'][0]['message'].startswith('Could not load params file')
+        assert self.schema_obj.input_params == {}
+
+    def test_validate_many_parallel_streams(self):
+        """ Params are read a few chunks at a time in worker processes, not all up front """
+        self.schema_obj.schema_filename = self.template_schema
+        self.schema_obj.load_schema()
+        self.schema_obj.flatten_schema()
+        num_read = []
+        def params_stream():
+            for i in range(1000):
+                num_read.append(i)
+                yield ('params.jsonl:{}'.format(i), '{"input": "fubar"}')
+
+        results = self.schema_obj.validate_many(params_stream(), max_workers=2)
+        assert next(results)['params_file'] == 'params.jsonl:0'
+        assert len(num_read) <= 4 * nf_core.schema.VALIDATE_CHUNK_SIZE
+        results = list(results)
+        assert len(results) == 999
+        assert all(r['valid'] for r in results)
+
+    def test_validate_many_jsonl_parallel(self):
+        """ Validate params from a directory and JSON lines in worker processes """
+        self.schema_obj.schema_filename = self.template_schema
+        self.schema_obj.load_schema()
+        self.schema_obj.flatten_schema()
+        tmp_dir = tempfile.mkdtemp()
+        with open(os.path.join(tmp_dir, 'b.yml'), 'w') as fh:
+            yaml.dump({'input': 'fubar'}, fh)
+        with open(os.path.join(tmp_dir, 'a.json'), 'w') as fh:
+            json.dump({'input': 'fubar', 'max_cpus': 'lots'}, fh)
+        open(os.path.join(tmp_dir, 'README.md'), 'w').close()
+        with open(os.path.join(tmp_dir, 'params.jsonl'), 'w') as fh:
+            fh.write('{"input": "fubar"}\n\n[1, 2]\n')
+
+        params_files = nf_core.schema.find_params_files([tmp_dir])
+        assert params_files == [os.path.join(tmp_dir, 'a.json'), os.path.join(tmp_dir, 'b.yml')]
+        with open(os.path.join(tmp_dir, 'params.jsonl')) as fh:
+            params_files.extend(nf_core.schema.read_params_jsonl(fh))
+        results = list(self.schema_obj.validate_many(params_files, max_workers=2))
+        shutil.rmtree(tmp_dir)
+
+        jsonl_fn = os.path.join(tmp_dir, 'params.jsonl')
+        assert [r['params_file'] for r in results] == params_files[:2] + [jsonl_fn + ':1', jsonl_fn + ':3']
+        assert [r['valid'] for r in results] == [False, True, True, False]
+        assert results[0]['errors'][0]['param'] == 'max_cpus'
+
+        with mock.patch('nf_core.schema.print') as mock_print:
+            assert not nf_core.schema.print_validation_results(results, as_json=True)
+        assert [json.loads(c[0][0]) for c in mock_print.call_args_list] == results
+        assert nf_core.schema.print_validation_results(results[1:3])
+
     def test_validate_schema_pass(self):
         """ Check that the schema validation passes """
         # Load the template schema
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+""" Tests covering the start-up time of the command line tool.
+
+Uses ``python -X importtime`` to see which modules are imported
+when running a command, so that slow imports don't creep back in.
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+
+NF_CORE_SCRIPT = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'scripts', 'nf-core')
+
+# Slow to import, and only needed by some subcommands
+HEAVY_MODULES = ['PyInquirer', 'cookiecutter', 'jinja2', 'jsonschema', 'git', 'requests_cache', 'pkg_resources']
+
+
+def get_import_times(args):
+    """Runs a Python command with ``-X importtime``.
+
+    Returns:
+        dict: Cumulative import time in microseconds for each top-level package imported
+    """
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime'] + args,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True
+    )
+    assert proc.returncode == 0, "Command failed: {}\n{}".format(' '.join(args), proc.stderr)
+    import_times = {}
+    for l in proc.stderr.splitlines():
+        if not l.startswith('import time:') or 'cumulative' in l:
+            continue
+        _, cumulative, module = l[len('import time:'):].split('|')
+        package = module.strip().split('.')[0]
+        import_times[package] = max(import_times.get(package, 0), int(cumulative))
+    return import_times
+
+
+class TestStartup(unittest.TestCase):
+    """Class for start-up time tests"""
+
+    def test_help_imports(self):
+        """ nf-core --help should not import any subcommand dependencies """
+        import_times = get_import_times([NF_CORE_SCRIPT, '--help'])
+        assert 'nf_core' in import_times
+        for module in HEAVY_MODULES:
+            assert module not in import_times, "'nf-core --help' imports {}".format(module)
+
+    def test_subcommand_help_imports(self):
+        """ Showing help for a subcommand should not import its module """
+        import_times = get_import_times([NF_CORE_SCRIPT, 'launch', '--help'])
+        for module in HEAVY_MODULES:
+            assert module not in import_times, "'nf-core launch --help' imports {}".format(module)
+
+    def test_module_import_side_effects(self):
+        """ Importing nf-core modules should not set up the requests cache """
+        import_times = get_import_times(['-c', 'import nf_core.lint, nf_core.list, nf_core.licences'])
+        assert 'nf_core' in import_times
+        assert 'requests_cache' not in import_times
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+""" Tests covering the utility functions.
+"""
+
+import nf_core.cache
+import nf_core.utils
+
+import mock
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+PATH_TEMPLATE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'nf_core', 'pipeline-template', '{{cookiecutter.name_noslash}}')
+
+class TestUtils(unittest.TestCase):
+    """Class for utils tests"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.wf_path = os.path.join(self.tmp_dir, 'wf')
+        shutil.copytree(PATH_TEMPLATE, self.wf_path)
+        self.cache_dir = os.path.join(self.tmp_dir, 'cache')
+        os.mkdir(self.cache_dir)
+        self.cache = nf_core.cache.CacheStore(os.path.join(self.cache_dir, 'cache.sqlite'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_get_wf_config_files(self):
+        """ Includes are followed, remote includes are skipped """
+        config_files = [os.path.relpath(fn, self.wf_path) for fn in nf_core.utils.get_wf_config_files(self.wf_path)]
+        assert config_files[0] == 'nextflow.config'
+        assert config_files[-1] == 'main.nf'
+        for fn in ['conf/base.config', 'conf/test.config', 'conf/igenomes.config']:
+            assert fn in config_files
+        assert len(config_files) == 5
+
+    def test_cache_key_included_file(self):
+        """ Editing an included config file changes the cache key """
+        key = nf_core.utils.get_wf_config_cache_key(self.wf_path, self.cache)
+        assert key == nf_core.utils.get_wf_config_cache_key(self.wf_path, self.cache)
+        with open(os.path.join(self.wf_path, 'conf', 'base.config'), 'a') as fh:
+            fh.write('\nprocess.cpus = 2\n')
+        assert key != nf_core.utils.get_wf_config_cache_key(self.wf_path, self.cache)
+
+    def test_cache_key_environment(self):
+        """ NXF_* variables and the Nextflow version are part of the cache key """
+        key = nf_core.utils.get_wf_config_cache_key(self.wf_path)
+        with mock.patch.dict(os.environ, {'NXF_VER': '20.04.1'}):
+            assert key != nf_core.utils.get_wf_config_cache_key(self.wf_path)
+        with mock.patch.dict(os.environ, {'NOT_NXF': 'foo'}):
+            assert key == nf_core.utils.get_wf_config_cache_key(self.wf_path)
+
+    def test_cache_key_reuses_file_hashes(self):
+        """ Unchanged files are not hashed again """
+        for fn in nf_core.utils.get_wf_config_files(self.wf_path):
+            os.utime(fn, (time.time() - 60, time.time() - 60))
+        key = nf_core.utils.get_wf_config_cache_key(self.wf_path, self.cache)
+        assert self.cache.stats()['file_hashes']['entries'] == 5
+        with mock.patch('hashlib.sha256', wraps=nf_core.utils.hashlib.sha256) as mock_sha:
+            assert key == nf_core.utils.get_wf_config_cache_key(self.wf_path, self.cache)
+            # Only the final key is hashed
+            assert mock_sha.call_count == 1
+
+    def test_get_wf_config_files_reuses_includes(self):
+        """ Unchanged config files are not scanned for includes again """
+        for fn in nf_core.utils.get_wf_config_files(self.wf_path):
+            os.utime(fn, (time.time() - 60, time.time() - 60))
+        config_files = nf_core.utils.get_wf_config_files(self.wf_path, self.cache)
+        with mock.patch('nf_core.utils.find_config_includes', wraps=nf_core.utils.find_config_includes) as mock_find:
+            assert nf_core.utils.get_wf_config_files(self.wf_path, self.cache) == config_files
+            assert mock_find.call_count == 0
+            # Only the changed file is scanned again
+            with open(os.path.join(self.wf_path, 'conf', 'base.config'), 'a') as fh:
+                fh.write("\nincludeConfig 'extra.config'\n")
+            with open(os.path.join(self.wf_path, 'conf', 'extra.config'), 'w') as fh:
+                fh.write("process.cpus = 2\n")
+            assert nf_core.utils.get_wf_config_files(self.wf_path, self.cache) == config_files[:-1] + [os.path.join(self.wf_path, 'conf', 'extra.config'), config_files[-1]]
+            assert [c[0][0] for c in mock_find.call_args_list] == [os.path.join(self.wf_path, 'conf', 'base.config'), os.path.join(self.wf_path, 'conf', 'extra.config')]
+
+    def test_no_config_files(self):
+        assert nf_core.utils.get_wf_config_cache_key(self.cache_dir) is None
+
+    @mock.patch('shutil.which')
+    def test_get_nextflow_version(self, mock_which):
+        """ Read the default version from the launcher script """
+        launcher = os.path.join(self.tmp_dir, 'nextflow')
+        with open(launcher, 'w') as fh:
+            fh.write("#!/usr/bin/env bash\n[[ \"$NXF_VER\" ]] || NXF_VER=${NXF_VER:-'20.04.1'}\n")
+        mock_which.return_value = launcher
+        with mock.patch.dict(os.environ, {'NXF_VER': ''}):
+            assert nf_core.utils.get_nextflow_version() == '20.04.1'
+        with mock.patch.dict(os.environ, {'NXF_VER': '19.10.0'}):
+            assert nf_core.utils.get_nextflow_version() == '19.10.0'
+
+    def test_host_rate_limiter(self):
+        """ Requests to the same host are spaced out, other hosts are not held up """
+        limiter = nf_core.utils.HostRateLimiter(rate=20)
+        start = time.time()
+        for _ in range(3):
+            limiter.wait('https://api.anaconda.org/package/bioconda/fastqc')
+        limiter.wait('https://pypi.python.org/pypi/multiqc/json')
+        assert 0.1 <= time.time() - start < 0.15